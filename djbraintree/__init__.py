@@ -16,6 +16,8 @@ __license__ = "BSD"
 __license__ = "License :: OSI Approved :: BSD License"
 __copyright__ = "Copyright 2016 Zach Layng"
 
+default_app_config = "djbraintree.apps.DjBraintreeConfig"
+
 if get_django_version() <= '1.7.x':
     msg = "dj-braintree deprecation notice: Django 1.7 and lower are not\n" \
         "supported. Please upgrade to Django 1.8 or higher.\n"
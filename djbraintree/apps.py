@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.apps import AppConfig
+from django.test.signals import setting_changed
+
+
+class DjBraintreeConfig(AppConfig):
+    name = "djbraintree"
+    verbose_name = "dj-braintree"
+
+    def ready(self):
+        from . import gateway
+        from . import settings as djbraintree_settings
+
+        djbraintree_settings.build_plan_indexes()
+        setting_changed.connect(djbraintree_settings.plan_settings_changed)
+        setting_changed.connect(gateway.gateway_settings_changed)
@@ -19,32 +19,33 @@ This module defines abstract models which are then extended in models.py
 to provide the remaining django-braintree-marketplace functionality.
 """
 
+import calendar
 import datetime
+import hashlib
+import re
 from decimal import Decimal
 
-from django.conf import settings
 from django.db import models
 from django.utils import timezone
-from django.utils.encoding import python_2_unicode_compatible
+from django.utils.encoding import force_text, python_2_unicode_compatible
 
 from model_utils.models import TimeStampedModel
-import braintree
 
+from .gateway import (braintree_sdk, configure_braintree,  # noqa
+                      current_merchant, get_gateway)
 from .managers import BraintreeObjectManager
+from .records import CompactRecord, record_class_for
+from .resilience import ResilientApi
+from .singleflight import SingleFlight
 
-from .utils import VERIFICATION_CHOICES, STATUS_CHOICES, THREE_D_SECURE_CHOICES
+from .utils import (VERIFICATION_CHOICES, STATUS_CHOICES,
+                    MERCHANT_ACCOUNT_STATUS_CHOICES,
+                    SUBSCRIPTION_STATUS_CHOICES, THREE_D_SECURE_CHOICES,
+                    DISPUTE_KIND_CHOICES, DISPUTE_STATUS_CHOICES,
+                    aware_datetime)
 
-public_key = settings.BRAINTREE_PUBLIC_KEY
-private_key = settings.BRAINTREE_PRIVATE_KEY
-merchant_id = settings.BRAINTREE_MERCHANT_ID
-environment = getattr(settings, "BRAINTREE_ENVIRONMENT", "sandbox")
-
-
-def configure_braintree():
-    braintree.Configuration.configure(braintree.Environment.All[environment],
-                                      merchant_id=merchant_id,
-                                      public_key=public_key,
-                                      private_key=private_key)
+# In-flight api_find() calls, keyed on (api name, merchant, braintree id)
+_find_calls = SingleFlight()
 
 
 @python_2_unicode_compatible
@@ -61,24 +62,48 @@ class BraintreeObject(TimeStampedModel):
     braintree_id = models.CharField(max_length=50, unique=True)
 
     @classmethod
-    def api(cls):
+    def api(cls, merchant=None):
         """
         Get the api object for this type of braintree object (requires
         braintree_api_name attribute to be set on model).
+
+        :param merchant: Route through this merchant's gateway (see
+            djbraintree.gateway). Defaults to the merchant selected with
+            ``using_merchant``, or the globally configured one.
+        :rtype: djbraintree.resilience.ResilientApi
         """
         if cls.braintree_api_name is None:
             raise NotImplementedError(
                 "BraintreeObject descendants are required to define "
                 "the braintree_api_name attribute")
-        # e.g. braintree.Customer, braintree.Transaction, etc
-        return getattr(braintree, cls.braintree_api_name)
+        merchant = merchant or current_merchant()
+        if merchant is not None:
+            # e.g. gateway.customer, gateway.transaction, etc
+            api = getattr(get_gateway(merchant), cls.braintree_attr_name())
+        else:
+            # e.g. braintree.Customer, braintree.Transaction, etc
+            api = getattr(braintree_sdk(), cls.braintree_api_name)
+        # Calls go through the merchant's circuit breaker
+        return ResilientApi(api, merchant)
+
+    @classmethod
+    def braintree_attr_name(cls):
+        """
+        The snake case form of braintree_api_name, as used for result and
+        gateway attributes, e.g. "PaymentMethod" -> "payment_method".
+        """
+        return re.sub(r"(?<!^)(?=[A-Z])", "_", cls.braintree_api_name).lower()
 
     def api_find(self):
         """
         Implement very commonly used API function 'find'
+
+        Concurrent lookups of the same object within the process share a
+        single gateway call (see djbraintree.singleflight).
         """
+        key = (self.braintree_api_name, current_merchant(), self.braintree_id)
         # Run braintree.X.find(id)
-        return type(self).api().find(self.braintree_id)
+        return _find_calls.do(key, type(self).api().find, self.braintree_id)
 
     def str_parts(self):
         """
@@ -108,6 +133,41 @@ class BraintreeObject(TimeStampedModel):
         """
         raise NotImplementedError()
 
+    @classmethod
+    def record_class(cls):
+        """
+        The compact ``__slots__`` record type for this model, with a fixed
+        field order. See :mod:`djbraintree.records`.
+
+        :rtype: type[djbraintree.records.CompactRecord]
+        """
+        return record_class_for(cls)
+
+    @classmethod
+    def braintree_object_to_compact_record(cls, braintree_object):
+        """
+        Same mapping as braintree_object_to_record, but returns a compact
+        record instead of a dict. Use this in bulk paths that hold many
+        mapped objects in memory before writing them.
+
+        :type braintree_object: braintree.Resource
+        :rtype: djbraintree.records.CompactRecord
+        """
+        return cls.record_class().from_dict(
+            cls.braintree_object_to_record(braintree_object))
+
+    @classmethod
+    def create_from_record(cls, record):
+        """
+        Create a model instance (not saved to db) from a mapped record,
+        either a dict or a compact record.
+
+        :type record: Union[dict, djbraintree.records.CompactRecord]
+        """
+        if isinstance(record, CompactRecord):
+            record = record.as_dict()
+        return cls(**record)
+
     @classmethod
     def create_from_braintree_object(cls, braintree_object):
         """
@@ -128,12 +188,16 @@ class BraintreeObject(TimeStampedModel):
         Extracts response object (data) from a successful result object
         """
         assert result.is_success
-        return result.getattr(cls.braintree_api_name)
+        # e.g. result.customer, result.payment_method
+        return getattr(result, cls.braintree_attr_name())
 
     def sync(self, braintree_object=None):
         if not braintree_object:
             braintree_object = self.api_find()
-        data = self.braintree_object_to_record(braintree_object)
+        if isinstance(braintree_object, CompactRecord):
+            data = braintree_object.as_dict()
+        else:
+            data = self.braintree_object_to_record(braintree_object)
         for attr, value in data.items():
             setattr(self, attr, value)
 
@@ -163,7 +227,8 @@ class BraintreeCustomer(BraintreeObject):
         return self.api_find()
 
     def has_default_payment_method(self):
-        return braintree.PaymentMethod.find()
+        return any(payment_method.default for payment_method
+                   in self.braintree_customer.payment_methods)
 
     def destroy(self):
         return self.api().delete(self.braintree_id)
@@ -206,6 +271,33 @@ class BraintreeCustomer(BraintreeObject):
         result = BraintreeTransaction.api().sale(data)
         return result
 
+    def charge_with(self, template, amount, payment_method_token=None,
+                    payment_method_nonce=None, **kwargs):
+        """
+        Fast path for ``charge``: the static parts of the sale come
+        pre-validated from a ``djbraintree.charges.ChargeTemplate``, so only
+        the amount, customer and payment method are added per call.
+
+        :type template: djbraintree.charges.ChargeTemplate
+        :param amount: Dollar amount
+        :type amount: decimal.Decimal
+        """
+        if not isinstance(amount, Decimal):
+            raise ValueError(
+                "You must supply a decimal value representing dollars."
+            )
+        if payment_method_token:
+            kwargs["payment_method_token"] = payment_method_token
+        elif payment_method_nonce:
+            kwargs["payment_method_nonce"] = payment_method_nonce
+        else:
+            raise ValueError(
+                "You must supply a payment method nonce or token."
+            )
+        data = template.payload(amount=amount, customer_id=self.braintree_id,
+                                **kwargs)
+        return BraintreeTransaction.api().sale(data)
+
     def update(self, **kwargs):
         result = self.api().update(self.braintree_id, kwargs)
         return result
@@ -215,20 +307,20 @@ class BraintreeCustomer(BraintreeObject):
         data = {
             "braintree_id": obj.id,
             "company": obj.company or '',
-            "created_at": obj.created_at or None,
+            "created_at": aware_datetime(obj.created_at) or None,
             "email": obj.email or '',
             "fax": obj.fax or '',
             "first_name": obj.first_name or '',
             "last_name": obj.last_name or '',
             "phone": obj.phone or '',
-            "updated_at": obj.updated_at or None,
+            "updated_at": aware_datetime(obj.updated_at) or None,
             "website": obj.website or '',
         }
         return data
 
     def retrieve_transactions(self):
-        collection = braintree.Transaction.search(
-            braintree.TransactionSearch.customer_id == self.braintree_id
+        collection = BraintreeTransaction.api().search(
+            braintree_sdk().TransactionSearch.customer_id == self.braintree_id
         )
         return collection
 
@@ -239,6 +331,48 @@ class BraintreeAddress(BraintreeObject):
 
     braintree_api_name = "Address"
 
+    # Fields making up an address' content, in content hash order
+    CONTENT_FIELDS = ("first_name", "last_name", "company", "street_address",
+                      "extended_address", "locality", "region", "postal_code",
+                      "country_name", "country_code_alpha2",
+                      "country_code_alpha3", "country_code_numeric")
+
+    first_name = models.CharField(max_length=255, blank=True)
+    last_name = models.CharField(max_length=255, blank=True)
+    company = models.CharField(max_length=255, blank=True)
+    street_address = models.CharField(max_length=255, blank=True)
+    extended_address = models.CharField(max_length=255, blank=True)
+    locality = models.CharField(max_length=255, blank=True)
+    region = models.CharField(max_length=255, blank=True)
+    postal_code = models.CharField(max_length=20, blank=True)
+    country_name = models.CharField(max_length=255, blank=True)
+    country_code_alpha2 = models.CharField(max_length=2, blank=True)
+    country_code_alpha3 = models.CharField(max_length=3, blank=True)
+    country_code_numeric = models.CharField(max_length=3, blank=True)
+
+    @classmethod
+    def content_hash(cls, content):
+        """
+        :param content: The address fields, as a dict
+        :return: The hex SHA-1 of the address content, which is the same for
+            every copy of an address whatever its Braintree id.
+        :rtype: str
+        """
+        value = "\x1f".join(content[name] for name in cls.CONTENT_FIELDS)
+        return hashlib.sha1(value.encode("utf-8")).hexdigest()
+
+    @classmethod
+    def braintree_object_to_record(cls, obj):
+        """
+        Addresses are keyed by content: Braintree ids are only unique per
+        customer, and the addresses of transactions often have none. The
+        record's braintree_id is the content hash.
+        """
+        data = dict((name, force_text(getattr(obj, name, None) or '').strip())
+                    for name in cls.CONTENT_FIELDS)
+        data["braintree_id"] = cls.content_hash(data)
+        return data
+
 
 class BraintreePaymentMethod(BraintreeObject):
     class Meta:
@@ -253,7 +387,7 @@ class BraintreePaymentMethod(BraintreeObject):
     commercial = models.CharField(max_length=10, blank=True)
     country_of_issuance = models.CharField(max_length=255, blank=True)
     created_at = models.DateTimeField(blank=True, null=True)
-    customer_id = models.CharField(max_length=50, blank=True)
+    customer_braintree_id = models.CharField(max_length=50, blank=True)
     customer_location = models.CharField(
         max_length=13,
         blank=True,
@@ -263,9 +397,11 @@ class BraintreePaymentMethod(BraintreeObject):
     debit = models.CharField(max_length=10, blank=True)
     default = models.NullBooleanField(null=True)
     durbin_regulated = models.CharField(max_length=10, blank=True)
-    expiration_date = models.CharField(max_length=6, blank=True)
+    expiration_date = models.CharField(max_length=7, blank=True)
     expiration_month = models.CharField(max_length=2, blank=True)
     expiration_year = models.CharField(max_length=4, blank=True)
+    # Last day of the expiration month, for range queries on expiry
+    expires_on = models.DateField(null=True, blank=True, db_index=True)
 
     expired = models.BooleanField(default=False)
 
@@ -281,27 +417,64 @@ class BraintreePaymentMethod(BraintreeObject):
     unique_number_identifier = models.CharField(max_length=140, blank=True)
     updated_at = models.DateTimeField(null=True)
 
+    def str_parts(self):
+        return [
+            "token={token}".format(token=self.token),
+            "customer={customer}".format(
+                customer=self.customer_braintree_id),
+        ]
+
+    @staticmethod
+    def expiry_date(month, year):
+        """
+        :return: The last day of the given expiration month, or None if
+            either part is missing or invalid.
+        :rtype: Optional[datetime.date]
+        """
+        try:
+            month, year = int(month), int(year)
+            return datetime.date(year, month,
+                                 calendar.monthrange(year, month)[1])
+        except (TypeError, ValueError):
+            return None
+
     @classmethod
     def braintree_object_to_record(cls, obj):
+        # Payment methods are keyed by token. Only cards have the card
+        # attributes (and expiration_date raises without them).
+        def attr(name):
+            return getattr(obj, name, None) or ''
+
+        expiration_month = attr("expiration_month")
+        expiration_year = attr("expiration_year")
         data = {
-            "card_bin": obj.bin,
-            "card_type": obj.card_type,
-            "cardholder_name": obj.cardholder_name,
-            "commercial": obj.commercial,
-            "country_of_issuance": obj.country_of_issuance,
-            "customer_location": obj.customer_location,
-            "debit": obj.debit,
-            "durbin_regulated": obj.durbin_regulated,
-            "expiration_date": obj.expiration_date,
-            "healthcare": obj.healthcare,
-            "image_url": obj.image_url,
-            "issuing_bank": obj.issuing_bank,
-            "last_4": obj.last_4,
-            "masked_number": obj.masked_number,
-            "payroll": obj.payroll,
-            "prepaid": obj.prepaid,
+            "braintree_id": obj.token,
+            "card_bin": attr("bin"),
+            "card_type": attr("card_type"),
+            "cardholder_name": attr("cardholder_name"),
+            "commercial": attr("commercial"),
+            "country_of_issuance": attr("country_of_issuance"),
+            "created_at": aware_datetime(getattr(obj, "created_at", None)),
+            "customer_braintree_id": attr("customer_id"),
+            "customer_location": attr("customer_location"),
+            "debit": attr("debit"),
+            "default": getattr(obj, "default", None),
+            "durbin_regulated": attr("durbin_regulated"),
+            "expiration_date": attr("expiration_date"),
+            "expiration_month": expiration_month,
+            "expiration_year": expiration_year,
+            "expires_on": cls.expiry_date(expiration_month, expiration_year),
+            "expired": bool(getattr(obj, "expired", False)),
+            "healthcare": attr("healthcare"),
+            "image_url": getattr(obj, "image_url", None),
+            "issuing_bank": attr("issuing_bank"),
+            "last_4": attr("last_4"),
+            "masked_number": attr("masked_number"),
+            "payroll": attr("payroll"),
+            "prepaid": attr("prepaid"),
             "token": obj.token,
-            "unique_number_identifier": obj.unique_number_identifier,
+            "unique_number_identifier": attr("unique_number_identifier"),
+            "updated_at": aware_datetime(getattr(obj, "updated_at", None)),
         }
         return data
 
@@ -312,6 +485,68 @@ class BraintreeMerchantAccount(BraintreeObject):
 
     braintree_api_name = "MerchantAccount"
 
+    currency_iso_code = models.CharField(max_length=3, blank=True)
+    default = models.NullBooleanField(null=True)
+    master_merchant_account_id = models.CharField(max_length=255, blank=True)
+    status = models.CharField(max_length=20, blank=True,
+                              choices=MERCHANT_ACCOUNT_STATUS_CHOICES)
+
+    @classmethod
+    def braintree_object_to_record(cls, obj):
+        master = getattr(obj, "master_merchant_account", None)
+        data = {
+            "braintree_id": obj.id,
+            "currency_iso_code": getattr(obj, "currency_iso_code", None) or '',
+            "default": getattr(obj, "default", None),
+            "master_merchant_account_id": getattr(master, "id", None) or '',
+            "status": getattr(obj, "status", None) or '',
+        }
+        return data
+
+
+class BraintreeDispute(BraintreeObject):
+    class Meta:
+        abstract = True
+
+    braintree_api_name = "Dispute"
+
+    amount = models.DecimalField(decimal_places=2, max_digits=7, null=True)
+    currency_iso_code = models.CharField(max_length=3, blank=True)
+    date_opened = models.DateField(null=True)
+    date_won = models.DateField(null=True)
+    kind = models.CharField(max_length=20, blank=True,
+                            choices=DISPUTE_KIND_CHOICES)
+    reason = models.CharField(max_length=40, blank=True)
+    received_date = models.DateField(null=True)
+    reply_by_date = models.DateField(null=True)
+    status = models.CharField(max_length=20, blank=True,
+                              choices=DISPUTE_STATUS_CHOICES)
+    transaction_braintree_id = models.CharField(max_length=50, blank=True)
+
+    def str_parts(self):
+        return [
+            "status={status}".format(status=self.status),
+            "amount={amount}".format(amount=self.amount),
+        ] + super(BraintreeDispute, self).str_parts()
+
+    @classmethod
+    def braintree_object_to_record(cls, obj):
+        details = getattr(obj, "transaction_details", None)
+        data = {
+            "braintree_id": obj.id,
+            "amount": getattr(obj, "amount", None),
+            "currency_iso_code": getattr(obj, "currency_iso_code", None) or '',
+            "date_opened": getattr(obj, "date_opened", None),
+            "date_won": getattr(obj, "date_won", None),
+            "kind": getattr(obj, "kind", None) or '',
+            "reason": getattr(obj, "reason", None) or '',
+            "received_date": getattr(obj, "received_date", None),
+            "reply_by_date": getattr(obj, "reply_by_date", None),
+            "status": getattr(obj, "status", None) or '',
+            "transaction_braintree_id": getattr(details, "id", None) or '',
+        }
+        return data
+
 
 class BraintreePlan(BraintreeObject):
     class Meta:
@@ -319,6 +554,48 @@ class BraintreePlan(BraintreeObject):
 
     braintree_api_name = "Plan"
 
+    billing_day_of_month = models.PositiveSmallIntegerField(null=True)
+    billing_frequency = models.PositiveSmallIntegerField(null=True)
+    created_at = models.DateTimeField(null=True)
+    currency_iso_code = models.CharField(max_length=3, blank=True)
+    description = models.TextField(blank=True)
+    name = models.CharField(max_length=255, blank=True)
+    number_of_billing_cycles = models.PositiveIntegerField(null=True)
+    price = models.DecimalField(decimal_places=2, max_digits=7, null=True)
+    trial_duration = models.PositiveIntegerField(null=True)
+    trial_duration_unit = models.CharField(max_length=10, blank=True)
+    trial_period = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(null=True)
+
+    def str_parts(self):
+        return [
+            "name={name}".format(name=self.name),
+            "price={price}".format(price=self.price),
+        ] + super(BraintreePlan, self).str_parts()
+
+    @classmethod
+    def braintree_object_to_record(cls, obj):
+        price = getattr(obj, "price", None)
+        data = {
+            "braintree_id": obj.id,
+            "billing_day_of_month": getattr(obj, "billing_day_of_month", None),
+            "billing_frequency": getattr(obj, "billing_frequency", None),
+            "created_at": aware_datetime(getattr(obj, "created_at", None)),
+            "currency_iso_code": getattr(obj, "currency_iso_code", None) or '',
+            "description": getattr(obj, "description", None) or '',
+            "name": getattr(obj, "name", None) or '',
+            "number_of_billing_cycles": getattr(obj, "number_of_billing_cycles",
+                                                None),
+            # Plan resources leave the price as a string
+            "price": Decimal(price) if price is not None else None,
+            "trial_duration": getattr(obj, "trial_duration", None),
+            "trial_duration_unit": getattr(obj, "trial_duration_unit",
+                                           None) or '',
+            "trial_period": bool(getattr(obj, "trial_period", False)),
+            "updated_at": aware_datetime(getattr(obj, "updated_at", None)),
+        }
+        return data
+
 
 class BraintreeSubscription(BraintreeObject):
     class Meta:
@@ -326,6 +603,65 @@ class BraintreeSubscription(BraintreeObject):
 
     braintree_api_name = "Subscription"
 
+    balance = models.DecimalField(decimal_places=2, max_digits=7, null=True)
+    billing_day_of_month = models.PositiveSmallIntegerField(null=True)
+    billing_period_start_date = models.DateField(null=True, blank=True)
+    billing_period_end_date = models.DateField(null=True, blank=True)
+    created_at = models.DateTimeField(blank=True, null=True)
+    current_billing_cycle = models.PositiveIntegerField(null=True)
+    days_past_due = models.PositiveIntegerField(null=True)
+    failure_count = models.PositiveIntegerField(default=0)
+    first_billing_date = models.DateField(null=True, blank=True)
+    merchant_account_id = models.CharField(max_length=255, blank=True)
+    never_expires = models.BooleanField(default=True)
+    next_billing_date = models.DateField(null=True, blank=True)
+    number_of_billing_cycles = models.PositiveIntegerField(null=True)
+    paid_through_date = models.DateField(null=True, blank=True)
+    payment_method_token = models.CharField(max_length=80, blank=True)
+    plan_id = models.CharField(max_length=100, blank=True)
+    price = models.DecimalField(decimal_places=2, max_digits=7, null=True)
+    status = models.CharField(max_length=20, blank=True,
+                              choices=SUBSCRIPTION_STATUS_CHOICES)
+    trial_duration = models.PositiveIntegerField(null=True)
+    trial_duration_unit = models.CharField(max_length=10, blank=True)
+    trial_period = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(null=True)
+
+    def str_parts(self):
+        return [
+                   "plan_id={plan_id}".format(plan_id=self.plan_id),
+                   "status={status}".format(status=self.status),
+               ] + super(BraintreeSubscription, self).str_parts()
+
+    @classmethod
+    def braintree_object_to_record(cls, obj):
+        data = {
+            "braintree_id": obj.id,
+            "balance": obj.balance,
+            "billing_day_of_month": obj.billing_day_of_month,
+            "billing_period_start_date": obj.billing_period_start_date,
+            "billing_period_end_date": obj.billing_period_end_date,
+            "created_at": aware_datetime(obj.created_at),
+            "current_billing_cycle": obj.current_billing_cycle,
+            "days_past_due": obj.days_past_due,
+            "failure_count": obj.failure_count or 0,
+            "first_billing_date": obj.first_billing_date,
+            "merchant_account_id": obj.merchant_account_id or '',
+            "never_expires": bool(obj.never_expires),
+            "next_billing_date": obj.next_billing_date,
+            "number_of_billing_cycles": obj.number_of_billing_cycles,
+            "paid_through_date": obj.paid_through_date,
+            "payment_method_token": obj.payment_method_token or '',
+            "plan_id": obj.plan_id or '',
+            "price": obj.price,
+            "status": obj.status,
+            "trial_duration": obj.trial_duration,
+            "trial_duration_unit": obj.trial_duration_unit or '',
+            "trial_period": bool(obj.trial_period),
+            "updated_at": aware_datetime(obj.updated_at),
+        }
+        return data
+
 
 class BraintreeTransaction(BraintreeObject):
     class Meta:
@@ -367,7 +703,7 @@ class BraintreeTransaction(BraintreeObject):
     disbursement_success = models.NullBooleanField(null=True, blank=True)
 
     # TODO: Discounts
-    # TODO: Disputes
+    # Disputes: see djbraintree.models.Dispute
 
     escrow_status = models.CharField(
         max_length=40, blank=True,
@@ -391,7 +727,8 @@ class BraintreeTransaction(BraintreeObject):
             ("application_incomplete", "application_incomplete"),
         ])
 
-    merchant_account_id = models.CharField(max_length=50, blank=True)
+    merchant_account_braintree_id = models.CharField(max_length=50,
+                                                     blank=True)
     order_id = models.CharField(max_length=200, blank=True)
     payment_instrument_type = models.CharField(max_length=100, blank=True)
 
@@ -497,7 +834,7 @@ class BraintreeTransaction(BraintreeObject):
 
             "escrow_status": obj.escrow_status or '',
             "gateway_rejection_reason": obj.gateway_rejection_reason or '',
-            "merchant_account_id": obj.merchant_account_id,
+            "merchant_account_braintree_id": obj.merchant_account_id or '',
             "order_id": obj.order_id or '',
             "payment_instrument_type": obj.payment_instrument_type,
 
@@ -529,7 +866,8 @@ class BraintreeTransaction(BraintreeObject):
             "voice_referral_number": obj.voice_referral_number or '',
         }
 
-        if obj.payment_instrument_type == braintree.PaymentInstrumentType.PayPalAccount:
+        paypal_account = braintree_sdk().PaymentInstrumentType.PayPalAccount
+        if obj.payment_instrument_type == paypal_account:
             paypal_fields = {
                 "authorization_id": obj.paypal_details.authorization_id,
                 "capture_id": obj.paypal_details.capture_id,
@@ -582,8 +920,7 @@ class BraintreeTransaction(BraintreeObject):
                     data[field] = None
 
             if field.endswith("date") or field.endswith("_at"):
-                if not data[field]:
-                    data[field] = None
+                data[field] = aware_datetime(data[field]) or None
 
         return data
 
@@ -703,7 +1040,11 @@ class BraintreeTransaction(BraintreeObject):
         :type manager: BraintreeObjectManager
         :param braintree_object: Object returned from API
         :type braintree_object: braintree.Transaction
+        :return: The MerchantAccount of this transaction, if any
         """
-        if getattr(braintree_object, "merchant_account_id"):
-            return manager.get_by_resource(braintree_object.merchant_account_id)
+        merchant_account_id = getattr(braintree_object, "merchant_account_id",
+                                      None)
+        if merchant_account_id:
+            # Transactions only carry the id, not a merchant account resource
+            return manager.get(braintree_id=merchant_account_id)
         return None
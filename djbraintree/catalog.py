@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: djbraintree.catalog
+   :synopsis: dj-braintree - Process-wide, version-stamped plan catalog
+
+The plans offered to payers are those configured in ``DJBRAINTREE_PLANS``,
+with their name, description and price taken from the ``Plan`` table
+(synced from ``braintree.Plan.all()``) once it knows them.
+
+Building the catalog takes a query, and every subscribe page and plan form
+needs it, so each process keeps it in memory. A version stamp in Django's
+cache says when to rebuild it: ``invalidate_catalog`` replaces the stamp,
+and every process notices on its next lookup. Use a cache backend shared
+by all processes (memcached, redis...) for them to see each other's
+changes; with the default local memory cache, each process only sees its
+own.
+"""
+
+from __future__ import unicode_literals
+
+from collections import OrderedDict
+from decimal import Decimal
+import threading
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+CATALOG_VERSION_KEY = "djbraintree:plan_catalog_version"
+
+_catalog = {"version": None, "plans": None}
+_lock = threading.Lock()
+
+
+def catalog_version():
+    """:return: The current catalog version stamp, created if missing"""
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        cache.add(CATALOG_VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def invalidate_catalog():
+    """Make every process rebuild its catalog on its next lookup."""
+    cache.set(CATALOG_VERSION_KEY, uuid.uuid4().hex, None)
+    with _lock:
+        _catalog["plans"] = None
+
+
+def build_catalog():
+    """
+    :return: Plan key -> plan dict (as in ``DJBRAINTREE_PLANS``, plus a
+        ``plan`` key), cheapest first. Prices are in cents.
+    :rtype: OrderedDict
+    """
+    from .models import Plan
+
+    configured = getattr(settings, "DJBRAINTREE_PLANS", {})
+    synced = Plan.braintree_objects.get_many_by_resources(
+        plan["braintree_plan_id"] for plan in configured.values()
+        if plan.get("braintree_plan_id"))
+
+    plans = []
+    for key, config in configured.items():
+        plan = dict(config, plan=key)
+        braintree_plan = synced.get(config.get("braintree_plan_id"))
+        if braintree_plan is not None:
+            # Braintree is the reference for what the plan costs
+            plan["name"] = braintree_plan.name or plan.get("name", key)
+            plan["description"] = (braintree_plan.description or
+                                   plan.get("description", ""))
+            if braintree_plan.price is not None:
+                plan["price"] = int(braintree_plan.price * Decimal(100))
+            if braintree_plan.currency_iso_code:
+                plan["currency"] = braintree_plan.currency_iso_code.lower()
+        plans.append((key, plan))
+    plans.sort(key=lambda item: item[1].get("price", 0))
+    return OrderedDict(plans)
+
+
+def get_catalog():
+    """
+    :return: The catalog (see ``build_catalog``), rebuilt only when its
+        version changed. Must not be modified.
+    :rtype: OrderedDict
+    """
+    version = catalog_version()
+    plans = _catalog["plans"]
+    if plans is None or _catalog["version"] != version:
+        plans = build_catalog()
+        with _lock:
+            _catalog["version"] = version
+            _catalog["plans"] = plans
+    return plans
+
+
+def get_plan(key):
+    """:return: The catalog entry of a plan, or None"""
+    return get_catalog().get(key)
+
+
+def plan_list():
+    """:return: The plans that exist in Braintree, cheapest first"""
+    return [plan for plan in get_catalog().values()
+            if plan.get("braintree_plan_id")]
+
+
+def plan_choices():
+    """:return: (key, name) choices of every plan, for forms"""
+    return [(key, plan.get("name", key))
+            for key, plan in get_catalog().items()]
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: djbraintree.charges
+   :synopsis: dj-braintree - Reusable, pre-validated charge payloads
+
+Recurring charges for the same plan share everything but the amount, the
+customer and the payment method. A ``ChargeTemplate`` validates those shared
+parts once and keeps them frozen, so that ``BraintreeCustomer.charge_with``
+only has to add the per-call fields::
+
+    MONTHLY = ChargeTemplate(
+        merchant_account_id="acme_usd",
+        options={"submit_for_settlement": True},
+        descriptor={"name": "ACME*MONTHLY"},
+    )
+
+    customer.charge_with(MONTHLY, Decimal("9.99"), payment_method_token=token)
+"""
+
+from __future__ import unicode_literals
+
+import copy
+
+# Fields supplied per call, which a template can't fix in advance.
+PER_CALL_FIELDS = ("amount", "customer_id", "payment_method_token",
+                   "payment_method_nonce")
+
+
+class ChargeTemplate(object):
+    __slots__ = ("_payload",)
+
+    def __init__(self, merchant_account_id=None, options=None,
+                 descriptor=None, **fields):
+        """
+        :param merchant_account_id: Merchant account to charge through
+        :param options: Transaction options, e.g. submit_for_settlement
+        :type options: dict
+        :param descriptor: Dynamic descriptor (name, phone, url)
+        :type descriptor: dict
+        :param fields: Any other static transaction sale parameters
+        :raises ValueError: If the static parts are invalid
+        """
+        payload = dict(fields)
+        for name in PER_CALL_FIELDS:
+            if name in payload:
+                raise ValueError(
+                    "{name} is given per charge, not in a template".format(
+                        name=name))
+        if options is not None:
+            if not isinstance(options, dict):
+                raise ValueError("Options must be a dictionary")
+            payload["options"] = options
+        if descriptor is not None:
+            if not isinstance(descriptor, dict):
+                raise ValueError("Descriptor must be a dictionary")
+            payload["descriptor"] = descriptor
+        if merchant_account_id:
+            payload["merchant_account_id"] = merchant_account_id
+
+        self._validate(payload)
+        # Deep copy so later changes to the caller's dicts can't leak in.
+        object.__setattr__(self, "_payload", copy.deepcopy(payload))
+
+    @staticmethod
+    def _validate(payload):
+        """Check the payload keys against the SDK's sale signature."""
+        from braintree.resource import Resource
+        from braintree.transaction import Transaction
+
+        try:
+            Resource.verify_keys(payload, Transaction.create_signature())
+        except KeyError as e:
+            raise ValueError("Invalid charge template: {0}".format(e))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ChargeTemplate is immutable")
+
+    @property
+    def merchant_account_id(self):
+        return self._payload.get("merchant_account_id")
+
+    @property
+    def options(self):
+        return copy.deepcopy(self._payload.get("options"))
+
+    @property
+    def descriptor(self):
+        return copy.deepcopy(self._payload.get("descriptor"))
+
+    def payload(self, **fields):
+        """
+        :return: A sale payload made of the template plus the given per-call
+            fields. Nested dicts are shared with the template and must not be
+            modified.
+        :rtype: dict
+        """
+        payload = self._payload.copy()
+        payload.update(fields)
+        return payload
+
+    def __repr__(self):
+        return "<ChargeTemplate {0!r}>".format(self._payload)
@@ -8,3 +8,19 @@ class SubscriptionCancellationFailure(Exception):
 
 class SubscriptionUpdateFailure(Exception):
     pass
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of calling Braintree while the circuit breaker for the
+    gateway is open.
+    """
+    pass
+
+
+class InvalidWebhookError(Exception):
+    """
+    Raised for webhooks with a missing, malformed or forged signature, or
+    a payload that can't be parsed.
+    """
+    pass
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: djbraintree.export
+   :synopsis: dj-braintree - Streaming export of local Transaction records
+
+Transactions are read in fixed-size chunks, each one a ``values_list()``
+query bounded by the previous chunk's last primary key, and written out
+before the next chunk is fetched. Memory use therefore depends on
+``chunk_size`` and not on the number of exported rows.
+
+CSV output only needs the standard library. Parquet output needs
+``pyarrow``; each chunk becomes one row group.
+"""
+
+from __future__ import unicode_literals
+
+import csv
+
+from django.db import models
+from django.utils import six
+
+from .models import Transaction
+
+DEFAULT_CHUNK_SIZE = 10000
+FORMATS = ("csv", "parquet")
+
+
+def export_fields(model=Transaction):
+    """
+    :return: The columns exported by default: every concrete field, with
+        foreign keys exported as their raw id.
+    :rtype: list[str]
+    """
+    return [field.attname for field in model._meta.concrete_fields]
+
+
+def transaction_queryset(start=None, end=None):
+    """
+    :param start: Only include transactions created at or after this time
+    :type start: datetime.datetime
+    :param end: Only include transactions created before this time
+    :type end: datetime.datetime
+    """
+    queryset = Transaction.objects.all()
+    if start is not None:
+        queryset = queryset.filter(created_at__gte=start)
+    if end is not None:
+        queryset = queryset.filter(created_at__lt=end)
+    return queryset
+
+
+def iter_chunks(queryset, fields, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yield lists of ``values_list`` tuples, at most ``chunk_size`` long, in
+    primary key order. Each chunk is its own keyset-bounded query, so no
+    more than one chunk is ever held in memory.
+
+    :rtype: collections.Iterator[list[tuple]]
+    """
+    pk_name = queryset.model._meta.pk.attname
+    fields = list(fields)
+    if pk_name in fields:
+        pk_index = fields.index(pk_name)
+        columns = fields
+    else:
+        pk_index = len(fields)
+        columns = fields + [pk_name]
+
+    queryset = queryset.order_by(pk_name)
+    last_pk = None
+    while True:
+        chunk_qs = queryset
+        if last_pk is not None:
+            chunk_qs = chunk_qs.filter(pk__gt=last_pk)
+        chunk = list(chunk_qs.values_list(*columns)[:chunk_size].iterator())
+        if not chunk:
+            return
+        last_pk = chunk[-1][pk_index]
+        if columns is not fields:
+            chunk = [row[:pk_index] for row in chunk]
+        yield chunk
+
+
+def _csv_row(row):
+    """Python 2's csv module only writes byte strings."""
+    if not six.PY2:
+        return row
+    return [value.encode("utf-8") if isinstance(value, six.text_type)
+            else value for value in row]
+
+
+def write_csv(stream, chunks, fields):
+    """
+    :param stream: A text file-like object, or a binary one on Python 2
+    :return: The number of rows written
+    :rtype: int
+    """
+    writer = csv.writer(stream)
+    writer.writerow(_csv_row(fields))
+    count = 0
+    for chunk in chunks:
+        writer.writerows(_csv_row(row) for row in chunk)
+        count += len(chunk)
+    return count
+
+
+def _arrow_type(pa, field):
+    if isinstance(field, models.DecimalField):
+        return pa.decimal128(field.max_digits, field.decimal_places)
+    if isinstance(field, models.DateTimeField):
+        return pa.timestamp("us", tz="UTC")
+    if isinstance(field, models.DateField):
+        return pa.date32()
+    if isinstance(field, (models.BooleanField, models.NullBooleanField)):
+        return pa.bool_()
+    if isinstance(field, (models.AutoField, models.IntegerField,
+                          models.ForeignKey)):
+        return pa.int64()
+    return pa.string()
+
+
+def write_parquet(stream, chunks, fields, model=Transaction):
+    """
+    :param stream: A path or binary file-like object
+    :return: The number of rows written
+    :rtype: int
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    model_fields = dict(
+        (field.attname, field) for field in model._meta.concrete_fields)
+    schema = pa.schema([
+        pa.field(name, _arrow_type(pa, model_fields[name]))
+        for name in fields])
+
+    count = 0
+    writer = pq.ParquetWriter(stream, schema)
+    try:
+        for chunk in chunks:
+            columns = zip(*chunk)
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(list(column), type=field.type)
+                 for column, field in zip(columns, schema)],
+                schema=schema))
+            count += len(chunk)
+    finally:
+        writer.close()
+    return count
+
+
+def export_transactions(stream, format="csv", start=None, end=None,
+                        fields=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Stream local Transaction rows to ``stream`` as CSV or Parquet.
+
+    :param stream: Text stream for CSV (binary on Python 2); path or binary
+        stream for Parquet
+    :param format: One of ``FORMATS``
+    :param start: Only export transactions created at or after this time
+    :param end: Only export transactions created before this time
+    :param fields: Columns to export, defaults to ``export_fields()``
+    :param chunk_size: Rows fetched and written per chunk
+    :return: The number of rows written
+    :rtype: int
+    """
+    if format not in FORMATS:
+        raise ValueError("Unknown export format: {format}".format(
+            format=format))
+    fields = list(fields or export_fields())
+    chunks = iter_chunks(transaction_queryset(start, end), fields,
+                         chunk_size=chunk_size)
+    if format == "parquet":
+        return write_parquet(stream, chunks, fields)
+    return write_csv(stream, chunks, fields)
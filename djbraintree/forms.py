@@ -9,11 +9,12 @@
 
 from django import forms
 
-from .settings import PLAN_CHOICES
+from .catalog import plan_choices
 
 
 class PlanForm(forms.Form):
-    plan = forms.ChoiceField(choices=PLAN_CHOICES)
+    # A callable, so that choices follow the plan catalog
+    plan = forms.ChoiceField(choices=plan_choices)
 
 
 class CancelSubscriptionForm(forms.Form):
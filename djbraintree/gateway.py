@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: djbraintree.gateway
+   :synopsis: dj-braintree - Lazy Braintree SDK import and configuration
+
+Importing the ``braintree`` SDK and configuring it is deferred until the
+first gateway call, so that management commands, migrations and test
+processes which never talk to Braintree don't pay for it.
+Configuration happens once per process, guarded by a lock, and is reset
+when the ``BRAINTREE_*`` settings change.
+
+Marketplaces holding several sets of merchant credentials can list them in
+``DJBRAINTREE_MERCHANTS``. Each merchant gets its own ``BraintreeGateway``,
+with its own pooled HTTP session, and ``BraintreeObject.api()`` routes
+through it inside ``using_merchant()`` (or when passed ``merchant=``)::
+
+    DJBRAINTREE_MERCHANTS = {
+        "acme": {
+            "merchant_id": "...",
+            "public_key": "...",
+            "private_key": "...",
+            "environment": "production",
+        },
+    }
+
+    with using_merchant("acme"):
+        customer.charge(amount, payment_method_token=token)
+"""
+
+from __future__ import unicode_literals
+
+from contextlib import contextmanager
+import threading
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+BRAINTREE_SETTINGS = ("BRAINTREE_PUBLIC_KEY", "BRAINTREE_PRIVATE_KEY",
+                      "BRAINTREE_MERCHANT_ID", "BRAINTREE_ENVIRONMENT",
+                      "DJBRAINTREE_MERCHANTS")
+
+# Connections kept alive per merchant gateway
+HTTP_POOL_SIZE = 10
+
+_lock = threading.Lock()
+_configured = False
+_gateways = {}
+_local = threading.local()
+_pooled_http_class = None
+
+
+def configure_braintree():
+    """
+    Configure the SDK's global ``braintree.Configuration`` from the
+    ``BRAINTREE_*`` settings.
+    """
+    global _configured
+    import braintree
+
+    environment = getattr(settings, "BRAINTREE_ENVIRONMENT", "sandbox")
+    braintree.Configuration.configure(
+        braintree.Environment.All[environment],
+        merchant_id=settings.BRAINTREE_MERCHANT_ID,
+        public_key=settings.BRAINTREE_PUBLIC_KEY,
+        private_key=settings.BRAINTREE_PRIVATE_KEY)
+    _configured = True
+
+
+def ensure_configured():
+    """Configure the SDK unless this process already did."""
+    if _configured:
+        return
+    with _lock:
+        if not _configured:
+            configure_braintree()
+
+
+def braintree_sdk():
+    """
+    :return: The ``braintree`` module, configured and ready for API calls.
+    """
+    ensure_configured()
+    import braintree
+    return braintree
+
+
+def reset_configuration():
+    """Make the next gateway call re-read the settings."""
+    global _configured
+    with _lock:
+        _configured = False
+        _gateways.clear()
+
+
+def _pooled_http():
+    """
+    An ``http_strategy`` for ``braintree.Configuration`` that sends requests
+    through one ``requests.Session`` per configuration, so each merchant
+    gateway keeps its own pool of connections instead of opening a new one
+    per call. Built on first use to keep the SDK import lazy.
+    """
+    global _pooled_http_class
+    if _pooled_http_class is None:
+        import requests
+        from braintree.util.http import Http
+
+        class PooledHttp(Http):
+            def __init__(self, config, environment=None):
+                super(PooledHttp, self).__init__(config, environment)
+                self.session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(
+                    pool_connections=HTTP_POOL_SIZE,
+                    pool_maxsize=HTTP_POOL_SIZE)
+                self.session.mount("https://", adapter)
+                self.session.mount("http://", adapter)
+
+            def http_do(self, http_verb, path, headers, request_body):
+                if not path.startswith(self.config.base_url()):
+                    path = self.config.base_url() + path
+                response = self.session.request(
+                    http_verb, path,
+                    headers=headers,
+                    data=request_body,
+                    verify=self.environment.ssl_certificate,
+                    timeout=self.config.timeout)
+                return [response.status_code, response.text]
+
+        _pooled_http_class = PooledHttp
+    return _pooled_http_class
+
+
+def merchant_settings():
+    """
+    :return: Credentials per merchant, from ``DJBRAINTREE_MERCHANTS``.
+    :rtype: dict
+    """
+    return getattr(settings, "DJBRAINTREE_MERCHANTS", {})
+
+
+def _build_gateway(merchant):
+    import braintree
+
+    try:
+        credentials = merchant_settings()[merchant]
+    except KeyError:
+        raise ImproperlyConfigured(
+            "Unknown merchant '{merchant}', add it to "
+            "DJBRAINTREE_MERCHANTS.".format(merchant=merchant))
+    environment = credentials.get("environment", "sandbox")
+    return braintree.BraintreeGateway(braintree.Configuration(
+        braintree.Environment.All[environment],
+        merchant_id=credentials["merchant_id"],
+        public_key=credentials["public_key"],
+        private_key=credentials["private_key"],
+        timeout=credentials.get("timeout", 60),
+        http_strategy=_pooled_http()))
+
+
+def get_gateway(merchant):
+    """
+    :return: The gateway for ``merchant``, created on first use and shared
+        by every thread of the process afterwards.
+    :rtype: braintree.BraintreeGateway
+    """
+    try:
+        return _gateways[merchant]
+    except KeyError:
+        pass
+    with _lock:
+        if merchant not in _gateways:
+            _gateways[merchant] = _build_gateway(merchant)
+        return _gateways[merchant]
+
+
+def current_merchant():
+    """
+    :return: The merchant selected by the innermost ``using_merchant`` block
+        of this thread, or None for the default, globally configured one.
+    """
+    return getattr(_local, "merchant", None)
+
+
+@contextmanager
+def using_merchant(merchant):
+    """Route gateway calls made in this block through ``merchant``."""
+    previous = current_merchant()
+    _local.merchant = merchant
+    try:
+        yield get_gateway(merchant) if merchant is not None else None
+    finally:
+        _local.merchant = previous
+
+
+def gateway_settings_changed(setting, **kwargs):
+    """``setting_changed`` receiver that drops the current configuration."""
+    if setting in BRAINTREE_SETTINGS:
+        reset_configuration()
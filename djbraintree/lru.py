@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: djbraintree.lru
+   :synopsis: dj-braintree - Small thread-safe in-process LRU cache
+"""
+
+from __future__ import unicode_literals
+
+from collections import OrderedDict
+import threading
+import time
+
+_missing = object()
+
+
+class LRUCache(object):
+    """
+    A bounded mapping that evicts the least recently used key once it holds
+    ``maxsize`` entries, and optionally forgets entries ``ttl`` seconds
+    after they were set. Safe to share between threads.
+    """
+
+    def __init__(self, maxsize=1024, ttl=None, clock=time.time):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, _missing)
+            if entry is _missing:
+                return default
+            value, expires = entry
+            if expires is not None and self.clock() >= expires:
+                return default
+            # Re-insert to mark the key as most recently used
+            self._data[key] = entry
+            return value
+
+    def set(self, key, value):
+        expires = self.clock() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (value, expires)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key):
+        return self.get(key, _missing) is not _missing
+
+    def __len__(self):
+        return len(self._data)
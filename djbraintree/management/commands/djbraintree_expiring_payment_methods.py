@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, unicode_literals
+
+from django.core.management.base import BaseCommand
+
+from ...models import PaymentMethod
+
+
+class Command(BaseCommand):
+
+    help = "List vaulted payment methods expiring within a number of days"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days", type=int, default=30,
+            help="List payment methods expiring within this many days.")
+        parser.add_argument(
+            "--sync", action="store_true", default=False,
+            help="Sync payment methods from the vault first.")
+
+    def handle(self, *args, **options):
+        if options["sync"]:
+            synced = PaymentMethod.sync_all()
+            print("Synced {0} payment methods".format(synced))
+
+        expiring = PaymentMethod.objects.expiring_within(
+            options["days"]).order_by(
+            "expires_on", "id")
+        count = 0
+        for payment_method in expiring.iterator():
+            count += 1
+            print("{token}\t{customer}\t{card_type} {last_4}\t{expires_on}".format(
+                token=payment_method.token,
+                customer=payment_method.customer_braintree_id,
+                card_type=payment_method.card_type,
+                last_4=payment_method.last_4,
+                expires_on=payment_method.expires_on.isoformat()))
+        print("{0} payment methods expire within {1} days".format(
+            count, options["days"]))
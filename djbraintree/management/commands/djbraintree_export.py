@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import datetime
+import io
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import six, timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from ...export import export_transactions, DEFAULT_CHUNK_SIZE, FORMATS
+
+
+def _parse_time(value):
+    """Accept an ISO date or datetime; naive values use the current timezone."""
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise CommandError("Invalid date or datetime: {0}".format(value))
+        parsed = datetime.datetime.combine(day, datetime.time())
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, timezone.get_current_timezone())
+    return parsed
+
+
+def _open_csv(path):
+    """Python 2's csv module writes byte strings, Python 3's text."""
+    if six.PY2:
+        return open(path, "wb")
+    return io.open(path, "w", newline="")
+
+
+class Command(BaseCommand):
+
+    help = "Export local Transaction records to CSV or Parquet"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--format", choices=FORMATS, default="csv",
+            help="Output format.")
+        parser.add_argument(
+            "--output",
+            help="Output file. CSV defaults to stdout; required for Parquet.")
+        parser.add_argument(
+            "--start", type=_parse_time,
+            help="Only export transactions created at or after this date.")
+        parser.add_argument(
+            "--end", type=_parse_time,
+            help="Only export transactions created before this date.")
+        parser.add_argument(
+            "--fields",
+            help="Comma separated list of columns to export.")
+        parser.add_argument(
+            "--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+            help="Number of rows read and written at a time.")
+
+    def handle(self, *args, **options):
+        fields = options["fields"].split(",") if options["fields"] else None
+        export_options = dict(
+            format=options["format"],
+            start=options["start"],
+            end=options["end"],
+            fields=fields,
+            chunk_size=options["chunk_size"],
+        )
+
+        if options["format"] == "parquet":
+            if not options["output"]:
+                raise CommandError("--output is required for Parquet exports.")
+            try:
+                count = export_transactions(options["output"], **export_options)
+            except ImportError:
+                raise CommandError("Parquet exports require pyarrow.")
+        elif options["output"]:
+            with _open_csv(options["output"]) as stream:
+                count = export_transactions(stream, **export_options)
+        else:
+            count = export_transactions(sys.stdout, **export_options)
+
+        self.stderr.write("Exported {0} transactions".format(count))
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, unicode_literals
+
+import datetime
+
+from django.core.management.base import BaseCommand
+
+from ...models import Dispute
+
+
+def parse_date(value):
+    return datetime.datetime.strptime(value, "%Y-%m-%d").date()
+
+
+class Command(BaseCommand):
+
+    help = "List open disputes, most urgent reply first"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days", type=int, default=None,
+            help="Only list disputes to reply to within this many days.")
+        parser.add_argument(
+            "--sync", action="store_true", default=False,
+            help="Sync disputes from Braintree first.")
+        parser.add_argument(
+            "--since", type=parse_date, default=None,
+            help="With --sync, only sync disputes received since this "
+                 "date (YYYY-MM-DD).")
+
+    def handle(self, *args, **options):
+        if options["sync"]:
+            synced = Dispute.sync_all(received_since=options["since"])
+            print("Synced {0} disputes".format(synced))
+
+        if options["days"] is None:
+            disputes = Dispute.objects.open()
+        else:
+            disputes = Dispute.objects.reply_due_within(options["days"])
+        count = 0
+        for dispute in disputes.iterator():
+            count += 1
+            print("{id}\t{transaction}\t{status}\t{amount} {currency}\t"
+                  "{reply_by}".format(
+                      id=dispute.braintree_id,
+                      transaction=dispute.transaction_braintree_id,
+                      status=dispute.status,
+                      amount=dispute.amount,
+                      currency=dispute.currency_iso_code,
+                      reply_by=(dispute.reply_by_date.isoformat()
+                                if dispute.reply_by_date else "")))
+        print("{0} open disputes".format(count))
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, unicode_literals
+
+from multiprocessing import Pool
+import time
+
+from django.core.management.base import BaseCommand
+
+from ... import settings as djbraintree_settings
+from ...webhook_queue import (claim_batch, close_connections, process_batch,
+                              release_stale_claims)
+
+
+class Command(BaseCommand):
+
+    help = "Process queued Braintree webhook events"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int,
+            default=djbraintree_settings.WEBHOOK_BATCH_SIZE,
+            help="Number of events claimed at a time.")
+        parser.add_argument(
+            "--processes", type=int, default=1,
+            help="Number of processes events are processed in.")
+        parser.add_argument(
+            "--once", action="store_true", default=False,
+            help="Exit once the queue is empty instead of waiting for events.")
+        parser.add_argument(
+            "--sleep", type=float, default=1.0,
+            help="Seconds to wait before polling an empty queue again.")
+
+    def handle(self, *args, **options):
+        pool = None
+        if options["processes"] > 1:
+            close_connections()
+            pool = Pool(options["processes"], initializer=close_connections)
+        try:
+            while True:
+                released = release_stale_claims()
+                if released:
+                    print("Released {0} stale events".format(released))
+                groups = claim_batch(options["batch_size"])
+                if groups:
+                    processed = process_batch(groups, pool)
+                    print("Processed {0} events for {1} subjects".format(
+                        processed, len(groups)))
+                elif options["once"]:
+                    break
+                else:
+                    time.sleep(options["sleep"])
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
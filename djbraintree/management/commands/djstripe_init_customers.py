@@ -1,9 +1,10 @@
 # -*- coding: utf-8 -*-
-from __future__ import unicode_literals
+from __future__ import print_function, unicode_literals
 
 from django.core.management.base import BaseCommand
 
-from ...models import Customer
+from ...provisioning import (provision_customers, DEFAULT_CHUNK_SIZE,
+                             DEFAULT_WORKERS)
 from ...settings import get_payer_model
 
 
@@ -11,8 +12,23 @@ class Command(BaseCommand):
 
     help = "Create customer objects for existing subscribers that don't have one"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+            help="Number of payers provisioned per batch.")
+        parser.add_argument(
+            "--workers", type=int, default=DEFAULT_WORKERS,
+            help="Number of concurrent Braintree customer creations.")
+        parser.add_argument(
+            "--checkpoint",
+            help="Path of a checkpoint file used to resume an interrupted run.")
+
     def handle(self, *args, **options):
-        for subscriber in get_payer_model().objects.filter(customer__isnull=True):
-            # use get_or_create in case of race conditions on large subscriber bases
-            Customer.get_or_create(subscriber=subscriber)
-            print("Created subscriber for {0}".format(subscriber.email))
+        created, failed = provision_customers(
+            get_payer_model().objects.filter(customer__isnull=True),
+            chunk_size=options["chunk_size"],
+            workers=options["workers"],
+            checkpoint_path=options["checkpoint"],
+            log=print,
+        )
+        print("Created {0} customers, {1} failed".format(created, failed))
@@ -1,5 +1,5 @@
 # -*- coding: utf-8 -*-
-from __future__ import unicode_literals
+from __future__ import print_function, unicode_literals
 
 from django.core.management.base import BaseCommand
 
@@ -8,7 +8,7 @@ from ...sync import sync_plans
 
 class Command(BaseCommand):
 
-    help = "Make sure your Braintree account has the plans"
+    help = "Sync the plans of your Braintree account"
 
     def handle(self, *args, **options):
-        sync_plans()
+        print("Synced {0} plans".format(sync_plans()))
@@ -2,10 +2,44 @@
 
 from __future__ import unicode_literals
 
+import datetime
 import decimal
 
 from django.core.exceptions import ObjectDoesNotExist
 from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+from . import settings as djbraintree_settings
+from .utils import ACTIVE_SUBSCRIPTION_STATUSES, OPEN_DISPUTE_STATUSES
+
+# Ids per "braintree_id IN (...)" query, kept well below SQLite's limit of 999
+# query parameters.
+LOOKUP_CHUNK_SIZE = 500
+
+
+def _resource_ids(braintree_objects):
+    """
+    Braintree ids from an iterable of resources (or plain ids), skipping
+    "empty" resources without an id, in order and without duplicates.
+    """
+    seen = set()
+    for braintree_object in braintree_objects:
+        braintree_id = getattr(braintree_object, "id", braintree_object)
+        if braintree_id and braintree_id not in seen:
+            seen.add(braintree_id)
+            yield braintree_id
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
 
 
 class BraintreeObjectManager(models.Manager):
@@ -36,3 +70,101 @@ class BraintreeObjectManager(models.Manager):
             # it doesn't exist on braintree, so what record are we fetching?
             # (The braintree python SDK can produce "empty" resources).
             raise self.model.DoesNotExist
+
+    def get_many_by_resources(self, braintree_objects,
+                              chunk_size=LOOKUP_CHUNK_SIZE):
+        """
+        Retrieve the local BraintreeObjects matching many response resources,
+        with one query per ``chunk_size`` resources.
+
+        :param braintree_objects: Braintree response resources or braintree ids
+        :type braintree_objects: collections.Iterable
+        :return: The matching records, keyed by braintree_id. Resources
+            without a local record are absent.
+        :rtype: dict
+        """
+        found = {}
+        for ids in _chunks(_resource_ids(braintree_objects), chunk_size):
+            for obj in self.filter(braintree_id__in=ids):
+                found[obj.braintree_id] = obj
+        return found
+
+    def existing_ids(self, braintree_objects, chunk_size=LOOKUP_CHUNK_SIZE):
+        """
+        Like get_many_by_resources, but only returns the braintree ids that
+        exist locally.
+
+        :rtype: set
+        """
+        existing = set()
+        for ids in _chunks(_resource_ids(braintree_objects), chunk_size):
+            existing.update(self.filter(braintree_id__in=ids).values_list(
+                "braintree_id", flat=True))
+        return existing
+
+
+class SubscriptionQuerySet(models.QuerySet):
+
+    def active(self, today=None):
+        """
+        Subscriptions granting access today: active or past due ones, plus
+        canceled ones that are paid through today when cancellations take
+        effect at the end of the period.
+        """
+        today = today or timezone.now().date()
+        query = Q(status__in=ACTIVE_SUBSCRIPTION_STATUSES)
+        if djbraintree_settings.CANCELLATION_AT_PERIOD_END:
+            query |= Q(status="Canceled", paid_through_date__gte=today)
+        return self.filter(query)
+
+    def active_for(self, entity_ids, today=None):
+        """
+        The active subscriptions of many payers, in one query.
+
+        :param entity_ids: Primary keys of payer model instances
+        """
+        return self.active(today).filter(customer__entity_id__in=entity_ids)
+
+    def active_entity_ids(self, entity_ids, today=None):
+        """
+        :return: Those of ``entity_ids`` that have an active subscription
+        :rtype: set
+        """
+        return set(self.active_for(entity_ids, today).values_list(
+            "customer__entity_id", flat=True))
+
+    def due_for_renewal(self, today=None):
+        """Active subscriptions whose next billing date has come."""
+        today = today or timezone.now().date()
+        return self.filter(status__in=ACTIVE_SUBSCRIPTION_STATUSES,
+                           next_billing_date__lte=today)
+
+
+class PaymentMethodQuerySet(models.QuerySet):
+
+    def expiring_within(self, days, today=None):
+        """
+        Payment methods that are still valid today but expire within
+        ``days`` days. Answered from the ``expires_on`` index.
+        """
+        today = today or timezone.now().date()
+        return self.filter(
+            expires_on__gte=today,
+            expires_on__lte=today + datetime.timedelta(days=days))
+
+
+class DisputeQuerySet(models.QuerySet):
+
+    def open(self):
+        """Disputes not decided yet, most urgent reply first."""
+        return self.filter(status__in=OPEN_DISPUTE_STATUSES).order_by(
+            "reply_by_date")
+
+    def reply_due_within(self, days, today=None):
+        """
+        Open disputes to reply to within ``days`` days, overdue ones
+        included. Answered from the ``(status, reply_by_date)`` index.
+        """
+        today = today or timezone.now().date()
+        return self.open().filter(
+            reply_by_date__lte=today + datetime.timedelta(days=days))
@@ -5,7 +5,7 @@ from django.shortcuts import redirect
 
 import fnmatch
 
-from .utils import subscriber_has_active_subscription
+from .utils import entity_has_active_subscription
 from .settings import subscriber_request_callback
 
 
@@ -47,8 +47,17 @@ class SubscriptionPaymentMiddleware(object):
             "home",  # Site homepage
             "fn:/accounts*",  # anything in the accounts/ URL path
         )
+
+    Works both in ``MIDDLEWARE_CLASSES`` and, on Django 1.10+, in
+    ``MIDDLEWARE``.
     """
 
+    def __init__(self, get_response=None):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.process_request(request) or self.get_response(request)
+
     def process_request(self, request):
 
         # Does the request match any of the docstring rules?
@@ -92,5 +101,8 @@ class SubscriptionPaymentMiddleware(object):
 
         subscriber = subscriber_request_callback(request)
 
-        if not subscriber_has_active_subscription(subscriber):
-            return redirect(DJSTRIPE_SUBSCRIPTION_REDIRECT)
+        if not entity_has_active_subscription(subscriber):
+            return self.redirect_to_subscribe()
+
+    def redirect_to_subscribe(self):
+        return redirect(DJSTRIPE_SUBSCRIPTION_REDIRECT)
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import model_utils.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('djbraintree', '0002_transaction_history_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChargeAttempt',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', model_utils.fields.AutoCreatedField(default=django.utils.timezone.now, editable=False, verbose_name='created')),
+                ('modified', model_utils.fields.AutoLastModifiedField(default=django.utils.timezone.now, editable=False, verbose_name='modified')),
+                ('idempotency_key', models.CharField(max_length=255, unique=True)),
+                ('order_id', models.CharField(db_index=True, max_length=200)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=7)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('succeeded', 'Succeeded'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('braintree_transaction_id', models.CharField(blank=True, max_length=50)),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='charge_attempts', to='djbraintree.Customer')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
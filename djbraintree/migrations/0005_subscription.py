@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import model_utils.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('djbraintree', '0004_webhookevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Subscription',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', model_utils.fields.AutoCreatedField(default=django.utils.timezone.now, editable=False, verbose_name='created')),
+                ('modified', model_utils.fields.AutoLastModifiedField(default=django.utils.timezone.now, editable=False, verbose_name='modified')),
+                ('braintree_id', models.CharField(max_length=50, unique=True)),
+                ('balance', models.DecimalField(decimal_places=2, max_digits=7, null=True)),
+                ('billing_day_of_month', models.PositiveSmallIntegerField(null=True)),
+                ('billing_period_start_date', models.DateField(blank=True, null=True)),
+                ('billing_period_end_date', models.DateField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(blank=True, null=True)),
+                ('current_billing_cycle', models.PositiveIntegerField(null=True)),
+                ('days_past_due', models.PositiveIntegerField(null=True)),
+                ('failure_count', models.PositiveIntegerField(default=0)),
+                ('first_billing_date', models.DateField(blank=True, null=True)),
+                ('merchant_account_id', models.CharField(blank=True, max_length=255)),
+                ('never_expires', models.BooleanField(default=True)),
+                ('next_billing_date', models.DateField(blank=True, null=True)),
+                ('number_of_billing_cycles', models.PositiveIntegerField(null=True)),
+                ('paid_through_date', models.DateField(blank=True, null=True)),
+                ('payment_method_token', models.CharField(blank=True, max_length=80)),
+                ('plan_id', models.CharField(blank=True, max_length=100)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=7, null=True)),
+                ('status', models.CharField(blank=True, choices=[('Active', 'Active'), ('Canceled', 'Canceled'), ('Expired', 'Expired'), ('Past Due', 'Past Due'), ('Pending', 'Pending')], max_length=20)),
+                ('trial_duration', models.PositiveIntegerField(null=True)),
+                ('trial_duration_unit', models.CharField(blank=True, max_length=10)),
+                ('trial_period', models.BooleanField(default=False)),
+                ('updated_at', models.DateTimeField(null=True)),
+                ('customer', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='subscriptions', to='djbraintree.Customer')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.AlterIndexTogether(
+            name='subscription',
+            index_together=set([('customer', 'status'), ('status', 'paid_through_date'), ('status', 'next_billing_date')]),
+        ),
+    ]
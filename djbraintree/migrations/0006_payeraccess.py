@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import datetime
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_payer_access(apps, schema_editor):
+    Subscription = apps.get_model('djbraintree', 'Subscription')
+    PayerAccess = apps.get_model('djbraintree', 'PayerAccess')
+    cancellation_at_period_end = not getattr(settings, 'DJBRAINTREE_PRORATION_POLICY', False)
+
+    access = {}
+    subscriptions = Subscription.objects.filter(
+        customer__entity__isnull=False).values_list(
+        'customer__entity_id', 'status', 'paid_through_date')
+    for entity_id, status, paid_through_date in subscriptions.iterator():
+        if status in ('Active', 'Past Due'):
+            until = datetime.date.max
+        elif status == 'Canceled' and cancellation_at_period_end:
+            until = paid_through_date
+        else:
+            until = None
+        current = access.get(entity_id)
+        if current is None or (until is not None and until > current):
+            access[entity_id] = until
+    PayerAccess.objects.bulk_create([
+        PayerAccess(entity_id=entity_id, active_until=active_until)
+        for entity_id, active_until in access.items()])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('djbraintree', '0005_subscription'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PayerAccess',
+            fields=[
+                ('entity', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='djbraintree_access', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('active_until', models.DateField(db_index=True, null=True)),
+                ('modified', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(populate_payer_access, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import model_utils.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('djbraintree', '0006_payeraccess'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentMethod',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', model_utils.fields.AutoCreatedField(default=django.utils.timezone.now, editable=False, verbose_name='created')),
+                ('modified', model_utils.fields.AutoLastModifiedField(default=django.utils.timezone.now, editable=False, verbose_name='modified')),
+                ('braintree_id', models.CharField(max_length=50, unique=True)),
+                ('card_bin', models.CharField(blank=True, max_length=6)),
+                ('card_type', models.CharField(blank=True, max_length=100)),
+                ('cardholder_name', models.CharField(blank=True, max_length=255)),
+                ('commercial', models.CharField(blank=True, max_length=10)),
+                ('country_of_issuance', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(blank=True, null=True)),
+                ('customer_braintree_id', models.CharField(blank=True, max_length=50)),
+                ('customer_location', models.CharField(blank=True, choices=[('US', 'US or Unspecified'), ('International', 'International')], max_length=13)),
+                ('debit', models.CharField(blank=True, max_length=10)),
+                ('default', models.NullBooleanField()),
+                ('durbin_regulated', models.CharField(blank=True, max_length=10)),
+                ('expiration_date', models.CharField(blank=True, max_length=7)),
+                ('expiration_month', models.CharField(blank=True, max_length=2)),
+                ('expiration_year', models.CharField(blank=True, max_length=4)),
+                ('expires_on', models.DateField(blank=True, db_index=True, null=True)),
+                ('expired', models.BooleanField(default=False)),
+                ('healthcare', models.CharField(blank=True, max_length=10)),
+                ('image_url', models.URLField(blank=True, null=True)),
+                ('issuing_bank', models.TextField(blank=True)),
+                ('last_4', models.CharField(blank=True, max_length=4)),
+                ('masked_number', models.CharField(blank=True, max_length=16)),
+                ('payroll', models.CharField(blank=True, max_length=10)),
+                ('prepaid', models.CharField(blank=True, max_length=10)),
+                ('token', models.CharField(blank=True, max_length=80)),
+                ('unique_number_identifier', models.CharField(blank=True, max_length=140)),
+                ('updated_at', models.DateTimeField(null=True)),
+                ('customer', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='payment_methods', to='djbraintree.Customer')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.AlterIndexTogether(
+            name='paymentmethod',
+            index_together=set([('customer', 'default')]),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+def populate_default_tokens(apps, schema_editor):
+    Customer = apps.get_model('djbraintree', 'Customer')
+    PaymentMethod = apps.get_model('djbraintree', 'PaymentMethod')
+    defaults = PaymentMethod.objects.filter(
+        default=True, customer__isnull=False).values_list('customer_id', 'token')
+    for customer_id, token in defaults.iterator():
+        Customer.objects.filter(pk=customer_id).update(default_payment_method_token=token)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('djbraintree', '0007_paymentmethod'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='default_payment_method_token',
+            field=models.CharField(blank=True, max_length=80),
+        ),
+        migrations.RunPython(populate_default_tokens, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import model_utils.fields
+
+
+def link_merchant_accounts(apps, schema_editor):
+    MerchantAccount = apps.get_model('djbraintree', 'MerchantAccount')
+    Transaction = apps.get_model('djbraintree', 'Transaction')
+    braintree_ids = Transaction.objects.exclude(
+        merchant_account_braintree_id='').values_list(
+        'merchant_account_braintree_id', flat=True).distinct()
+    for braintree_id in list(braintree_ids):
+        merchant_account, _ = MerchantAccount.objects.get_or_create(braintree_id=braintree_id)
+        Transaction.objects.filter(merchant_account_braintree_id=braintree_id).update(
+            merchant_account=merchant_account)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('djbraintree', '0008_customer_default_payment_method_token'),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name='transaction',
+            old_name='merchant_account_id',
+            new_name='merchant_account_braintree_id',
+        ),
+        migrations.CreateModel(
+            name='MerchantAccount',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', model_utils.fields.AutoCreatedField(default=django.utils.timezone.now, editable=False, verbose_name='created')),
+                ('modified', model_utils.fields.AutoLastModifiedField(default=django.utils.timezone.now, editable=False, verbose_name='modified')),
+                ('braintree_id', models.CharField(max_length=50, unique=True)),
+                ('currency_iso_code', models.CharField(blank=True, max_length=3)),
+                ('default', models.NullBooleanField()),
+                ('master_merchant_account_id', models.CharField(blank=True, max_length=255)),
+                ('status', models.CharField(blank=True, choices=[('active', 'active'), ('pending', 'pending'), ('suspended', 'suspended')], max_length=20)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='merchant_account',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='transactions', to='djbraintree.MerchantAccount'),
+        ),
+        migrations.RunPython(link_merchant_accounts, migrations.RunPython.noop),
+    ]
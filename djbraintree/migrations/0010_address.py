@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import model_utils.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('djbraintree', '0009_merchantaccount'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Address',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', model_utils.fields.AutoCreatedField(default=django.utils.timezone.now, editable=False, verbose_name='created')),
+                ('modified', model_utils.fields.AutoLastModifiedField(default=django.utils.timezone.now, editable=False, verbose_name='modified')),
+                ('braintree_id', models.CharField(max_length=50, unique=True)),
+                ('first_name', models.CharField(blank=True, max_length=255)),
+                ('last_name', models.CharField(blank=True, max_length=255)),
+                ('company', models.CharField(blank=True, max_length=255)),
+                ('street_address', models.CharField(blank=True, max_length=255)),
+                ('extended_address', models.CharField(blank=True, max_length=255)),
+                ('locality', models.CharField(blank=True, max_length=255)),
+                ('region', models.CharField(blank=True, max_length=255)),
+                ('postal_code', models.CharField(blank=True, max_length=20)),
+                ('country_name', models.CharField(blank=True, max_length=255)),
+                ('country_code_alpha2', models.CharField(blank=True, max_length=2)),
+                ('country_code_alpha3', models.CharField(blank=True, max_length=3)),
+                ('country_code_numeric', models.CharField(blank=True, max_length=3)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='billing_address',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='djbraintree.Address'),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='shipping_address',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='djbraintree.Address'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.utils.timezone
+import model_utils.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('djbraintree', '0010_address'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Plan',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', model_utils.fields.AutoCreatedField(default=django.utils.timezone.now, editable=False, verbose_name='created')),
+                ('modified', model_utils.fields.AutoLastModifiedField(default=django.utils.timezone.now, editable=False, verbose_name='modified')),
+                ('braintree_id', models.CharField(max_length=50, unique=True)),
+                ('billing_day_of_month', models.PositiveSmallIntegerField(null=True)),
+                ('billing_frequency', models.PositiveSmallIntegerField(null=True)),
+                ('created_at', models.DateTimeField(null=True)),
+                ('currency_iso_code', models.CharField(blank=True, max_length=3)),
+                ('description', models.TextField(blank=True)),
+                ('name', models.CharField(blank=True, max_length=255)),
+                ('number_of_billing_cycles', models.PositiveIntegerField(null=True)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=7, null=True)),
+                ('trial_duration', models.PositiveIntegerField(null=True)),
+                ('trial_duration_unit', models.CharField(blank=True, max_length=10)),
+                ('trial_period', models.BooleanField(default=False)),
+                ('updated_at', models.DateTimeField(null=True)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import model_utils.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('djbraintree', '0011_plan'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Dispute',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', model_utils.fields.AutoCreatedField(default=django.utils.timezone.now, editable=False, verbose_name='created')),
+                ('modified', model_utils.fields.AutoLastModifiedField(default=django.utils.timezone.now, editable=False, verbose_name='modified')),
+                ('braintree_id', models.CharField(max_length=50, unique=True)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=7, null=True)),
+                ('currency_iso_code', models.CharField(blank=True, max_length=3)),
+                ('date_opened', models.DateField(null=True)),
+                ('date_won', models.DateField(null=True)),
+                ('kind', models.CharField(blank=True, choices=[('chargeback', 'chargeback'), ('pre_arbitration', 'pre_arbitration'), ('retrieval', 'retrieval')], max_length=20)),
+                ('reason', models.CharField(blank=True, max_length=40)),
+                ('received_date', models.DateField(null=True)),
+                ('reply_by_date', models.DateField(null=True)),
+                ('status', models.CharField(blank=True, choices=[('accepted', 'accepted'), ('disputed', 'disputed'), ('expired', 'expired'), ('lost', 'lost'), ('open', 'open'), ('won', 'won')], max_length=20)),
+                ('transaction_braintree_id', models.CharField(blank=True, max_length=50)),
+                ('transaction', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='disputes', to='djbraintree.Transaction')),
+            ],
+        ),
+        migrations.AlterIndexTogether(
+            name='dispute',
+            index_together=set([('status', 'reply_by_date')]),
+        ),
+    ]
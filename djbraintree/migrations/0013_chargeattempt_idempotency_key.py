@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('djbraintree', '0012_dispute'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='chargeattempt',
+            name='idempotency_key',
+            field=models.CharField(max_length=200, unique=True),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('djbraintree', '0013_chargeattempt_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='chargeattempt',
+            name='status',
+            field=models.CharField(choices=[('new', 'New'), ('pending', 'Pending'), ('succeeded', 'Succeeded'), ('failed', 'Failed')], default='pending', max_length=20),
+        ),
+    ]
@@ -14,8 +14,10 @@ from django.contrib import messages
 from django.shortcuts import redirect
 
 from . import settings as djbraintree_settings
-from .models import Customer
+from .catalog import get_catalog, plan_choices, plan_list
+from .models import Customer, Transaction
     # CurrentSubscription
+from .pagination import keyset_paginate
 from .utils import entity_has_active_subscription
 
 
@@ -41,9 +43,9 @@ class PaymentsContextMixin(object):
         context = super(PaymentsContextMixin, self).get_context_data(**kwargs)
         context.update({
             "BRAINTREE_PUBLIC_KEY": settings.BRAINTREE_PUBLIC_KEY,
-            "PLAN_CHOICES": djbraintree_settings.PLAN_CHOICES,
-            "PLAN_LIST": djbraintree_settings.PLAN_LIST,
-            "PAYMENT_PLANS": djbraintree_settings.PAYMENTS_PLANS
+            "PLAN_CHOICES": plan_choices(),
+            "PLAN_LIST": plan_list(),
+            "PAYMENT_PLANS": get_catalog()
         })
         return context
 
@@ -53,8 +55,51 @@ class SubscriptionMixin(PaymentsContextMixin):
 
     def get_context_data(self, *args, **kwargs):
         context = super(SubscriptionMixin, self).get_context_data(**kwargs)
-        context['is_plans_plural'] = bool(len(djbraintree_settings.PLAN_CHOICES) > 1)
+        context['is_plans_plural'] = bool(len(get_catalog()) > 1)
         context['customer'], created = Customer.get_or_create(
             subscriber=djbraintree_settings.subscriber_request_callback(self.request))
         # context['CurrentSubscription'] = CurrentSubscription
         return context
+
+
+class TransactionHistoryMixin(object):
+    """
+    Adds one keyset-paginated page of the customer's transactions to the
+    context, selected by the ``after`` query parameter.
+    """
+    history_page_size = 25
+    history_fields = ["id", "customer", "braintree_id", "created_at",
+                      "amount", "currency_iso_code", "status",
+                      "transaction_type"]
+
+    def get_history_cursor(self):
+        return self.request.GET.get("after")
+
+    def get_history_customer(self):
+        """
+        :return: The requesting payer's local Customer, or None. Never
+            calls the gateway, and never creates a Braintree customer.
+        :rtype: Optional[Customer]
+        """
+        return Customer.objects.filter(
+            entity=djbraintree_settings.subscriber_request_callback(
+                self.request)).first()
+
+    def get_history_page(self, customer):
+        if customer is None:
+            transactions = Transaction.objects.none()
+        else:
+            transactions = customer.transactions.all()
+        transactions = transactions.only(*self.history_fields)
+        return keyset_paginate(transactions,
+                               cursor=self.get_history_cursor(),
+                               page_size=self.history_page_size)
+
+    def get_history_context(self, customer):
+        page = self.get_history_page(customer)
+        return {
+            "customer": customer,
+            "transactions": page.object_list,
+            "history_page": page,
+            "history_cursor": self.get_history_cursor(),
+        }
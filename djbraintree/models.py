@@ -1,17 +1,33 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
+import datetime
+import sys
+
 from django.conf import settings
-from django.db import models
+from django.db import IntegrityError, models, transaction as db_transaction
 
 # Create your models here.
-from django.utils.encoding import smart_text
+from django.utils import six, timezone
+from django.utils.encoding import python_2_unicode_compatible, smart_text
+
+from model_utils.models import TimeStampedModel
 
+from . import settings as djbraintree_settings
+from .lru import LRUCache
+from .managers import (LOOKUP_CHUNK_SIZE, DisputeQuerySet,
+                       PaymentMethodQuerySet, SubscriptionQuerySet, _chunks)
+
+from .utils import (ACTIVE_SUBSCRIPTION_STATUSES, CHARGED_TRANSACTION_STATUSES,
+                    aware_datetime)
 from .braintree_objects import (BraintreeCustomer, BraintreeTransaction,
                                 BraintreePaymentMethod, BraintreeSubscription,
                                 BraintreePlan,
                                 BraintreeMerchantAccount, BraintreeAddress,
-                                configure_braintree)
+                                BraintreeDispute, braintree_sdk)
+
+# Lower bound of dispute searches through transactions, which need one
+DISPUTE_SEARCH_EPOCH = datetime.datetime(2000, 1, 1)
 
 
 class Customer(BraintreeCustomer):
@@ -24,6 +40,9 @@ class Customer(BraintreeCustomer):
     entity = models.OneToOneField(
         getattr(settings, 'DJBRAINTREE_PAYER_MODEL', settings.AUTH_USER_MODEL),
         null=True)
+    # Maintained by syncs and payment method webhooks, see PaymentMethod
+    default_payment_method_token = models.CharField(max_length=80,
+                                                    blank=True)
 
     # objects = CustomerManager()
     def str_parts(self):
@@ -51,6 +70,63 @@ class Customer(BraintreeCustomer):
         customer = Customer.objects.create(entity=entity, **data)
         return customer
 
+    def charge(self, amount, options=None, idempotency_key=None, **kwargs):
+        """
+        Charge this customer (see BraintreeCustomer.charge).
+
+        :param idempotency_key: Optional key identifying this charge attempt,
+            up to 200 characters. Retrying with the same key (e.g. after a
+            timeout) returns the outcome of the earlier attempt instead of
+            charging again. The key is sent as the transaction's
+            ``order_id`` unless one is given.
+        :type idempotency_key: str
+        :raises ValueError: If the key is too long, or was already used to
+            charge another amount or customer
+        """
+        if idempotency_key is None:
+            return super(Customer, self).charge(amount, options, **kwargs)
+
+        max_length = ChargeAttempt._meta.get_field("idempotency_key").max_length
+        if len(idempotency_key) > max_length:
+            raise ValueError("Idempotency keys are at most {0} characters "
+                             "long".format(max_length))
+        kwargs.setdefault("order_id", idempotency_key)
+        # The row lock serializes concurrent retries of the same attempt, and
+        # what to do is decided from the locked row alone: a concurrent
+        # retry may have recorded an outcome since get_or_create.
+        exc_info = None
+        with db_transaction.atomic():
+            attempt, _ = ChargeAttempt.objects.get_or_create(
+                idempotency_key=idempotency_key,
+                defaults={"customer": self, "order_id": kwargs["order_id"],
+                          "amount": amount,
+                          "status": ChargeAttempt.STATUS_NEW})
+            attempt = ChargeAttempt.objects.select_for_update().get(
+                pk=attempt.pk)
+            if attempt.customer_id != self.pk or attempt.amount != amount:
+                raise ValueError(
+                    "Idempotency key {0} was already used to charge another "
+                    "amount or customer".format(idempotency_key))
+            if attempt.status != ChargeAttempt.STATUS_NEW:
+                result = attempt.resolve()
+                if result is not None:
+                    return result
+
+            attempt.status = ChargeAttempt.STATUS_PENDING
+            attempt.save()
+            try:
+                result = super(Customer, self).charge(amount, options,
+                                                      **kwargs)
+            except Exception:
+                # Commit the attempt as pending: its outcome is unknown
+                # until the next retry resolves it.
+                exc_info = sys.exc_info()
+            else:
+                attempt.record_result(result)
+        if exc_info is not None:
+            six.reraise(*exc_info)
+        return result
+
     def update(self, **kwargs):
         result = super(Customer, self).update(**kwargs)
         obj = self.extract_object_from_result(result)
@@ -58,51 +134,363 @@ class Customer(BraintreeCustomer):
         return self
 
     def sync(self, braintree_object=None):
+        if not braintree_object:
+            braintree_object = self.api_find()
         super(Customer, self).sync(braintree_object)
+        # Full customer objects embed the vault; the customer_details of a
+        # transaction don't.
+        has_vault = hasattr(braintree_object, "payment_methods")
+        if has_vault:
+            self.default_payment_method_token = PaymentMethod.default_token(
+                braintree_object)
         self.save()
+        if has_vault:
+            PaymentMethod.sync_from_braintree_customers([braintree_object])
+
+    def has_default_payment_method(self):
+        """Answered from the locally stored token, never from the gateway."""
+        return bool(self.default_payment_method_token)
 
-    def sync_transactions(self, braintree_collection=None, **kwargs):
+    @property
+    def default_payment_method(self):
+        """
+        :return: The local copy of the default payment method, looked up
+            once per token.
+        :rtype: Optional[PaymentMethod]
+        """
+        token = self.default_payment_method_token
+        if not token:
+            return None
+        cached = getattr(self, "_default_payment_method", None)
+        if cached is None or cached.braintree_id != token:
+            cached = PaymentMethod.objects.filter(braintree_id=token).first()
+            self._default_payment_method = cached
+        return cached
+
+    def sync_transactions(self, braintree_collection=None, chunk_size=100,
+                          **kwargs):
         if braintree_collection is None:
             braintree_collection = self.retrieve_transactions()
+        chunk = []
         for transaction in braintree_collection.items:
-            self.record_transaction(transaction)
+            chunk.append(transaction)
+            if len(chunk) == chunk_size:
+                self._record_transactions(chunk)
+                chunk = []
+        self._record_transactions(chunk)
+
+    def _record_transactions(self, braintree_transactions):
+        # One query resolves the already known transactions of the chunk,
+        # and a couple more all of their addresses.
+        existing = Transaction.braintree_objects.get_many_by_resources(
+            braintree_transactions)
+        addresses = Address.get_or_create_many(
+            braintree_address
+            for braintree_transaction in braintree_transactions
+            for braintree_address in Transaction.object_to_address_objects(
+                braintree_transaction))
+        for braintree_transaction in braintree_transactions:
+            Transaction.sync_from_braintree_object(
+                braintree_transaction, existing=existing, addresses=addresses)
 
     def record_transaction(self, braintree_transaction):
         return Transaction.sync_from_braintree_object(braintree_transaction)
 
+    def has_active_subscription(self):
+        """Answered from the local Subscription table, see Subscription."""
+        return self.subscriptions.active().exists()
+
+
+class Address(BraintreeAddress):
+    """
+    A postal address, stored once however many transactions use it: the
+    braintree_id is a hash of the address content (see
+    ``BraintreeAddress.braintree_object_to_record``), under a unique index.
+    """
+
+    @classmethod
+    def get_or_create_many(cls, braintree_addresses):
+        """
+        Resolve many addresses at once: one query per chunk finds the known
+        ones, a bulk insert creates the others.
+
+        :param braintree_addresses: braintree.Address objects or None
+        :return: Addresses keyed by content hash. Empty addresses are left
+            out.
+        :rtype: dict
+        """
+        records = {}
+        for braintree_address in braintree_addresses:
+            if braintree_address is None:
+                continue
+            record = cls.braintree_object_to_record(braintree_address)
+            if any(record[name] for name in cls.CONTENT_FIELDS):
+                records[record["braintree_id"]] = record
+        if not records:
+            return {}
+
+        found = cls.braintree_objects.get_many_by_resources(records)
+        missing = [cls(**record) for content_hash, record in records.items()
+                   if content_hash not in found]
+        if missing:
+            try:
+                with db_transaction.atomic():
+                    cls.objects.bulk_create(missing,
+                                            batch_size=LOOKUP_CHUNK_SIZE)
+            except IntegrityError:
+                # Another process created some of them in the meantime
+                for address in missing:
+                    cls.objects.get_or_create(
+                        braintree_id=address.braintree_id,
+                        defaults=records[address.braintree_id])
+            # bulk_create doesn't set primary keys on every backend
+            found.update(cls.braintree_objects.get_many_by_resources(
+                address.braintree_id for address in missing))
+        return found
+
+
+class PaymentMethod(BraintreePaymentMethod):
+    """
+    A vaulted payment method, keyed by its token. Synced in bulk from the
+    vault data embedded in braintree.Customer objects, so that expiry
+    reports (see ``PaymentMethodQuerySet.expiring_within``) never page
+    through the gateway.
+    """
+    customer = models.ForeignKey(Customer, related_name="payment_methods",
+                                 null=True)
+
+    objects = PaymentMethodQuerySet.as_manager()
+
+    class Meta:
+        index_together = [("customer", "default")]
+
+    @staticmethod
+    def default_token(braintree_customer):
+        """:return: The token of a customer's default payment method, or ''"""
+        for braintree_method in getattr(braintree_customer,
+                                        "payment_methods", None) or []:
+            if getattr(braintree_method, "default", False):
+                return braintree_method.token
+        return ""
+
+    @classmethod
+    def sync_from_braintree_customers(cls, braintree_customers):
+        """
+        Bring the local payment methods of many customers in line with
+        their vault data with a few queries: new payment methods are bulk
+        created, changed ones saved and those removed from the vault
+        deleted. Customers' default payment method tokens are updated
+        along.
+
+        :param braintree_customers: braintree.Customer objects
+        :return: The number of payment methods in the vault data
+        :rtype: int
+        """
+        braintree_customers = [braintree_customer
+                               for braintree_customer in braintree_customers
+                               if braintree_customer.id]
+        customers = Customer.braintree_objects.get_many_by_resources(
+            braintree_customers)
+        pairs = [(customers.get(braintree_customer.id), braintree_method)
+                 for braintree_customer in braintree_customers
+                 for braintree_method in getattr(
+                     braintree_customer, "payment_methods", None) or []]
+        existing = cls.braintree_objects.get_many_by_resources(
+            braintree_method.token for _, braintree_method in pairs)
+
+        created = []
+        for customer, braintree_method in pairs:
+            record = cls.braintree_object_to_record(braintree_method)
+            payment_method = existing.get(braintree_method.token)
+            if payment_method is None:
+                created.append(cls(customer=customer, **record))
+                continue
+            changed = payment_method.customer_id != getattr(customer, "pk",
+                                                            None)
+            for attr, value in record.items():
+                if getattr(payment_method, attr) != value:
+                    setattr(payment_method, attr, value)
+                    changed = True
+            if changed:
+                payment_method.customer = customer
+                payment_method.save()
+        cls.objects.bulk_create(created, batch_size=LOOKUP_CHUNK_SIZE)
+
+        for braintree_customer in braintree_customers:
+            customer = customers.get(braintree_customer.id)
+            token = cls.default_token(braintree_customer)
+            if (customer is not None and
+                    customer.default_payment_method_token != token):
+                Customer.objects.filter(pk=customer.pk).update(
+                    default_payment_method_token=token)
+
+        if customers:
+            cls.objects.filter(customer__in=list(customers.values())).exclude(
+                braintree_id__in=[braintree_method.token
+                                  for _, braintree_method in pairs]).delete()
+        return len(pairs)
+
+    @classmethod
+    def sync_all(cls, chunk_size=100):
+        """
+        Sync the payment methods of every customer in the vault, reading
+        customers from the gateway ``chunk_size`` at a time.
+
+        :return: The number of synced payment methods
+        :rtype: int
+        """
+        synced = 0
+        for braintree_customers in _chunks(Customer.api().all().items,
+                                           chunk_size):
+            synced += cls.sync_from_braintree_customers(braintree_customers)
+        return synced
+
+
+class MerchantAccount(BraintreeMerchantAccount):
+    """
+    A merchant account transactions are processed through. There are few
+    of them and every transaction sync needs one, so their primary keys are
+    cached process-wide by braintree_id (see ``pk_for``).
+    """
+    _pk_cache = LRUCache(djbraintree_settings.MERCHANT_ACCOUNT_CACHE_SIZE)
+
+    def str_parts(self):
+        return super(MerchantAccount, self).str_parts() + [
+            "status={status}".format(status=self.status)]
+
+    @classmethod
+    def pk_for(cls, braintree_id):
+        """
+        :return: The primary key of the local MerchantAccount with this
+            braintree_id, created (without details) if there is none yet.
+            Details are filled in by ``sync_from_braintree_object``.
+        :rtype: Optional[int]
+        """
+        if not braintree_id:
+            return None
+        pk = cls._pk_cache.get(braintree_id)
+        if pk is None:
+            merchant_account, created = cls.objects.get_or_create(
+                braintree_id=braintree_id)
+            pk = merchant_account.pk
+            cls._remember(merchant_account, created)
+        return pk
+
+    @classmethod
+    def _remember(cls, merchant_account, created):
+        """
+        Cache the pk of a merchant account. A row inserted within a
+        transaction is only cached once that commits: a rollback would
+        leave every later sync of the process with a dangling pk.
+        """
+        braintree_id, pk = merchant_account.braintree_id, merchant_account.pk
+        connection = db_transaction.get_connection(cls.objects.db)
+        if not created or not connection.in_atomic_block:
+            cls._pk_cache.set(braintree_id, pk)
+        elif hasattr(db_transaction, "on_commit"):  # Django 1.9+
+            db_transaction.on_commit(
+                lambda: cls._pk_cache.set(braintree_id, pk),
+                using=cls.objects.db)
+
+    @classmethod
+    def sync_from_braintree_object(cls, braintree_object):
+        """
+        :type braintree_object: braintree.MerchantAccount
+        :rtype: MerchantAccount
+        """
+        merchant_account, created = cls.objects.update_or_create(
+            braintree_id=braintree_object.id,
+            defaults=cls.braintree_object_to_record(braintree_object))
+        cls._remember(merchant_account, created)
+        return merchant_account
 
-#
-# class Address(BraintreeAddress):
-#     customer = models.ForeignKey(Customer, related_name="addresses")
-#
-#
-# class PaymentMethod(BraintreePaymentMethod):
-#     pass
-#
-#
-# class MerchantAccount(BraintreeMerchantAccount):
-#     pass
-#
-#
-# class Plan(BraintreePlan):
-#     pass
-#
-#
-# class Subscription(BraintreeSubscription):
-#     pass
+    def delete(self, *args, **kwargs):
+        self._pk_cache.delete(self.braintree_id)
+        return super(MerchantAccount, self).delete(*args, **kwargs)
+
+    @classmethod
+    def clear_cache(cls):
+        cls._pk_cache.clear()
+
+
+class Plan(BraintreePlan):
+    """
+    A record of a Braintree Plan. Plans are only managed in the Braintree
+    control panel: ``sync_all`` copies them here, and the plan catalog
+    (see djbraintree.catalog) reads them from this table.
+    """
+
+    @classmethod
+    def sync_all(cls):
+        """
+        Sync every plan from ``braintree.Plan.all()``, delete the local
+        plans that no longer exist in Braintree and invalidate the plan
+        catalog of every process.
+
+        :return: The number of synced plans
+        :rtype: int
+        """
+        from .catalog import invalidate_catalog
+
+        braintree_plans = list(cls.api().all())
+        existing = cls.braintree_objects.get_many_by_resources(
+            braintree_plans)
+        created = []
+        with db_transaction.atomic():
+            for braintree_plan in braintree_plans:
+                plan = existing.get(braintree_plan.id)
+                if plan is None:
+                    created.append(
+                        cls.create_from_braintree_object(braintree_plan))
+                else:
+                    plan.sync(braintree_plan)
+                    plan.save()
+            cls.objects.bulk_create(created)
+            cls.objects.exclude(braintree_id__in=[
+                braintree_plan.id for braintree_plan in braintree_plans
+            ]).delete()
+        invalidate_catalog()
+        return len(braintree_plans)
 
 
 class Transaction(BraintreeTransaction):
     customer = models.ForeignKey(Customer,
                                  related_name="transactions",
                                  null=True)
+    merchant_account = models.ForeignKey(MerchantAccount,
+                                         related_name="transactions",
+                                         null=True)
+    billing_address = models.ForeignKey(Address, related_name="+",
+                                        null=True)
+    shipping_address = models.ForeignKey(Address, related_name="+",
+                                         null=True)
+
+    class Meta:
+        # Keyset pagination of a customer's history, see djbraintree.pagination
+        index_together = [("customer", "created_at", "id")]
 
     @classmethod
-    def sync_from_braintree_object(cls, braintree_object):
+    def sync_from_braintree_object(cls, braintree_object, existing=None,
+                                   addresses=None):
+        """
+        :param existing: Already resolved Transactions keyed by braintree_id,
+            as returned by ``get_many_by_resources``. Saves a query per call
+            when syncing many transactions.
+        :type existing: dict
+        :param addresses: Already resolved Addresses keyed by content hash,
+            as returned by ``Address.get_or_create_many``.
+        :type addresses: dict
+        """
         # Get or create the Transaction()
         try:
-            transaction = cls.braintree_objects.get_by_resource(
-                braintree_object)
+            if existing is not None:
+                try:
+                    transaction = existing[braintree_object.id]
+                except KeyError:
+                    raise cls.DoesNotExist
+            else:
+                transaction = cls.braintree_objects.get_by_resource(
+                    braintree_object)
             print("Found tx:", transaction)
         except cls.DoesNotExist:
             transaction = cls.create_from_braintree_object(braintree_object)
@@ -127,16 +515,39 @@ class Transaction(BraintreeTransaction):
 
         # Get or create a PaymentMethod()
 
-        # Get or create a MerchantAccount()
+        # Get or create a MerchantAccount(), by primary key from the cache
+        transaction.merchant_account_id = MerchantAccount.pk_for(
+            transaction.merchant_account_braintree_id)
 
         # Get or create a Subscription()
 
-        # Get or create billing Address()
-
-        # Get or create shipping Address()
+        # Get or create the billing and shipping Address()
+        billing, shipping = cls.object_to_address_objects(braintree_object)
+        if addresses is None:
+            addresses = Address.get_or_create_many([billing, shipping])
+        transaction.billing_address = cls._resolve_address(addresses, billing)
+        transaction.shipping_address = cls._resolve_address(addresses,
+                                                            shipping)
         transaction.save()
         return transaction
 
+    @staticmethod
+    def object_to_address_objects(braintree_object):
+        """
+        :return: The billing and shipping braintree.Address of a
+            braintree.Transaction, either possibly None
+        """
+        return (getattr(braintree_object, "billing_details", None),
+                getattr(braintree_object, "shipping_details", None))
+
+    @staticmethod
+    def _resolve_address(addresses, braintree_address):
+        if braintree_address is None:
+            return None
+        return addresses.get(
+            Address.braintree_object_to_record(braintree_address)[
+                "braintree_id"])
+
     def sync(self, braintree_object=None):
         """
         Synchronize a Transaction with an existing braintree.Transaction.
@@ -245,5 +656,518 @@ class Transaction(BraintreeTransaction):
         return result
 
 
-# Run with models.py
-configure_braintree()
+class Dispute(BraintreeDispute):
+    """
+    A dispute (chargeback, retrieval...) opened against a transaction. Kept
+    up to date by ``sync_all`` and dispute webhooks, so that open disputes
+    are found with a single indexed query (see ``DisputeQuerySet.open``)
+    instead of a gateway call per transaction.
+    """
+    transaction = models.ForeignKey(Transaction, related_name="disputes",
+                                    null=True)
+
+    objects = DisputeQuerySet.as_manager()
+
+    class Meta:
+        index_together = [("status", "reply_by_date")]
+
+    @classmethod
+    def search_braintree_disputes(cls, received_since=None):
+        """
+        Stream disputes from the gateway, a page of results at a time.
+
+        Uses ``braintree.Dispute.search`` where the braintree release has
+        it, and otherwise the disputes embedded in the transactions found by
+        a ``dispute_date`` transaction search.
+
+        :param received_since: Only disputes received on or after this date
+        :type received_since: datetime.date
+        :return: (braintree.Dispute, transaction braintree_id) pairs
+        :rtype: collections.Iterator[tuple]
+        """
+        braintree = braintree_sdk()
+        try:
+            search = cls.api().search
+        except AttributeError:
+            search = None
+
+        if search is not None:
+            criteria = []
+            if received_since is not None:
+                criteria.append(
+                    braintree.DisputeSearch.received_date >= received_since)
+            for braintree_dispute in search(criteria).items:
+                yield braintree_dispute, None
+            return
+
+        criteria = (braintree.TransactionSearch.dispute_date >=
+                    (received_since or DISPUTE_SEARCH_EPOCH))
+        for braintree_transaction in Transaction.api().search(criteria).items:
+            for braintree_dispute in getattr(braintree_transaction,
+                                             "disputes", None) or []:
+                yield braintree_dispute, braintree_transaction.id
+
+    @classmethod
+    def sync_from_braintree_objects(cls, braintree_disputes):
+        """
+        Sync many disputes with a few queries: new disputes are bulk
+        created and changed ones saved. Disputes are linked to their local
+        Transaction, when there is one.
+
+        :param braintree_disputes: braintree.Dispute objects, or
+            (braintree.Dispute, transaction braintree_id) pairs as returned
+            by ``search_braintree_disputes``
+        :return: The number of synced disputes
+        :rtype: int
+        """
+        # Compact records rather than dicts: the whole batch is held until
+        # its transactions are resolved, see djbraintree.records.
+        records = []
+        for braintree_dispute in braintree_disputes:
+            transaction_id = None
+            if isinstance(braintree_dispute, tuple):
+                braintree_dispute, transaction_id = braintree_dispute
+            record = cls.braintree_object_to_compact_record(braintree_dispute)
+            if transaction_id:
+                record.transaction_braintree_id = transaction_id
+            records.append(record)
+
+        transaction_pks = {}
+        for ids in _chunks(set(record.transaction_braintree_id
+                               for record in records
+                               if record.transaction_braintree_id),
+                           LOOKUP_CHUNK_SIZE):
+            transaction_pks.update(Transaction.objects.filter(
+                braintree_id__in=ids).values_list("braintree_id", "pk"))
+        existing = cls.braintree_objects.get_many_by_resources(
+            record.braintree_id for record in records)
+
+        created = []
+        for record in records:
+            transaction_pk = transaction_pks.get(
+                record.transaction_braintree_id)
+            dispute = existing.get(record.braintree_id)
+            if dispute is None:
+                created.append(cls(transaction_id=transaction_pk,
+                                   **record.as_dict()))
+                continue
+            changed = dispute.transaction_id != transaction_pk
+            for attr, value in record.as_dict().items():
+                if getattr(dispute, attr) != value:
+                    setattr(dispute, attr, value)
+                    changed = True
+            if changed:
+                dispute.transaction_id = transaction_pk
+                dispute.save()
+        cls.objects.bulk_create(created, batch_size=LOOKUP_CHUNK_SIZE)
+        return len(records)
+
+    @classmethod
+    def sync_from_braintree_object(cls, braintree_object):
+        """
+        :type braintree_object: braintree.Dispute
+        :rtype: Dispute
+        """
+        cls.sync_from_braintree_objects([braintree_object])
+        return cls.braintree_objects.get_by_resource(braintree_object)
+
+    @classmethod
+    def sync_all(cls, received_since=None, chunk_size=100):
+        """
+        Sync every dispute (or those received since ``received_since``),
+        reading them from the gateway ``chunk_size`` at a time.
+
+        :return: The number of synced disputes
+        :rtype: int
+        """
+        synced = 0
+        for braintree_disputes in _chunks(
+                cls.search_braintree_disputes(received_since), chunk_size):
+            synced += cls.sync_from_braintree_objects(braintree_disputes)
+        return synced
+
+
+class Subscription(BraintreeSubscription):
+    """
+    A record of a Braintree Subscription, kept up to date by the
+    ``subscription_*`` webhooks so that paywall checks never need the
+    gateway (see ``SubscriptionQuerySet.active_for``).
+
+    Webhooks can arrive late or out of order. ``apply_webhook`` only moves
+    a subscription along the transitions below, and ignores notifications
+    older than the local state.
+    """
+    TRANSITIONS = {
+        "": {"Pending", "Active", "Past Due", "Canceled", "Expired"},
+        "Pending": {"Active", "Past Due", "Canceled", "Expired"},
+        "Active": {"Past Due", "Canceled", "Expired"},
+        "Past Due": {"Active", "Canceled", "Expired"},
+        "Canceled": set(),
+        "Expired": set(),
+    }
+
+    customer = models.ForeignKey(Customer, related_name="subscriptions",
+                                 null=True)
+
+    objects = SubscriptionQuerySet.as_manager()
+
+    class Meta:
+        index_together = [
+            ("customer", "status"),
+            ("status", "paid_through_date"),
+            ("status", "next_billing_date"),
+        ]
+
+    @classmethod
+    def resolve_customer(cls, braintree_object):
+        """
+        Find the local Customer of a braintree.Subscription: from its
+        transactions if it has any, else from its payment method.
+
+        :rtype: Optional[Customer]
+        """
+        customer_id = None
+        for braintree_transaction in getattr(braintree_object,
+                                             "transactions", None) or []:
+            customer_details = getattr(braintree_transaction,
+                                       "customer_details", None)
+            customer_id = getattr(customer_details, "id", None)
+            if customer_id:
+                break
+        if not customer_id and braintree_object.payment_method_token:
+            customer_id = BraintreePaymentMethod.api().find(
+                braintree_object.payment_method_token).customer_id
+        if not customer_id:
+            return None
+        return Customer.objects.filter(braintree_id=customer_id).first()
+
+    @classmethod
+    def sync_from_braintree_object(cls, braintree_object, existing=None):
+        """
+        Create or update the local Subscription of a braintree.Subscription.
+
+        :param existing: Already resolved Subscriptions keyed by
+            braintree_id, as returned by ``get_many_by_resources``.
+        :type existing: dict
+        """
+        if existing is not None:
+            subscription = existing.get(braintree_object.id)
+        else:
+            subscription = cls.objects.filter(
+                braintree_id=braintree_object.id).first()
+        if subscription is None:
+            subscription = cls.create_from_braintree_object(braintree_object)
+        else:
+            subscription.sync(braintree_object)
+        if subscription.customer_id is None:
+            subscription.customer = cls.resolve_customer(braintree_object)
+        subscription.save()
+        return subscription
+
+    @classmethod
+    def sync_many(cls, braintree_ids):
+        """
+        Refresh many subscriptions with one gateway search per chunk of
+        ids, instead of one ``find`` each (e.g. for those returned by
+        ``Subscription.objects.due_for_renewal()``).
+
+        :return: The number of synced subscriptions
+        """
+        braintree = braintree_sdk()
+        synced = 0
+        for ids in _chunks(braintree_ids, LOOKUP_CHUNK_SIZE):
+            collection = cls.api().search(
+                braintree.SubscriptionSearch.ids.in_list(ids))
+            braintree_objects = list(collection.items)
+            existing = cls.braintree_objects.get_many_by_resources(
+                braintree_objects)
+            for braintree_object in braintree_objects:
+                cls.sync_from_braintree_object(braintree_object, existing)
+                synced += 1
+        return synced
+
+    def can_transition_to(self, status):
+        return status == self.status or status in self.TRANSITIONS.get(
+            self.status, ())
+
+    def apply_webhook(self, braintree_object):
+        """
+        Apply the state carried by a ``subscription_*`` webhook.
+
+        :type braintree_object: braintree.Subscription
+        :return: False if the notification was stale and ignored
+        :rtype: bool
+        """
+        updated_at = aware_datetime(braintree_object.updated_at)
+        if (self.updated_at and updated_at and
+                updated_at < self.updated_at):
+            return False
+        if not self.can_transition_to(braintree_object.status):
+            return False
+        self.sync(braintree_object)
+        if self.customer_id is None:
+            self.customer = self.resolve_customer(braintree_object)
+        self.save()
+        return True
+
+    @classmethod
+    def apply_notification(cls, braintree_object):
+        """
+        :return: The local Subscription, created if needed
+        :rtype: Subscription
+        """
+        subscription = cls.objects.filter(
+            braintree_id=braintree_object.id).first()
+        if subscription is None:
+            return cls.sync_from_braintree_object(braintree_object)
+        subscription.apply_webhook(braintree_object)
+        return subscription
+
+    def access_until(self):
+        """
+        :return: The last day this subscription grants access: open ended
+            while it is active or past due, its paid through date once
+            canceled (when cancellations take effect at the end of the
+            period), else None.
+        :rtype: Optional[datetime.date]
+        """
+        if self.status in ACTIVE_SUBSCRIPTION_STATUSES:
+            return PayerAccess.UNLIMITED
+        if (self.status == "Canceled" and
+                djbraintree_settings.CANCELLATION_AT_PERIOD_END):
+            return self.paid_through_date
+        return None
+
+    def save(self, *args, **kwargs):
+        super(Subscription, self).save(*args, **kwargs)
+        if self.customer_id is not None:
+            PayerAccess.refresh_customers([self.customer_id])
+
+
+@python_2_unicode_compatible
+class PayerAccess(models.Model):
+    """
+    One row per payer, saying until when they may use paid features.
+
+    Denormalized from the payer's subscriptions, and refreshed every time one
+    of them is saved (by a sync or a webhook), so that a paywall check is a
+    primary key lookup that loads neither the Customer nor its
+    Subscriptions. Lookups are cached in process for
+    ``DJBRAINTREE_PAYER_ACCESS_CACHE_TTL`` seconds: other processes may see
+    a change that late.
+    """
+    # Access of active subscriptions doesn't end until a webhook says so
+    UNLIMITED = datetime.date.max
+
+    entity = models.OneToOneField(
+        getattr(settings, 'DJBRAINTREE_PAYER_MODEL', settings.AUTH_USER_MODEL),
+        primary_key=True, related_name="djbraintree_access")
+    active_until = models.DateField(null=True, db_index=True)
+    modified = models.DateTimeField(auto_now=True)
+
+    _cache = LRUCache(djbraintree_settings.PAYER_ACCESS_CACHE_SIZE,
+                      ttl=djbraintree_settings.PAYER_ACCESS_CACHE_TTL)
+
+    def __str__(self):
+        return "<entity={entity_id}, active_until={active_until}>".format(
+            entity_id=self.entity_id, active_until=self.active_until)
+
+    # Returned by ``cached_active_until`` on a cache miss
+    NOT_CACHED = object()
+
+    @classmethod
+    def cached_active_until(cls, entity_id):
+        """:return: The cached ``active_until`` of a payer, or NOT_CACHED"""
+        return cls._cache.get(entity_id, cls.NOT_CACHED)
+
+    @classmethod
+    def remember(cls, entity_id, active_until):
+        cls._cache.set(entity_id, active_until)
+
+    @classmethod
+    def lookup(cls, entity_id):
+        """:return: A query for the ``active_until`` of a payer"""
+        return cls.objects.filter(entity_id=entity_id).values_list(
+            "active_until", flat=True)
+
+    @classmethod
+    def active_until_for(cls, entity_id):
+        """
+        :return: The last day of access of a payer, None if they have none
+        :rtype: Optional[datetime.date]
+        """
+        active_until = cls.cached_active_until(entity_id)
+        if active_until is cls.NOT_CACHED:
+            active_until = cls.lookup(entity_id).first()
+            cls.remember(entity_id, active_until)
+        return active_until
+
+    @staticmethod
+    def grants_access(active_until, today=None):
+        if active_until is None:
+            return False
+        return active_until >= (today or timezone.now().date())
+
+    @classmethod
+    def has_access(cls, entity_id, today=None):
+        return cls.grants_access(cls.active_until_for(entity_id), today)
+
+    @classmethod
+    def refresh(cls, entity_ids):
+        """
+        Recompute the access of payers from their subscriptions.
+
+        :param entity_ids: Primary keys of payer model instances
+        """
+        entity_ids = set(entity_ids)
+        access = dict.fromkeys(entity_ids)
+        subscriptions = Subscription.objects.filter(
+            customer__entity_id__in=entity_ids).values_list(
+            "customer__entity_id", "status", "paid_through_date")
+        for entity_id, status, paid_through_date in subscriptions:
+            until = Subscription(
+                status=status, paid_through_date=paid_through_date
+            ).access_until()
+            if until is not None and (access[entity_id] is None or
+                                      until > access[entity_id]):
+                access[entity_id] = until
+
+        for entity_id, active_until in access.items():
+            cls.objects.update_or_create(
+                entity_id=entity_id, defaults={"active_until": active_until})
+            cls._cache.delete(entity_id)
+
+    @classmethod
+    def refresh_customers(cls, customer_ids):
+        cls.refresh(Customer.objects.filter(
+            pk__in=customer_ids, entity__isnull=False).values_list(
+            "entity_id", flat=True))
+
+    @classmethod
+    def clear_cache(cls):
+        cls._cache.clear()
+
+
+@python_2_unicode_compatible
+class ChargeAttempt(TimeStampedModel):
+    """
+    Local record of an idempotent ``Customer.charge`` call, mapping its
+    idempotency key to the ``order_id`` sent to Braintree.
+    """
+    # Only seen inside the transaction that creates the attempt: it is
+    # pending by the time the gateway is called.
+    STATUS_NEW = "new"
+    STATUS_PENDING = "pending"
+    STATUS_SUCCEEDED = "succeeded"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_NEW, "New"),
+        (STATUS_PENDING, "Pending"),
+        (STATUS_SUCCEEDED, "Succeeded"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    # As long as order_id, which defaults to it
+    idempotency_key = models.CharField(max_length=200, unique=True)
+    customer = models.ForeignKey(Customer, related_name="charge_attempts")
+    order_id = models.CharField(max_length=200, db_index=True)
+    amount = models.DecimalField(decimal_places=2, max_digits=7)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES,
+                              default=STATUS_PENDING)
+    braintree_transaction_id = models.CharField(max_length=50, blank=True)
+
+    def __str__(self):
+        return "<idempotency_key={key}, status={status}>".format(
+            key=self.idempotency_key, status=self.status)
+
+    def resolve(self):
+        """
+        Find the outcome of an earlier attempt with this key.
+
+        :return: A result wrapping the transaction that was already created,
+            or None if it is safe to charge (again).
+        :rtype: Optional[SuccessfulResult]
+        """
+        braintree = braintree_sdk()
+        if self.status == self.STATUS_SUCCEEDED:
+            braintree_transaction = Transaction.api().find(
+                self.braintree_transaction_id)
+        elif self.status == self.STATUS_PENDING:
+            # Outcome unknown: a single search on the order_id tells
+            # whether the earlier sale went through. Declined, rejected or
+            # failed sales found there didn't.
+            collection = Transaction.api().search(
+                braintree.TransactionSearch.order_id == self.order_id,
+                braintree.TransactionSearch.customer_id ==
+                self.customer.braintree_id,
+            )
+            braintree_transactions = list(collection.items)
+            charged = [braintree_transaction
+                       for braintree_transaction in braintree_transactions
+                       if braintree_transaction.status in
+                       CHARGED_TRANSACTION_STATUSES]
+            if not charged:
+                if braintree_transactions:
+                    self.status = self.STATUS_FAILED
+                    self.save()
+                return None
+            braintree_transaction = charged[0]
+            self.status = self.STATUS_SUCCEEDED
+            self.braintree_transaction_id = braintree_transaction.id
+            self.save()
+        else:
+            # A declined or rejected attempt can be retried
+            return None
+        return braintree.SuccessfulResult(
+            {"transaction": braintree_transaction})
+
+    def record_result(self, result):
+        if result.is_success:
+            self.status = self.STATUS_SUCCEEDED
+            self.braintree_transaction_id = result.transaction.id
+        else:
+            self.status = self.STATUS_FAILED
+        self.save()
+
+
+@python_2_unicode_compatible
+class WebhookEvent(TimeStampedModel):
+    """
+    A verified webhook notification waiting to be processed by the
+    ``djbraintree_process_webhooks`` command (see djbraintree.webhook_queue).
+    """
+    STATUS_PENDING = "pending"
+    STATUS_PROCESSING = "processing"
+    STATUS_PROCESSED = "processed"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Pending"),
+        (STATUS_PROCESSING, "Processing"),
+        (STATUS_PROCESSED, "Processed"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    merchant = models.CharField(max_length=100, blank=True)
+    kind = models.CharField(max_length=100)
+    subject_kind = models.CharField(max_length=50, blank=True)
+    subject_id = models.CharField(max_length=100)
+    timestamp = models.DateTimeField(null=True)
+    payload = models.TextField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES,
+                              default=STATUS_PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    claimed_by = models.CharField(max_length=100, blank=True)
+    claimed_at = models.DateTimeField(null=True)
+    processed_at = models.DateTimeField(null=True)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        index_together = [
+            ("status", "id"),
+            ("status", "subject_kind", "subject_id"),
+        ]
+
+    def __str__(self):
+        return "<kind={kind}, subject={subject_kind}:{subject_id}, status={status}>".format(
+            kind=self.kind, subject_kind=self.subject_kind,
+            subject_id=self.subject_id, status=self.status)
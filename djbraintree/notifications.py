@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: djbraintree.notifications
+   :synopsis: dj-braintree - Verification and parsing of Braintree webhooks
+
+Braintree posts webhooks as two form fields: ``bt_signature``, a list of
+``public_key|hmac`` pairs joined by ``&``, and ``bt_payload``, the base64
+encoded notification XML.
+
+Checks run cheapest first, so that floods of malformed or forged requests
+are turned away before any expensive work:
+
+1. size limits and the character set of both fields;
+2. a signature pair for one of our public keys;
+3. the HMAC-SHA1 of the payload, compared in constant time;
+4. only then, decoding and parsing the XML.
+
+Braintree retries deliveries that weren't acknowledged. The digests of
+recently verified deliveries are kept in an LRU cache, so a retry skips
+step 3.
+
+``parse_notification_stream`` reads the request body incrementally, and
+spools the payload to a temporary file once it outgrows
+``SPOOL_MAX_SIZE``. The payload is hashed, base64 decoded and parsed
+(with ``iterparse``, see ``djbraintree.streaming``) one chunk at a time,
+so large deliveries never sit in memory as a whole.
+"""
+
+from __future__ import unicode_literals
+
+import hashlib
+import hmac
+import io
+import re
+import tempfile
+
+from django.conf import settings
+from django.utils.crypto import constant_time_compare
+from django.utils.encoding import force_bytes
+
+from . import settings as djbraintree_settings
+from .exceptions import InvalidWebhookError
+from .gateway import braintree_sdk, get_gateway, merchant_settings
+from .lru import LRUCache
+from .streaming import Base64Reader, READ_CHUNK_SIZE, iter_form_fields, parse_xml
+
+# Longer signatures can't be valid: one pair per merchant is all we accept.
+MAX_SIGNATURE_LENGTH = 4096
+
+SIGNATURE_RE = re.compile(r"^[A-Za-z0-9_]+\|[0-9a-f]{40}"
+                          r"(?:&[A-Za-z0-9_]+\|[0-9a-f]{40})*$")
+ILLEGAL_PAYLOAD_RE = re.compile(b"[^A-Za-z0-9+=/\n]")
+
+# Payloads larger than this are spooled to disk while they are read
+SPOOL_MAX_SIZE = 1024 * 1024
+
+_verified = LRUCache(djbraintree_settings.WEBHOOK_VERIFIED_CACHE_SIZE)
+
+
+def webhook_credentials():
+    """
+    :return: ``public_key -> (merchant, private_key)`` for the globally
+        configured merchant (None) and every one in ``DJBRAINTREE_MERCHANTS``.
+    :rtype: dict
+    """
+    credentials = {}
+    public_key = getattr(settings, "BRAINTREE_PUBLIC_KEY", None)
+    if public_key:
+        credentials[public_key] = (None, settings.BRAINTREE_PRIVATE_KEY)
+    for merchant, merchant_credentials in merchant_settings().items():
+        credentials[merchant_credentials["public_key"]] = (
+            merchant, merchant_credentials["private_key"])
+    return credentials
+
+
+class WebhookPayload(object):
+    """
+    The ``bt_payload`` of a webhook, written in pieces as it is read. Each
+    piece is checked for illegal characters and counted against
+    ``WEBHOOK_MAX_PAYLOAD_SIZE`` as it comes in, and hashed for the LRU of
+    verified deliveries.
+    """
+
+    def __init__(self, fileobj=None):
+        self.file = fileobj or tempfile.SpooledTemporaryFile(SPOOL_MAX_SIZE)
+        self.size = 0
+        self._sha1 = hashlib.sha1()
+
+    @classmethod
+    def from_bytes(cls, data):
+        payload = cls(io.BytesIO())
+        payload.write(force_bytes(data))
+        return payload
+
+    def write(self, piece):
+        self.size += len(piece)
+        if self.size > djbraintree_settings.WEBHOOK_MAX_PAYLOAD_SIZE:
+            raise InvalidWebhookError("Payload is too large")
+        if ILLEGAL_PAYLOAD_RE.search(piece):
+            raise InvalidWebhookError("Payload contains illegal characters")
+        self._sha1.update(piece)
+        self.file.write(piece)
+
+    def hexdigest(self):
+        return self._sha1.hexdigest()
+
+    def chunks(self, chunk_size=READ_CHUNK_SIZE):
+        self.file.seek(0)
+        while True:
+            chunk = self.file.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+    def getvalue(self):
+        self.file.seek(0)
+        return self.file.read()
+
+    def open_decoded(self):
+        """:return: A file-like object reading the decoded XML"""
+        self.file.seek(0)
+        return Base64Reader(self.file)
+
+    def close(self):
+        self.file.close()
+
+
+def payload_signature(private_key, chunks):
+    """
+    :param chunks: The payload, as bytes or an iterable of byte chunks
+    :return: The hex HMAC-SHA1 Braintree signs the payload with, and the
+        one of the payload followed by a newline.
+    :rtype: tuple[str, str]
+    """
+    if isinstance(chunks, bytes):
+        chunks = [chunks]
+    key = hashlib.sha1(force_bytes(private_key)).digest()
+    signature = hmac.new(key, digestmod=hashlib.sha1)
+    for chunk in chunks:
+        signature.update(chunk)
+    with_newline = signature.copy()
+    with_newline.update(b"\n")
+    return signature.hexdigest(), with_newline.hexdigest()
+
+
+def check_signature_format(signature):
+    """
+    Cheap check: raise InvalidWebhookError unless ``signature`` is present,
+    within the size limit and made of ``public_key|hmac`` pairs.
+    """
+    if not signature:
+        raise InvalidWebhookError("Missing bt_signature")
+    if len(signature) > MAX_SIGNATURE_LENGTH:
+        raise InvalidWebhookError("Signature is too long")
+    if not SIGNATURE_RE.match(signature):
+        raise InvalidWebhookError("Malformed signature")
+
+
+def verify_signature(signature, payload):
+    """
+    :param signature: The ``bt_signature`` field
+    :type signature: str
+    :param payload: The ``bt_payload`` field
+    :type payload: bytes | WebhookPayload
+    :return: The merchant the webhook was signed for, None being the
+        globally configured one.
+    :raises InvalidWebhookError: If the signature doesn't match
+    """
+    check_signature_format(signature)
+    if not isinstance(payload, WebhookPayload):
+        payload = WebhookPayload.from_bytes(payload or b"")
+    if not payload.size:
+        raise InvalidWebhookError("Missing bt_payload")
+
+    credentials = webhook_credentials()
+    for pair in signature.split("&"):
+        public_key, expected = pair.split("|")
+        if public_key in credentials:
+            break
+    else:
+        raise InvalidWebhookError("No signature for a known public key")
+    merchant, private_key = credentials[public_key]
+
+    digest = (public_key, expected, payload.hexdigest())
+    if digest in _verified:
+        return merchant
+
+    # Braintree may sign the payload with or without its trailing newline
+    for signed in payload_signature(private_key, payload.chunks()):
+        if constant_time_compare(signed, expected):
+            _verified.set(digest, True)
+            return merchant
+    raise InvalidWebhookError("Signature does not match the payload")
+
+
+def build_notification(merchant, payload):
+    """
+    Parse an already verified payload.
+
+    :param merchant: The merchant returned by ``verify_signature``
+    :type payload: WebhookPayload
+    :rtype: braintree.WebhookNotification
+    :raises InvalidWebhookError: If the payload is malformed
+    """
+    braintree = braintree_sdk()
+    if merchant is None:
+        gateway = braintree.Configuration.gateway()
+    else:
+        gateway = get_gateway(merchant)
+    try:
+        attributes = parse_xml(payload.open_decoded())
+        return braintree.WebhookNotification(gateway,
+                                             attributes["notification"])
+    except (KeyError, TypeError, ValueError) as e:
+        raise InvalidWebhookError("Malformed payload: {0}".format(e))
+
+
+def parse_notification(signature, payload):
+    """
+    Verify a webhook and parse it.
+
+    :rtype: braintree.WebhookNotification
+    :raises InvalidWebhookError: If the webhook is forged or malformed
+    """
+    check_signature_format(signature)
+    payload = WebhookPayload.from_bytes(payload or b"")
+    merchant = verify_signature(signature, payload)
+    return build_notification(merchant, payload)
+
+
+def read_webhook_stream(stream, content_length):
+    """
+    Read a urlencoded webhook body from ``stream`` incrementally.
+
+    :param stream: A file-like object, e.g. the ``HttpRequest``
+    :param content_length: Size of the body
+    :return: The signature and the (not yet verified) payload. The caller
+        closes the payload.
+    :rtype: tuple[str, WebhookPayload]
+    :raises InvalidWebhookError: If a field is too large or malformed
+    """
+    signature = b""
+    payload = WebhookPayload()
+    try:
+        for name, piece, _ in iter_form_fields(stream, content_length):
+            if name == b"bt_signature":
+                signature += piece
+                if len(signature) > MAX_SIGNATURE_LENGTH:
+                    raise InvalidWebhookError("Signature is too long")
+            elif name == b"bt_payload":
+                payload.write(piece)
+        try:
+            signature = signature.decode("ascii")
+        except UnicodeDecodeError:
+            raise InvalidWebhookError("Malformed signature")
+    except InvalidWebhookError:
+        payload.close()
+        raise
+    return signature, payload
+
+
+def parse_notification_stream(stream, content_length):
+    """
+    Read a urlencoded webhook body from ``stream`` incrementally, verify it
+    and parse it.
+
+    :rtype: braintree.WebhookNotification
+    :raises InvalidWebhookError: If the webhook is forged or malformed
+    """
+    signature, payload = read_webhook_stream(stream, content_length)
+    try:
+        merchant = verify_signature(signature, payload)
+        return build_notification(merchant, payload)
+    finally:
+        payload.close()
+
+
+def clear_verified_cache():
+    _verified.clear()
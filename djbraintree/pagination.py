@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: djbraintree.pagination
+   :synopsis: dj-braintree - Keyset pagination over (created_at, id)
+
+Offset pagination gets slower the deeper a page is, because the database
+still walks every skipped row. Keyset pagination filters on the last row of
+the previous page instead, which an index on ``(created_at, id)`` answers
+in constant time whatever the page.
+"""
+
+from __future__ import unicode_literals
+
+import base64
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.encoding import force_bytes, force_text
+
+DEFAULT_PAGE_SIZE = 25
+
+
+class KeysetPage(object):
+    """A page of results, newest first, and the cursor of the next page."""
+
+    def __init__(self, object_list, next_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def encode_cursor(obj):
+    value = "{created_at}|{pk}".format(created_at=obj.created_at.isoformat(),
+                                       pk=obj.pk)
+    return force_text(base64.urlsafe_b64encode(force_bytes(value)))
+
+
+def decode_cursor(cursor):
+    """
+    :return: (created_at, pk), or None if the cursor is malformed
+    :rtype: Optional[tuple[datetime.datetime, int]]
+    """
+    try:
+        value = force_text(base64.urlsafe_b64decode(force_bytes(cursor)))
+        created_at, pk = value.rsplit("|", 1)
+        created_at = parse_datetime(created_at)
+        pk = int(pk)
+    except (TypeError, ValueError, UnicodeDecodeError):
+        return None
+    if created_at is None:
+        return None
+    return created_at, pk
+
+
+def keyset_paginate(queryset, cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Return one page of ``queryset`` ordered by ``(-created_at, -id)``.
+
+    Rows without a ``created_at`` (not yet synced from Braintree) have no
+    position in the ordering and are left out.
+
+    :param cursor: ``next_cursor`` of the previous page, or None for the
+        first page. Malformed cursors restart at the first page.
+    :rtype: KeysetPage
+    """
+    queryset = queryset.filter(created_at__isnull=False).order_by(
+        "-created_at", "-id")
+    position = decode_cursor(cursor) if cursor else None
+    if position is not None:
+        created_at, pk = position
+        queryset = queryset.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+
+    # One extra row tells us whether there is a next page.
+    object_list = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(object_list) > page_size:
+        object_list = object_list[:page_size]
+        next_cursor = encode_cursor(object_list[-1])
+    return KeysetPage(object_list, next_cursor)
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: djbraintree.provisioning
+   :synopsis: dj-braintree - Bulk creation of Braintree customers for
+   existing payers
+
+Provisioning a large, pre-existing payer base one ``Customer.get_or_create``
+at a time costs a gateway round trip plus an INSERT per payer, strictly in
+sequence. ``provision_customers`` instead walks the payers in primary key
+order, one chunk at a time, issues the gateway ``create`` calls for a chunk
+concurrently and inserts the resulting rows with a single ``bulk_create``.
+
+Progress is written to an optional JSON checkpoint file so that an
+interrupted run can be resumed. Braintree customers are created with an
+id derived from the payer's primary key (see ``CUSTOMER_ID_FORMAT``): if
+a run dies between a gateway create and the checkpoint, the create is
+refused as a duplicate on resume and the existing customer is used
+instead, so no payer ever gets a second Braintree customer.
+"""
+
+from __future__ import unicode_literals
+
+import json
+import os
+from multiprocessing.pool import ThreadPool
+
+from django.db import IntegrityError, transaction
+
+from .exceptions import CircuitOpenError
+from .gateway import braintree_sdk
+from .models import Customer
+
+DEFAULT_CHUNK_SIZE = 500
+DEFAULT_WORKERS = 8
+
+# Braintree customer id of a provisioned payer
+CUSTOMER_ID_FORMAT = "payer_{pk}"
+
+
+class ProvisioningCheckpoint(object):
+    """
+    Resumable progress marker for ``provision_customers``.
+
+    ``last_pk`` is the highest payer primary key that has been fully
+    processed. ``pending`` holds ``[payer_pk, braintree_id]`` pairs for
+    Braintree customers that were created on the gateway but not yet saved
+    locally; they are saved first when a run resumes.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.last_pk = None
+        self.pending = []
+        if path and os.path.exists(path):
+            with open(path) as checkpoint_file:
+                data = json.load(checkpoint_file)
+            self.last_pk = data.get("last_pk")
+            self.pending = data.get("pending", [])
+
+    def save(self):
+        if not self.path:
+            return
+        tmp_path = "{path}.tmp".format(path=self.path)
+        with open(tmp_path, "w") as checkpoint_file:
+            json.dump({"last_pk": self.last_pk, "pending": self.pending},
+                      checkpoint_file)
+        os.rename(tmp_path, self.path)
+
+    def clear(self):
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def provisioned_customer_id(payer):
+    return CUSTOMER_ID_FORMAT.format(pk=payer.pk)
+
+
+def _id_is_in_use(result):
+    code = braintree_sdk().ErrorCodes.Customer.IdIsInUse
+    return any(error.code == code for error in result.errors.deep_errors)
+
+
+def _create_braintree_customer(payer):
+    """
+    Create the payer's Braintree customer, or find the one an interrupted
+    run already created.
+
+    :return: (payer, braintree.Customer or None, error message or None)
+    """
+    from braintree.exceptions.braintree_error import BraintreeError
+
+    customer_id = provisioned_customer_id(payer)
+    try:
+        result = Customer.api().create({"id": customer_id,
+                                        "email": payer.email})
+        if not result.is_success and _id_is_in_use(result):
+            return payer, Customer.api().find(customer_id), None
+    except (BraintreeError, CircuitOpenError) as e:
+        return payer, None, str(e)
+    if not result.is_success:
+        return payer, None, result.message
+    return payer, Customer.extract_object_from_result(result), None
+
+
+def _save_customers(customers):
+    """
+    Insert a chunk of Customer rows in one query. If a row collides with a
+    customer created concurrently (e.g. by ``Customer.get_or_create`` in a
+    request), fall back to saving the chunk row by row and skip the
+    collisions.
+
+    :return: The Customers that could not be saved.
+    :rtype: list[Customer]
+    """
+    try:
+        with transaction.atomic():
+            Customer.objects.bulk_create(customers)
+        return []
+    except IntegrityError:
+        pass
+
+    conflicts = []
+    for customer in customers:
+        try:
+            with transaction.atomic():
+                customer.save()
+        except IntegrityError:
+            conflicts.append(customer)
+    return conflicts
+
+
+def provision_customers(queryset, chunk_size=DEFAULT_CHUNK_SIZE,
+                        workers=DEFAULT_WORKERS, checkpoint_path=None,
+                        log=None):
+    """
+    Create Braintree customers (and local Customer rows) for every payer in
+    ``queryset``.
+
+    :param queryset: Payers to provision, usually
+        ``get_payer_model().objects.filter(customer__isnull=True)``
+    :param chunk_size: Payers read, created and inserted per batch
+    :param workers: Concurrent gateway ``create`` calls
+    :param checkpoint_path: Optional JSON file used to resume a run
+    :param log: Optional callable receiving progress messages
+    :return: (created, failed) counts
+    :rtype: tuple[int, int]
+    """
+    log = log or (lambda message: None)
+    checkpoint = ProvisioningCheckpoint(checkpoint_path)
+    created = failed = 0
+
+    if checkpoint.pending:
+        # Gateway customers from an interrupted run: save them before
+        # moving on so that they are not created a second time.
+        customers = [
+            Customer(entity_id=payer_pk, braintree_id=braintree_id)
+            for payer_pk, braintree_id in checkpoint.pending]
+        conflicts = _save_customers(customers)
+        created += len(customers) - len(conflicts)
+        for customer in conflicts:
+            log("Orphaned Braintree customer {0} for payer {1}".format(
+                customer.braintree_id, customer.entity_id))
+        checkpoint.pending = []
+        checkpoint.save()
+
+    queryset = queryset.order_by("pk")
+    pool = ThreadPool(processes=workers)
+    try:
+        while True:
+            chunk_qs = queryset
+            if checkpoint.last_pk is not None:
+                chunk_qs = chunk_qs.filter(pk__gt=checkpoint.last_pk)
+            payers = list(chunk_qs[:chunk_size])
+            if not payers:
+                break
+
+            customers = []
+            for payer, braintree_customer, error in pool.imap_unordered(
+                    _create_braintree_customer, payers):
+                if braintree_customer is None:
+                    failed += 1
+                    log("Failed to create customer for {0}: {1}".format(
+                        payer.email, error))
+                    continue
+                customer = Customer(
+                    entity=payer,
+                    **Customer.braintree_object_to_record(braintree_customer))
+                customers.append(customer)
+
+            checkpoint.pending = [
+                [customer.entity_id, customer.braintree_id]
+                for customer in customers]
+            checkpoint.save()
+
+            conflicts = _save_customers(customers)
+            created += len(customers) - len(conflicts)
+            for customer in conflicts:
+                log("Orphaned Braintree customer {0} for payer {1}".format(
+                    customer.braintree_id, customer.entity_id))
+
+            checkpoint.pending = []
+            checkpoint.last_pk = payers[-1].pk
+            checkpoint.save()
+            log("Provisioned {0} customers ({1} failed)".format(
+                created, failed))
+    finally:
+        pool.close()
+        pool.join()
+
+    checkpoint.clear()
+    return created, failed
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: djbraintree.records
+   :synopsis: dj-braintree - Compact, fixed-layout records for mapped
+   Braintree payloads
+
+``BraintreeObject.braintree_object_to_record`` returns one ``dict`` per
+object, which is convenient but carries a hash table per instance. Bulk
+pipelines (sync, reconciliation, export) that hold thousands of mapped
+objects before writing them can use the ``__slots__`` classes generated here
+instead: one class per model, with a fixed field order taken from the
+model's concrete fields. ``Dispute.sync_from_braintree_objects`` holds its
+batches this way.
+"""
+
+from __future__ import unicode_literals
+
+
+class _Missing(object):
+    """
+    Marks a slot that ``braintree_object_to_record`` did not fill in, so that
+    converting back to a dict only yields the keys the mapping produced.
+    """
+    __slots__ = ()
+
+    def __repr__(self):
+        return "MISSING"
+
+    def __bool__(self):
+        return False
+    __nonzero__ = __bool__
+
+
+MISSING = _Missing()
+
+# Bookkeeping fields that are never part of a mapped Braintree payload.
+EXCLUDED_FIELDS = ("id", "created", "modified")
+
+
+class CompactRecord(object):
+    """
+    Base class for the generated record types.
+
+    Subclasses only define ``fields`` (the slot names, in order); values are
+    stored positionally so that a record costs one fixed-size object instead
+    of a dict.
+    """
+    __slots__ = ()
+    fields = ()
+
+    def __init__(self, *args, **kwargs):
+        if len(args) > len(self.fields):
+            raise TypeError(
+                "{name} takes at most {count} values ({given} given)".format(
+                    name=type(self).__name__, count=len(self.fields),
+                    given=len(args)))
+        for name, value in zip(self.fields, args):
+            setattr(self, name, value)
+        for name in self.fields[len(args):]:
+            setattr(self, name, kwargs.pop(name, MISSING))
+        if kwargs:
+            raise TypeError(
+                "{name} has no field(s) {fields}".format(
+                    name=type(self).__name__,
+                    fields=", ".join(sorted(kwargs))))
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Build a record from a ``braintree_object_to_record`` dict.
+
+        :raises TypeError: for keys that are not record fields, such as
+            relational ids, just like ``objects.create()`` rejects unknown
+            fields.
+        """
+        return cls(**data)
+
+    def as_dict(self):
+        """
+        :return: The mapped values, omitting slots that were never filled.
+        :rtype: dict
+        """
+        data = {}
+        for name in self.fields:
+            value = getattr(self, name)
+            if value is not MISSING:
+                data[name] = value
+        return data
+
+    def as_tuple(self):
+        """
+        :return: The values in ``fields`` order, with unfilled slots as None.
+        :rtype: tuple
+        """
+        return tuple(
+            None if value is MISSING else value
+            for value in (getattr(self, name) for name in self.fields))
+
+    def __iter__(self):
+        return iter(self.as_tuple())
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name)
+                   for name in self.fields)
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "<{name} {values}>".format(
+            name=type(self).__name__,
+            values=", ".join(
+                "{0}={1!r}".format(name, getattr(self, name))
+                for name in self.fields
+                if getattr(self, name) is not MISSING))
+
+
+_record_classes = {}
+
+
+def record_fields(model):
+    """
+    The fixed field order used for ``model``'s compact records: its concrete,
+    non-relational fields in declaration order.
+
+    :type model: type[djbraintree.braintree_objects.BraintreeObject]
+    :rtype: tuple[str]
+    """
+    return tuple(
+        field.attname for field in model._meta.concrete_fields
+        if not field.is_relation and field.attname not in EXCLUDED_FIELDS)
+
+
+def record_class_for(model):
+    """
+    Return (and cache) the generated ``CompactRecord`` subclass for a model.
+
+    :type model: type[djbraintree.braintree_objects.BraintreeObject]
+    :rtype: type[CompactRecord]
+    """
+    try:
+        return _record_classes[model]
+    except KeyError:
+        fields = record_fields(model)
+        record_class = type(
+            str("{name}Record".format(name=model.__name__)),
+            (CompactRecord,),
+            {
+                "__slots__": tuple(str(name) for name in fields),
+                "fields": fields,
+                "__module__": __name__,
+            })
+        _record_classes[model] = record_class
+        return record_class
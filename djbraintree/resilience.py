@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: djbraintree.resilience
+   :synopsis: dj-braintree - Circuit breaker and retries for gateway calls
+
+Every call made through ``BraintreeObject.api()`` passes through a
+``CircuitBreaker`` shared by all threads talking to the same merchant
+gateway:
+
+* **closed**: calls go through; consecutive timeouts and 5xx responses are
+  counted, any other outcome resets the count.
+* **open**: after ``failure_threshold`` consecutive failures, calls fail fast
+  with ``CircuitOpenError`` for ``reset_timeout`` seconds instead of blocking
+  request threads for the full SDK timeout.
+* **half open**: once the timeout has elapsed, a single probe call is let
+  through. Success closes the circuit, failure opens it again.
+
+Idempotent reads (``find``, ``search``, ``all``) are also retried with
+jittered exponential backoff. Every state change is sent as the
+``circuit_breaker_state_changed`` signal and logged.
+"""
+
+from __future__ import unicode_literals
+
+import logging
+import random
+import threading
+import time
+
+from . import settings as djbraintree_settings
+from .exceptions import CircuitOpenError
+from .signals import circuit_breaker_state_changed
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Gateway methods that are safe to call more than once
+IDEMPOTENT_METHODS = ("find", "search", "all")
+
+_transient_errors = None
+
+
+def transient_errors():
+    """
+    :return: The exception types that count as gateway failures: timeouts,
+        connection errors and 5xx responses. The SDK raises
+        ``UnexpectedError`` for the statuses it has no exception for, such as
+        502 and 504 from a proxy in front of the gateway.
+    :rtype: tuple[type]
+    """
+    global _transient_errors
+    if _transient_errors is None:
+        import requests
+        from braintree.exceptions import (DownForMaintenanceError,
+                                          ServerError, UnexpectedError)
+        from braintree.exceptions.http.connection_error import (
+            ConnectionError as BraintreeConnectionError)
+        from braintree.exceptions.http.timeout_error import (
+            TimeoutError as BraintreeTimeoutError)
+
+        _transient_errors = (
+            ServerError,
+            DownForMaintenanceError,
+            UnexpectedError,
+            BraintreeConnectionError,
+            BraintreeTimeoutError,
+            requests.exceptions.ConnectionError,
+            requests.exceptions.Timeout,
+        )
+    return _transient_errors
+
+
+class CircuitBreaker(object):
+
+    def __init__(self, name, failure_threshold=None, reset_timeout=None,
+                 clock=time.time):
+        self.name = name
+        self.failure_threshold = (
+            failure_threshold or
+            djbraintree_settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD)
+        self.reset_timeout = (
+            reset_timeout or
+            djbraintree_settings.CIRCUIT_BREAKER_RESET_TIMEOUT)
+        self.clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def _set_state(self, new_state):
+        # Called with the lock held
+        old_state, self.state = self.state, new_state
+        if old_state == new_state:
+            return
+        logger.warning("Braintree circuit breaker %s: %s -> %s",
+                       self.name, old_state, new_state)
+        circuit_breaker_state_changed.send(
+            sender=CircuitBreaker, name=self.name,
+            old_state=old_state, new_state=new_state)
+
+    def before_call(self):
+        """
+        Raise CircuitOpenError unless a call may go through right now.
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            if self.state == OPEN:
+                if self.clock() - self.opened_at < self.reset_timeout:
+                    raise CircuitOpenError(
+                        "Braintree circuit breaker {0} is open".format(
+                            self.name))
+                self._set_state(HALF_OPEN)
+            # Half open: let exactly one probe through
+            if self._probing:
+                raise CircuitOpenError(
+                    "Braintree circuit breaker {0} is probing".format(
+                        self.name))
+            self._probing = True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._probing = False
+            self._set_state(CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self._probing = False
+            self.failures += 1
+            if (self.state == HALF_OPEN or
+                    self.failures >= self.failure_threshold):
+                self.opened_at = self.clock()
+                self._set_state(OPEN)
+
+    def record_other(self):
+        """The call neither failed transiently nor succeeded (e.g. 404)."""
+        self.record_success()
+
+    def release_probe(self):
+        """The outcome of the call is unknown: let another probe through."""
+        with self._lock:
+            self._probing = False
+
+    def call(self, func, *args, **kwargs):
+        self.before_call()
+        record = self.release_probe
+        try:
+            result = func(*args, **kwargs)
+            record = self.record_success
+        except transient_errors():
+            record = self.record_failure
+            raise
+        except Exception:
+            record = self.record_other
+            raise
+        finally:
+            # Also runs for KeyboardInterrupt, greenlet timeouts... which
+            # must not leave a half open breaker probing forever.
+            record()
+        return result
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(merchant=None):
+    """
+    :return: The circuit breaker shared by every call to ``merchant``'s
+        gateway (None being the globally configured one).
+    :rtype: CircuitBreaker
+    """
+    try:
+        return _breakers[merchant]
+    except KeyError:
+        pass
+    with _breakers_lock:
+        if merchant not in _breakers:
+            _breakers[merchant] = CircuitBreaker(merchant or "default")
+        return _breakers[merchant]
+
+
+def reset_breakers():
+    with _breakers_lock:
+        _breakers.clear()
+
+
+def backoff_delay(attempt, base_delay=None, max_delay=None):
+    """
+    Full jitter exponential backoff: a random delay between 0 and
+    ``base_delay * 2 ** attempt``, capped at ``max_delay``.
+    """
+    base_delay = base_delay or djbraintree_settings.GATEWAY_RETRY_BASE_DELAY
+    max_delay = max_delay or djbraintree_settings.GATEWAY_RETRY_MAX_DELAY
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+
+def call_with_retries(breaker, func, args=(), kwargs=None, retries=None,
+                      sleep=time.sleep):
+    """
+    Call ``func`` through ``breaker``, retrying transient failures. Gives up
+    as soon as the breaker opens.
+    """
+    kwargs = kwargs or {}
+    if retries is None:
+        retries = djbraintree_settings.GATEWAY_READ_RETRIES
+    attempt = 0
+    while True:
+        try:
+            return breaker.call(func, *args, **kwargs)
+        except transient_errors():
+            if attempt >= retries:
+                raise
+        sleep(backoff_delay(attempt))
+        attempt += 1
+
+
+class ResilientApi(object):
+    """
+    Wraps the object returned by ``BraintreeObject.api()`` (e.g.
+    ``braintree.Transaction`` or ``gateway.transaction``) so that its methods
+    go through the merchant's circuit breaker, with retries for idempotent
+    reads. Other attributes are passed through untouched.
+    """
+
+    def __init__(self, target, merchant=None):
+        self.target = target
+        self.breaker = get_breaker(merchant)
+
+    def __getattr__(self, name):
+        attr = getattr(self.target, name)
+        if not callable(attr) or isinstance(attr, type):
+            return attr
+        if name in IDEMPOTENT_METHODS:
+            def wrapper(*args, **kwargs):
+                return call_with_retries(self.breaker, attr, args, kwargs)
+        else:
+            def wrapper(*args, **kwargs):
+                return self.breaker.call(attr, *args, **kwargs)
+        wrapper.__name__ = str(name)
+        return wrapper
+
+    def __repr__(self):
+        return "<ResilientApi {0!r}>".format(self.target)
@@ -51,17 +51,93 @@ trial_period_for_subscriber_callback = getattr(settings,
 )
 
 DJBRAINTREE_WEBHOOK_URL = getattr(settings, "DJBRAINTREE_WEBHOOK_URL", r"^webhook/$")
+WEBHOOK_MAX_PAYLOAD_SIZE = getattr(settings, "DJBRAINTREE_WEBHOOK_MAX_PAYLOAD_SIZE", 5 * 1024 * 1024)
+WEBHOOK_VERIFIED_CACHE_SIZE = getattr(settings, "DJBRAINTREE_WEBHOOK_VERIFIED_CACHE_SIZE", 1024)
 
+# Persisted webhook queue, see djbraintree.webhook_queue
+WEBHOOK_QUEUE = getattr(settings, "DJBRAINTREE_WEBHOOK_QUEUE", False)
+WEBHOOK_BATCH_SIZE = getattr(settings, "DJBRAINTREE_WEBHOOK_BATCH_SIZE", 100)
+WEBHOOK_MAX_ATTEMPTS = getattr(settings, "DJBRAINTREE_WEBHOOK_MAX_ATTEMPTS", 5)
+WEBHOOK_CLAIM_TIMEOUT = getattr(settings, "DJBRAINTREE_WEBHOOK_CLAIM_TIMEOUT", 300)
+WEBHOOK_COALESCE_WINDOW = getattr(settings, "DJBRAINTREE_WEBHOOK_COALESCE_WINDOW", 5)
 
-def plan_from_braintree_id(braintree_id):
+# In-process cache in front of the PayerAccess table
+PAYER_ACCESS_CACHE_SIZE = getattr(settings, "DJBRAINTREE_PAYER_ACCESS_CACHE_SIZE", 10000)
+PAYER_ACCESS_CACHE_TTL = getattr(settings, "DJBRAINTREE_PAYER_ACCESS_CACHE_TTL", 30)
+
+# Process-wide cache of MerchantAccount primary keys
+MERCHANT_ACCOUNT_CACHE_SIZE = getattr(settings, "DJBRAINTREE_MERCHANT_ACCOUNT_CACHE_SIZE", 1024)
+
+# Gateway circuit breaker and retries, see djbraintree.resilience
+CIRCUIT_BREAKER_FAILURE_THRESHOLD = getattr(settings, "DJBRAINTREE_CIRCUIT_BREAKER_FAILURE_THRESHOLD", 5)
+CIRCUIT_BREAKER_RESET_TIMEOUT = getattr(settings, "DJBRAINTREE_CIRCUIT_BREAKER_RESET_TIMEOUT", 30)
+GATEWAY_READ_RETRIES = getattr(settings, "DJBRAINTREE_GATEWAY_READ_RETRIES", 3)
+GATEWAY_RETRY_BASE_DELAY = getattr(settings, "DJBRAINTREE_GATEWAY_RETRY_BASE_DELAY", 0.1)
+GATEWAY_RETRY_MAX_DELAY = getattr(settings, "DJBRAINTREE_GATEWAY_RETRY_MAX_DELAY", 2.0)
+
+
+try:
+    from types import MappingProxyType as _frozen
+except ImportError:  # Python 2
+    _frozen = dict
+
+_plan_indexes = {}
+
+
+def build_plan_indexes():
+    """
+    Build the reverse lookup tables for the configured plans:
+
+    * ``braintree_plan_id`` -> plan key, from ``DJBRAINTREE_PLANS``
+    * plan key -> level, from ``DJBRAINTREE_PLAN_HIERARCHY``
+
+    Called once when the app is ready, and again whenever one of those
+    settings changes (e.g. ``override_settings`` in tests).
+    """
     payment_plans = getattr(settings, "DJBRAINTREE_PLANS", {})
-    plan_id = None
+    plan_hierarchy = getattr(settings, "DJBRAINTREE_PLAN_HIERARCHY", {})
 
-    for key in payment_plans.keys():
-        if payment_plans[key].get("braintree_plan_id") == braintree_id:
-            plan_id = key
+    plans_by_braintree_id = {}
+    for key, plan in payment_plans.items():
+        braintree_plan_id = plan.get("braintree_plan_id")
+        if braintree_plan_id:
+            plans_by_braintree_id.setdefault(braintree_plan_id, key)
 
-    return plan_id
+    plan_levels = {}
+    for config_level in plan_hierarchy.values():
+        for name in config_level["plans"]:
+            plan_levels[name] = config_level["level"]
+
+    _plan_indexes["braintree_id"] = _frozen(plans_by_braintree_id)
+    _plan_indexes["level"] = _frozen(plan_levels)
+
+
+def _get_plan_index(name):
+    if name not in _plan_indexes:
+        build_plan_indexes()
+    return _plan_indexes[name]
+
+
+def plan_settings_changed(setting, **kwargs):
+    """``setting_changed`` receiver that rebuilds the plan lookup tables."""
+    if setting in ("DJBRAINTREE_PLANS", "DJBRAINTREE_PLAN_HIERARCHY"):
+        build_plan_indexes()
+    if setting == "DJBRAINTREE_PLANS":
+        from .catalog import invalidate_catalog
+        invalidate_catalog()
+
+
+def plan_from_braintree_id(braintree_id):
+    return _get_plan_index("braintree_id").get(braintree_id)
+
+
+def plan_level(name):
+    """
+    :return: The ``DJBRAINTREE_PLAN_HIERARCHY`` level of a plan, or -1 if
+        the plan is not part of the hierarchy.
+    :rtype: int
+    """
+    return _get_plan_index("level").get(name, -1)
 
 
 def _check_subscriber_for_email_address(subscriber_model, message):
@@ -6,6 +6,8 @@ cancelled = Signal(providing_args=["braintree_response"])
 card_changed = Signal(providing_args=["braintree_response"])
 subscription_made = Signal(providing_args=["plan", "braintree_response"])
 webhook_processing_error = Signal(providing_args=["data", "exception"])
+webhook_received = Signal(providing_args=["notification"])
+circuit_breaker_state_changed = Signal(providing_args=["name", "old_state", "new_state"])
 
 WEBHOOK_SIGNALS = dict([
     (hook, Signal(providing_args=["event"]))
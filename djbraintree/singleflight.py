@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: djbraintree.singleflight
+   :synopsis: dj-braintree - Coalescing of concurrent identical calls
+
+When several threads ask for the same thing at once (say, a webhook, a page
+view and a sync job all calling ``api_find()`` for the same transaction),
+only the first one actually makes the call. The others wait for it and
+share its result or exception. Nothing is cached: once the call returns,
+the next request for the same key makes a fresh call.
+"""
+
+from __future__ import unicode_literals
+
+import threading
+
+
+class _Call(object):
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func, *args, **kwargs):
+        """
+        Call ``func(*args, **kwargs)``, unless a call for ``key`` is already
+        in flight in another thread, in which case wait for that one and
+        return its result (or raise its exception).
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def in_flight(self):
+        """:return: The number of calls currently in flight."""
+        with self._lock:
+            return len(self._calls)
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: djbraintree.streaming
+   :synopsis: dj-braintree - Incremental readers for large webhook bodies
+
+Disbursement and settlement webhooks can be megabytes long. Reading the
+body at once, base64 decoding it and building a DOM with the SDK's minidom
+parser costs several copies of the payload. These helpers handle it one
+chunk at a time instead:
+
+* ``iter_form_fields`` reads an ``application/x-www-form-urlencoded`` body
+  from a stream and yields the decoded field values in pieces;
+* ``Base64Reader`` decodes a base64 file object lazily, as it is read;
+* ``parse_xml`` builds the same dict as ``braintree.util.parser.Parser``
+  from ``iterparse`` events, dropping each element once it is converted.
+"""
+
+from __future__ import unicode_literals
+
+import base64
+import binascii
+from datetime import datetime
+from xml.etree import ElementTree
+
+try:
+    from urllib.parse import unquote_to_bytes
+except ImportError:  # Python 2
+    from urllib import unquote as unquote_to_bytes
+
+READ_CHUNK_SIZE = 64 * 1024
+
+
+def _unquote(data):
+    return unquote_to_bytes(data.replace(b"+", b" "))
+
+
+def iter_form_fields(stream, content_length, chunk_size=READ_CHUNK_SIZE):
+    """
+    Read a urlencoded body incrementally.
+
+    :param stream: A file-like object, e.g. the ``HttpRequest``
+    :param content_length: Number of bytes to read from ``stream``
+    :return: ``(name, piece, last)`` tuples. A field value is split into
+        as many pieces as needed; ``last`` is True on its final piece.
+    :rtype: collections.Iterator[tuple[bytes, bytes, bool]]
+    """
+    remaining = content_length
+    buf = b""
+    name = None
+    eof = False
+    while not eof or buf:
+        if not eof:
+            data = stream.read(min(chunk_size, remaining)) if remaining else b""
+            remaining -= len(data)
+            eof = not data or remaining <= 0
+            buf += data
+
+        while buf:
+            if name is None:
+                end = buf.find(b"&")
+                equals = buf.find(b"=", 0, end if end >= 0 else len(buf))
+                if equals >= 0:
+                    name, buf = _unquote(buf[:equals]), buf[equals + 1:]
+                elif end >= 0:
+                    # A name without a value
+                    buf = buf[end + 1:]
+                elif eof:
+                    buf = b""
+                else:
+                    break
+            else:
+                end = buf.find(b"&")
+                if end >= 0:
+                    piece, buf = buf[:end], buf[end + 1:]
+                    yield name, _unquote(piece), True
+                    name = None
+                elif eof:
+                    piece, buf = buf, b""
+                    yield name, _unquote(piece), True
+                    name = None
+                else:
+                    # Keep a percent escape that straddles two chunks whole
+                    cut = len(buf)
+                    if buf[-1:] == b"%":
+                        cut -= 1
+                    elif buf[-2:-1] == b"%":
+                        cut -= 2
+                    piece, buf = buf[:cut], buf[cut:]
+                    if piece:
+                        yield name, _unquote(piece), False
+                    break
+
+    if name is not None:
+        yield name, b"", True
+
+
+class Base64Reader(object):
+    """
+    File-like object decoding the base64 content of ``fileobj`` as it is
+    read. Newlines in the input are ignored.
+    """
+
+    def __init__(self, fileobj, chunk_size=READ_CHUNK_SIZE):
+        self.fileobj = fileobj
+        self.chunk_size = chunk_size
+        self._pending = b""
+        self._buffer = b""
+        self._eof = False
+
+    def _fill(self):
+        data = self.fileobj.read(self.chunk_size)
+        if data:
+            encoded = self._pending + data.replace(b"\n", b"")
+            cut = len(encoded) - len(encoded) % 4
+            encoded, self._pending = encoded[:cut], encoded[cut:]
+        else:
+            encoded, self._pending = self._pending, b""
+            self._eof = True
+        try:
+            self._buffer += base64.b64decode(encoded)
+        except (binascii.Error, TypeError) as e:
+            raise ValueError("Invalid base64 data: {0}".format(e))
+
+    def read(self, size=-1):
+        while not self._eof and (size < 0 or len(self._buffer) < size):
+            self._fill()
+        if size < 0:
+            size = len(self._buffer)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+def _underscored(tag):
+    return tag.replace("-", "_")
+
+
+def _node_content(element, content):
+    node_type = element.get("type")
+    if node_type == "integer":
+        return int(content)
+    elif node_type == "boolean":
+        return content == "true" or content == "1"
+    elif node_type == "datetime":
+        return datetime.strptime(content, "%Y-%m-%dT%H:%M:%SZ")
+    elif node_type == "date":
+        return datetime.strptime(content, "%Y-%m-%d").date()
+    elif element.get("nil") == "true":
+        return None
+    return content or ""
+
+
+def _node_value(element, text, children):
+    if element.get("type") == "array":
+        return [value for _, value, _ in children]
+    if text is not None or not children:
+        return _node_content(element, text)
+    result = {}
+    for tag, value, replaces in children:
+        if replaces or not result.get(tag):
+            result[tag] = value
+        else:
+            if not isinstance(result[tag], list):
+                result[tag] = [result[tag]]
+            result[tag].append(value)
+    return result
+
+
+def parse_xml(source):
+    """
+    :param source: A file-like object with the XML document
+    :return: The document as nested dicts, lists and values, exactly as
+        ``braintree.util.xml_util.XmlUtil.dict_from_xml`` would return it.
+    :rtype: dict
+    :raises ValueError: If the document is malformed
+    """
+    # One frame per open element: (element, converted children)
+    stack = []
+    root = None
+    try:
+        for event, element in ElementTree.iterparse(
+                source, events=("start", "end")):
+            if event == "start":
+                stack.append((element, []))
+                continue
+
+            _, children = stack.pop()
+            text = element.text
+            if text is not None and not text.strip():
+                # Whitespace between tags is not content
+                text = None
+            value = _node_value(element, text, children)
+            tag = _underscored(element.tag)
+            if stack:
+                # Text or array children replace earlier siblings with
+                # the same tag, others are collected into a list.
+                replaces = (element.get("type") == "array" or
+                            text is not None)
+                stack[-1][1].append((tag, value, replaces))
+            else:
+                root = {tag: value}
+            element.clear()
+    except ElementTree.ParseError as e:
+        raise ValueError("Malformed XML: {0}".format(e))
+    if root is None:
+        raise ValueError("Empty XML document")
+    return root
@@ -3,12 +3,12 @@ from __future__ import unicode_literals
 
 from django.conf import settings
 
-from braintree.exceptions.not_found_error import NotFoundError
-
-from .models import Customer
+from .models import Customer, Plan
 
 
 def sync_entity(entity):
+    from braintree.exceptions.not_found_error import NotFoundError
+
     customer, created = Customer.get_or_create(entity=entity)
     try:
         braintree_customer_object = customer.api_find()
@@ -20,24 +20,18 @@ def sync_entity(entity):
         print("ERROR: " + str(e))
     return customer
 
-#
-# def sync_plans(api_key=settings.BRAINTREE_PRIVATE_KEY):
-#     stripe.api_key = api_key
-#     for plan in settings.DJSTRIPE_PLANS:
-#         stripe_plan = settings.DJSTRIPE_PLANS[plan]
-#         if stripe_plan.get("stripe_plan_id"):
-#             try:
-#                 stripe.Plan.create(
-#                     amount=stripe_plan["price"],
-#                     interval=stripe_plan["interval"],
-#                     name=stripe_plan["name"],
-#                     currency=stripe_plan["currency"],
-#                     id=stripe_plan["stripe_plan_id"],
-#                     interval_count=stripe_plan.get("interval_count"),
-#                     trial_period_days=stripe_plan.get("trial_period_days"),
-#                     statement_descriptor=stripe_plan.get("statement_descriptor"),
-#                     metadata=stripe_plan.get("metadata")
-#                 )
-#                 print("Plan created for {0}".format(plan))
-#             except Exception as e:
-#                 print("ERROR: " + str(e))
+
+def sync_plans():
+    """
+    Copy the plans of the Braintree account to the Plan table. Plans can't
+    be created through the Braintree API: warn about the configured plans
+    that are missing from the account instead.
+    """
+    synced = Plan.sync_all()
+    known = set(Plan.objects.values_list("braintree_id", flat=True))
+    for key, plan in getattr(settings, "DJBRAINTREE_PLANS", {}).items():
+        braintree_plan_id = plan.get("braintree_plan_id")
+        if braintree_plan_id and braintree_plan_id not in known:
+            print("WARNING: Plan {0} ({1}) does not exist in Braintree".format(
+                key, braintree_plan_id))
+    return synced
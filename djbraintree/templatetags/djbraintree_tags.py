@@ -33,9 +33,4 @@ def djbraintree_plan_level(name):
 
     Note: Custom settings setup is needed, please see the documentation for details.
     """
-    level = -1
-    for config_level in djbraintree_settings.PLAN_HIERARCHY.values():
-        if name in config_level["plans"]:
-            level = config_level["level"]
-
-    return level
+    return djbraintree_settings.plan_level(name)
@@ -1,11 +1,12 @@
 # -*- coding: utf-8 -*-
+import datetime
 import warnings
 
+from django.conf import settings
 from django.core.exceptions import ImproperlyConfigured
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AnonymousUser
-
-from braintree.transaction import Transaction
+from django.utils import timezone
 
 VERIFICATION_CHOICES = [
     ("M", "Matches"),
@@ -15,22 +16,73 @@ VERIFICATION_CHOICES = [
     ("A", "Not Applicable"),
 ]
 
+# Mirrors braintree.Transaction.Status. Spelled out here so that importing the
+# models doesn't import the Braintree SDK.
 STATUS_CHOICES = [
-(Transaction.Status.AuthorizationExpired, Transaction.Status.AuthorizationExpired),
-(Transaction.Status.Authorized, Transaction.Status.Authorized),
-(Transaction.Status.Authorizing, Transaction.Status.Authorizing),
-(Transaction.Status.Failed, Transaction.Status.Failed),
-(Transaction.Status.GatewayRejected, Transaction.Status.GatewayRejected),
-(Transaction.Status.ProcessorDeclined, Transaction.Status.ProcessorDeclined),
-(Transaction.Status.Settled, Transaction.Status.Settled),
-(Transaction.Status.SettlementConfirmed, Transaction.Status.SettlementConfirmed),
-(Transaction.Status.SettlementDeclined, Transaction.Status.SettlementDeclined),
-(Transaction.Status.SettlementFailed, Transaction.Status.SettlementFailed),
-(Transaction.Status.SettlementPending, Transaction.Status.SettlementPending),
-(Transaction.Status.Settling, Transaction.Status.Settling),
-(Transaction.Status.SubmittedForSettlement, Transaction.Status.SubmittedForSettlement),
-(Transaction.Status.Voided, Transaction.Status.Voided),
-(Transaction.Status.Unrecognized, Transaction.Status.Unrecognized),
+    ("authorization_expired", "authorization_expired"),
+    ("authorized", "authorized"),
+    ("authorizing", "authorizing"),
+    ("failed", "failed"),
+    ("gateway_rejected", "gateway_rejected"),
+    ("processor_declined", "processor_declined"),
+    ("settled", "settled"),
+    ("settlement_confirmed", "settlement_confirmed"),
+    ("settlement_declined", "settlement_declined"),
+    ("settlement_failed", "settlement_failed"),
+    ("settlement_pending", "settlement_pending"),
+    ("settling", "settling"),
+    ("submitted_for_settlement", "submitted_for_settlement"),
+    ("voided", "voided"),
+    ("unrecognized", "unrecognized"),
+]
+
+# Statuses of a sale that went through
+CHARGED_TRANSACTION_STATUSES = (
+    "authorized",
+    "submitted_for_settlement",
+    "settling",
+    "settlement_pending",
+    "settlement_confirmed",
+    "settled",
+)
+
+# Mirrors braintree.MerchantAccount.Status
+MERCHANT_ACCOUNT_STATUS_CHOICES = [
+    ("active", "active"),
+    ("pending", "pending"),
+    ("suspended", "suspended"),
+]
+
+# Mirrors braintree.Subscription.Status
+SUBSCRIPTION_STATUS_CHOICES = [
+    ("Active", "Active"),
+    ("Canceled", "Canceled"),
+    ("Expired", "Expired"),
+    ("Past Due", "Past Due"),
+    ("Pending", "Pending"),
+]
+
+# Subscription statuses granting access to paid features
+ACTIVE_SUBSCRIPTION_STATUSES = ("Active", "Past Due")
+
+# Mirrors braintree.Dispute.Status, including newer braintree releases
+DISPUTE_STATUS_CHOICES = [
+    ("accepted", "accepted"),
+    ("disputed", "disputed"),
+    ("expired", "expired"),
+    ("lost", "lost"),
+    ("open", "open"),
+    ("won", "won"),
+]
+
+# Dispute statuses not decided yet
+OPEN_DISPUTE_STATUSES = ("open", "disputed")
+
+# Mirrors braintree.Dispute.Kind
+DISPUTE_KIND_CHOICES = [
+    ("chargeback", "chargeback"),
+    ("pre_arbitration", "pre_arbitration"),
+    ("retrieval", "retrieval"),
 ]
 
 
@@ -63,20 +115,45 @@ def entity_has_active_subscription(entity):
         * customer has active subscription
         * user.is_superuser
         * user.is_staff
+
+    Answered from the PayerAccess table (a primary key lookup, cached in
+    process for a few seconds), never from the gateway.
     """
-    from djbraintree.models import Customer
+    from djbraintree.models import PayerAccess
+
+    if entity_bypasses_paywall(entity):
+        return True
 
+    return PayerAccess.has_access(entity.pk)
+
+
+def entity_bypasses_paywall(entity):
+    """
+    :return: True for staff users and superusers, who never need a
+        subscription.
+    :raises ImproperlyConfigured: If the entity is an anonymous user
+    """
     if isinstance(entity, AnonymousUser):
         raise ImproperlyConfigured(ANONYMOUS_USER_ERROR_MSG)
 
     if isinstance(entity, get_user_model()):
-        if entity.is_superuser or entity.is_staff:
-            return True
+        return entity.is_superuser or entity.is_staff
+    return False
+
 
-    customer, created = Customer.get_or_create(entity)
-    if created or not customer.has_active_subscription():
-        return False
-    return True
+def aware_datetime(value):
+    """
+    The braintree SDK parses timestamps as naive UTC datetimes, while Django
+    loads aware ones when USE_TZ is on. Make SDK timestamps aware, so that
+    they compare equal to (and save as) the stored values.
+
+    :return: ``value``, made aware if it is a naive datetime and USE_TZ is
+        on
+    """
+    if (isinstance(value, datetime.datetime) and settings.USE_TZ and
+            timezone.is_naive(value)):
+        return timezone.make_aware(value, timezone.utc)
+    return value
 
 
 def get_supported_currency_choices(api_key):
@@ -1,36 +1,39 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 import decimal
-import json
 
 from django.contrib.auth import logout as auth_logout
 from django.contrib import messages
 from django.core.urlresolvers import reverse_lazy, reverse
-from django.http import HttpResponse
+from django.http import HttpResponse, HttpResponseBadRequest
 from django.shortcuts import render, redirect
 from django.views.generic import DetailView
 from django.views.generic import FormView
 from django.views.generic import TemplateView
 from django.views.generic import View
-from django.utils.encoding import smart_str
 
 from braces.views import CsrfExemptMixin
 from braces.views import FormValidMessageMixin
 from braces.views import LoginRequiredMixin
 from braces.views import SelectRelatedMixin
 
+from .catalog import get_plan
+from .exceptions import InvalidWebhookError
 from .forms import PlanForm, CancelSubscriptionForm
 from .mixins import PaymentsContextMixin, SubscriptionMixin
+from .mixins import TransactionHistoryMixin
 # from .models import CurrentSubscription
 from .models import Customer
 # from .models import Event
 # from .models import EventProcessingException
-from .settings import PLAN_LIST
-from .settings import PAYMENT_PLANS
+from .notifications import (WebhookPayload, build_notification,
+                            read_webhook_stream, verify_signature)
 from .settings import subscriber_request_callback
 from .settings import PRORATION_POLICY_FOR_UPGRADES
 from .settings import CANCELLATION_AT_PERIOD_END
-from .sync import sync_entity
+from .settings import WEBHOOK_MAX_PAYLOAD_SIZE
+from .settings import WEBHOOK_QUEUE
+from .webhook_queue import enqueue, handle_notification
 
 
 # ============================================================================ #
@@ -103,19 +106,22 @@ class ChangeCardView(LoginRequiredMixin, PaymentsContextMixin, DetailView):
         return reverse("djbraintree:account")
 
 
-class HistoryView(LoginRequiredMixin, SelectRelatedMixin, DetailView):
+class HistoryView(LoginRequiredMixin, TransactionHistoryMixin, TemplateView):
     template_name = "djbraintree/history.html"
-    model = Customer
-    select_related = ["invoice"]
 
-    def get_object(self):
-        customer, created = Customer.get_or_create(
-            subscriber=subscriber_request_callback(self.request))
-        return customer
+    def get_context_data(self, **kwargs):
+        context = super(HistoryView, self).get_context_data(**kwargs)
+        context.update(self.get_history_context(self.get_history_customer()))
+        return context
 
 
-class SyncHistoryView(CsrfExemptMixin, LoginRequiredMixin, View):
-    """TODO: Needs to be refactored to leverage context data."""
+class SyncHistoryView(CsrfExemptMixin, LoginRequiredMixin,
+                      TransactionHistoryMixin, View):
+    """
+    Renders the history table. Served from the local Transaction table,
+    which webhooks and transaction syncs keep up to date: no gateway call
+    per render.
+    """
 
     template_name = "djbraintree/includes/_history_table.html"
 
@@ -123,7 +129,7 @@ class SyncHistoryView(CsrfExemptMixin, LoginRequiredMixin, View):
         return render(
             request,
             self.template_name,
-            {"customer": sync_entity(subscriber_request_callback(request))}
+            self.get_history_context(self.get_history_customer())
         )
 
 
@@ -139,11 +145,10 @@ class ConfirmFormView(LoginRequiredMixin, FormValidMessageMixin, SubscriptionMix
     form_valid_message = "You are now subscribed!"
 
     def get(self, request, *args, **kwargs):
-        plan_slug = self.kwargs['plan']
-        if plan_slug not in PAYMENT_PLANS:
+        plan = get_plan(self.kwargs['plan'])
+        if plan is None:
             return redirect("djbraintree:subscribe")
 
-        plan = PAYMENT_PLANS[plan_slug]
         customer, created = Customer.get_or_create(
             subscriber=subscriber_request_callback(self.request))
 
@@ -156,7 +161,7 @@ class ConfirmFormView(LoginRequiredMixin, FormValidMessageMixin, SubscriptionMix
 
     def get_context_data(self, *args, **kwargs):
         context = super(ConfirmFormView, self).get_context_data(**kwargs)
-        context['plan'] = PAYMENT_PLANS[self.kwargs['plan']]
+        context['plan'] = get_plan(self.kwargs['plan'])
         return context
 
     def post(self, request, *args, **kwargs):
@@ -264,16 +269,35 @@ class CancelSubscriptionView(LoginRequiredMixin, SubscriptionMixin, FormView):
 class WebHook(CsrfExemptMixin, View):
 
     def post(self, request, *args, **kwargs):
-        body = smart_str(request.body)
-        data = json.loads(body)
-        # if Event.stripe_objects.exists_by_json(data):
-        #     EventProcessingException.objects.create(
-        #         data=data,
-        #         message="Duplicate event record",
-        #         traceback=""
-        #     )
-        # else:
-        #     event = Event.create_from_stripe_object(data)
-        #     event.validate()
-        #     event.process()
+        # Turn oversized requests away before Django reads the body. Form
+        # encoding at most triples the size of the base64 payload.
+        try:
+            content_length = int(request.META.get("CONTENT_LENGTH") or 0)
+        except ValueError:
+            return HttpResponseBadRequest()
+        if content_length > 3 * WEBHOOK_MAX_PAYLOAD_SIZE:
+            return HttpResponse(status=413)
+
+        try:
+            content_type = request.META.get("CONTENT_TYPE", "")
+            if content_type.startswith("application/x-www-form-urlencoded"):
+                # Braintree's encoding: read the body in chunks rather than
+                # through request.POST, which loads it whole.
+                signature, payload = read_webhook_stream(
+                    request, content_length)
+            else:
+                signature = request.POST.get("bt_signature")
+                payload = WebhookPayload.from_bytes(
+                    request.POST.get("bt_payload") or b"")
+            try:
+                merchant = verify_signature(signature, payload)
+                notification = build_notification(merchant, payload)
+                if WEBHOOK_QUEUE:
+                    enqueue(merchant, notification, payload)
+                else:
+                    handle_notification(notification, merchant)
+            finally:
+                payload.close()
+        except InvalidWebhookError:
+            return HttpResponseBadRequest()
         return HttpResponse()
@@ -0,0 +1,403 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: djbraintree.webhook_queue
+   :synopsis: dj-braintree - Persisted webhook queue and batch processing
+
+With ``DJBRAINTREE_WEBHOOK_QUEUE = True``, ``WebHook`` only verifies a
+notification and stores it as a ``WebhookEvent``; the
+``djbraintree_process_webhooks`` command processes it later.
+
+Workers claim events in batches. Every event has a subject (the
+subscription, transaction, merchant account... it is about), and a batch
+never includes a subject that another worker is still processing, so the
+events of one subject are always applied in the order they arrived.
+Within a batch, events are grouped by subject and the groups are spread
+over a process pool. Any number of workers can run side by side: on
+PostgreSQL, claims use ``SELECT ... FOR UPDATE SKIP LOCKED`` so no event
+is ever claimed twice.
+
+Bursts of events about one subject arriving within
+``DJBRAINTREE_WEBHOOK_COALESCE_WINDOW`` seconds (say, a transaction
+settling, settled then disbursed) are coalesced into a single fetch and
+sync of the subject's latest state.
+"""
+
+from __future__ import unicode_literals
+
+from collections import OrderedDict
+from datetime import timedelta
+import logging
+import os
+import socket
+import traceback
+import uuid
+
+from django.db import connection, connections, transaction
+from django.utils import timezone
+
+from . import settings as djbraintree_settings
+from .exceptions import CircuitOpenError
+from .gateway import using_merchant
+from .models import (Customer, Dispute, MerchantAccount, PaymentMethod,
+                     Subscription, Transaction, WebhookEvent)
+from .notifications import WebhookPayload, build_notification
+from .resilience import transient_errors
+from .signals import webhook_processing_error, webhook_received
+
+logger = logging.getLogger(__name__)
+
+# Notification attribute holding the subject, and the subject's id attribute
+SUBJECT_ATTRIBUTES = (
+    ("subscription", "id"),
+    ("transaction", "id"),
+    ("merchant_account", "id"),
+    ("disbursement", "id"),
+    ("dispute", "id"),
+    ("partner_merchant", "partner_merchant_id"),
+    # Payment method webhooks (newer braintree releases)
+    ("revoked_payment_method_metadata", "token"),
+)
+
+# Arbitrary key of the advisory lock serializing claims on PostgreSQL
+CLAIM_LOCK_ID = 1684693620
+
+POSTGRESQL_CLAIM_SQL = """
+UPDATE {table} SET status = %s, claimed_by = %s, claimed_at = %s
+WHERE id IN (
+    SELECT e.id FROM {table} e
+    WHERE e.status = %s AND e.created <= %s AND NOT EXISTS (
+        SELECT 1 FROM {table} p
+        WHERE p.status = %s
+          AND p.subject_kind = e.subject_kind
+          AND p.subject_id = e.subject_id)
+    ORDER BY e.id
+    LIMIT %s
+    FOR UPDATE SKIP LOCKED)
+RETURNING id, subject_kind, subject_id
+"""
+
+
+def notification_subject(notification):
+    """
+    :return: (subject kind, subject id). Notifications without a subject,
+        such as checks, get a unique id of their own.
+    :rtype: tuple[str, str]
+    """
+    for kind, id_attribute in SUBJECT_ATTRIBUTES:
+        subject = getattr(notification, kind, None)
+        if subject is not None:
+            return kind, getattr(subject, id_attribute)
+    return "", uuid.uuid4().hex
+
+
+_subject_syncs = {}
+
+
+def syncs_subject(kind):
+    """
+    Decorator registering ``func(subject_id, notifications)`` as the way to
+    bring the local copy of a ``kind`` subject up to date, given a run of
+    notifications about it, oldest first.
+    """
+    def decorator(func):
+        _subject_syncs[kind] = func
+        return func
+    return decorator
+
+
+@syncs_subject("transaction")
+def sync_transaction(transaction_id, notifications):
+    # Transaction notifications only carry a summary: fetch the latest state
+    braintree_transaction = Transaction(braintree_id=transaction_id).api_find()
+    return Transaction.sync_from_braintree_object(braintree_transaction)
+
+
+@syncs_subject("subscription")
+def sync_subscription(subscription_id, notifications):
+    # Subscription notifications carry the full state, no fetch needed
+    for notification in notifications:
+        Subscription.apply_notification(notification.subscription)
+
+
+@syncs_subject("merchant_account")
+def sync_merchant_account(merchant_account_id, notifications):
+    # Sub-merchant notifications carry the full merchant account
+    MerchantAccount.sync_from_braintree_object(
+        notifications[-1].merchant_account)
+
+
+@syncs_subject("dispute")
+def sync_dispute(dispute_id, notifications):
+    # Dispute notifications carry the full dispute
+    Dispute.sync_from_braintree_object(notifications[-1].dispute)
+
+
+@syncs_subject("revoked_payment_method_metadata")
+def sync_payment_method(token, notifications):
+    # Resync the customer's whole vault: that also moves the default
+    # payment method token if the revoked method was the default.
+    metadata = notifications[-1].revoked_payment_method_metadata
+    customer = Customer.objects.filter(
+        braintree_id=metadata.customer_id).first()
+    if customer is not None:
+        customer.sync()
+    else:
+        PaymentMethod.objects.filter(braintree_id=token).delete()
+
+
+def sync_subject(subject_kind, subject_id, notifications):
+    """Bring a subject up to date, see ``syncs_subject``."""
+    sync = _subject_syncs.get(subject_kind)
+    if sync is not None:
+        sync(subject_id, notifications)
+
+
+def send_received(notifications):
+    for notification in notifications:
+        webhook_received.send(sender=WebhookEvent, notification=notification)
+
+
+def apply_notifications(subject_kind, subject_id, notifications,
+                        merchant=None):
+    """
+    Apply verified notifications about one subject: sync the subject once
+    (see ``syncs_subject``), then send ``webhook_received`` for each
+    notification.
+    """
+    with using_merchant(merchant):
+        sync_subject(subject_kind, subject_id, notifications)
+        send_received(notifications)
+
+
+def gateway_errors():
+    """:return: The exception types of failed or refused gateway calls"""
+    from braintree.exceptions.braintree_error import BraintreeError
+
+    return (BraintreeError, CircuitOpenError) + transient_errors()
+
+
+def handle_notification(notification, merchant=None):
+    """
+    Apply a single verified notification, within the webhook request.
+
+    Some subjects are fetched from the gateway to be synced (see
+    ``sync_transaction``). A gateway error there is logged rather than
+    turned into a 500: the delivery itself is fine, and Braintree would
+    only retry it for as long as the gateway is down. Enable
+    ``DJBRAINTREE_WEBHOOK_QUEUE`` to have failed syncs retried.
+    """
+    subject_kind, subject_id = notification_subject(notification)
+    with using_merchant(merchant):
+        try:
+            sync_subject(subject_kind, subject_id, [notification])
+        except gateway_errors():
+            logger.exception("Failed to sync %s %s from a webhook",
+                             subject_kind, subject_id)
+        send_received([notification])
+
+
+def enqueue(merchant, notification, payload):
+    """
+    :param merchant: The merchant returned by ``verify_signature``
+    :param notification: The parsed notification
+    :param payload: The verified ``bt_payload``
+    :type payload: WebhookPayload
+    :rtype: WebhookEvent
+    """
+    subject_kind, subject_id = notification_subject(notification)
+    return WebhookEvent.objects.create(
+        merchant=merchant or "",
+        kind=notification.kind,
+        subject_kind=subject_kind,
+        subject_id=subject_id,
+        timestamp=notification.timestamp,
+        payload=payload.getvalue().decode("ascii"),
+    )
+
+
+def worker_name():
+    return "{host}:{pid}".format(host=socket.gethostname(), pid=os.getpid())
+
+
+def _claim_postgresql(batch_size, worker, now, settled_before):
+    table = connection.ops.quote_name(WebhookEvent._meta.db_table)
+    with connection.cursor() as cursor:
+        # SKIP LOCKED keeps concurrent claims from blocking on each other's
+        # rows; the advisory lock makes the "subject not being processed"
+        # check race free, as a claim can't see another's uncommitted one.
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", [CLAIM_LOCK_ID])
+        cursor.execute(POSTGRESQL_CLAIM_SQL.format(table=table), [
+            WebhookEvent.STATUS_PROCESSING, worker, now,
+            WebhookEvent.STATUS_PENDING, settled_before,
+            WebhookEvent.STATUS_PROCESSING, batch_size])
+        return cursor.fetchall()
+
+
+def _claim_generic(batch_size, worker, now, settled_before):
+    # Without SKIP LOCKED, this is only safe for a single worker.
+    busy = set(WebhookEvent.objects.filter(
+        status=WebhookEvent.STATUS_PROCESSING).values_list(
+        "subject_kind", "subject_id"))
+    candidates = WebhookEvent.objects.select_for_update().filter(
+        status=WebhookEvent.STATUS_PENDING,
+        created__lte=settled_before).order_by("id").values_list(
+        "id", "subject_kind", "subject_id")
+    claimed = []
+    for row in candidates.iterator():
+        if (row[1], row[2]) not in busy:
+            claimed.append(row)
+            if len(claimed) >= batch_size:
+                break
+    WebhookEvent.objects.filter(id__in=[row[0] for row in claimed]).update(
+        status=WebhookEvent.STATUS_PROCESSING, claimed_by=worker,
+        claimed_at=now)
+    return claimed
+
+
+def claim_batch(batch_size=None, worker=None):
+    """
+    Claim up to ``batch_size`` pending events, skipping subjects that are
+    being processed elsewhere. Events younger than the coalescing window
+    are left for later, so that a burst is claimed (and coalesced) as one.
+
+    :return: The claimed events' subjects mapped to their ids, oldest first
+    :rtype: OrderedDict[tuple[str, str], list[int]]
+    """
+    batch_size = batch_size or djbraintree_settings.WEBHOOK_BATCH_SIZE
+    worker = worker or worker_name()
+    now = timezone.now()
+    settled_before = now - timedelta(
+        seconds=djbraintree_settings.WEBHOOK_COALESCE_WINDOW)
+    with transaction.atomic():
+        if connection.vendor == "postgresql":
+            rows = _claim_postgresql(batch_size, worker, now, settled_before)
+        else:
+            rows = _claim_generic(batch_size, worker, now, settled_before)
+
+    groups = OrderedDict()
+    for event_id, subject_kind, subject_id in sorted(rows):
+        groups.setdefault((subject_kind, subject_id), []).append(event_id)
+    return groups
+
+
+def release_stale_claims(timeout=None):
+    """
+    Put events claimed by a worker that died more than ``timeout`` seconds
+    ago back in the queue.
+
+    :return: The number of released events
+    """
+    timeout = timeout or djbraintree_settings.WEBHOOK_CLAIM_TIMEOUT
+    cutoff = timezone.now() - timedelta(seconds=timeout)
+    return WebhookEvent.objects.filter(
+        status=WebhookEvent.STATUS_PROCESSING,
+        claimed_at__lt=cutoff,
+    ).update(status=WebhookEvent.STATUS_PENDING, claimed_by="",
+             claimed_at=None)
+
+
+def coalesce(events, window=None):
+    """
+    Split the events of one subject, oldest first, into runs: an event
+    joins the current run if it arrived no more than ``window`` seconds
+    after the run's first event.
+
+    :rtype: list[list[WebhookEvent]]
+    """
+    if window is None:
+        window = djbraintree_settings.WEBHOOK_COALESCE_WINDOW
+    runs = []
+    for event in events:
+        if runs:
+            first = runs[-1][0]
+            if (event.merchant == first.merchant and
+                    (event.created - first.created).total_seconds() <= window):
+                runs[-1].append(event)
+                continue
+        runs.append([event])
+    return runs
+
+
+def process_run(events):
+    """Apply a run of events about one subject with a single sync."""
+    first = events[0]
+    merchant = first.merchant or None
+    notifications = [
+        build_notification(
+            merchant, WebhookPayload.from_bytes(event.payload.encode("ascii")))
+        for event in events]
+    apply_notifications(first.subject_kind, first.subject_id, notifications,
+                        merchant)
+
+
+def process_group(event_ids):
+    """
+    Process the events of one subject, in order, coalescing bursts (see
+    ``coalesce``). After a failure, the remaining events are put back in
+    the queue untouched, so they still run after the failed ones are
+    retried.
+
+    :return: The number of processed events
+    :rtype: int
+    """
+    events = list(WebhookEvent.objects.filter(pk__in=event_ids).order_by("id"))
+    runs = coalesce(events)
+    processed = 0
+    for position, run in enumerate(runs):
+        for event in run:
+            event.attempts += 1
+        try:
+            with transaction.atomic():
+                process_run(run)
+                now = timezone.now()
+                for event in run:
+                    event.status = WebhookEvent.STATUS_PROCESSED
+                    event.processed_at = now
+                    event.error = ""
+                    event.save()
+        except Exception as e:
+            logger.exception("Failed to process webhook events %s",
+                             [event.pk for event in run])
+            error = traceback.format_exc()
+            for event in run:
+                if event.attempts >= djbraintree_settings.WEBHOOK_MAX_ATTEMPTS:
+                    event.status = WebhookEvent.STATUS_FAILED
+                else:
+                    event.status = WebhookEvent.STATUS_PENDING
+                event.claimed_by = ""
+                event.claimed_at = None
+                event.error = error
+                event.save()
+            WebhookEvent.objects.filter(
+                id__in=[event.pk for later in runs[position + 1:]
+                        for event in later]).update(
+                status=WebhookEvent.STATUS_PENDING, claimed_by="",
+                claimed_at=None)
+            webhook_processing_error.send(
+                sender=WebhookEvent, data=run[-1].payload, exception=e)
+            break
+        processed += len(run)
+    return processed
+
+
+def close_connections():
+    """
+    Pool initializer: forked workers must open their own database
+    connections instead of sharing the parent's.
+    """
+    for conn in connections.all():
+        conn.close()
+
+
+def process_batch(groups, pool=None):
+    """
+    :param groups: As returned by ``claim_batch``
+    :param pool: A ``multiprocessing.Pool`` to run the groups in, or None
+        to run them in this process
+    :return: The number of processed events
+    :rtype: int
+    """
+    groups = list(groups.values())
+    if pool is None:
+        return sum(process_group(event_ids) for event_ids in groups)
+    return sum(pool.map(process_group, groups))
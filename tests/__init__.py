@@ -1,6 +1,8 @@
 import datetime
 from braintree import BraintreeGateway as GWay
 from braintree import SuccessfulResult
+from braintree.customer import Customer as Cus
+from braintree.subscription import Subscription as Sub
 from braintree.transaction import Transaction as Tx
 
 
@@ -144,3 +146,84 @@ def get_fake_success_transaction(**kwargs):
 
     return SuccessfulResult(
         {"transaction": Tx(GWay(), FAKE_TRANSACTION)})
+
+
+def get_fake_subscription(**kwargs):
+    FAKE_SUBSCRIPTION = {
+        u'id': u'sub_xxxxxx',
+        u'balance': u'0.00',
+        u'billing_day_of_month': 11,
+        u'billing_period_start_date': datetime.date(2016, 5, 11),
+        u'billing_period_end_date': datetime.date(2016, 6, 10),
+        u'created_at': datetime.datetime(2016, 5, 11, 0, 0, 35),
+        u'current_billing_cycle': 1,
+        u'days_past_due': None,
+        u'failure_count': 0,
+        u'first_billing_date': datetime.date(2016, 5, 11),
+        u'merchant_account_id': u'zacharylayng',
+        u'never_expires': True,
+        u'next_billing_date': datetime.date(2016, 6, 11),
+        u'number_of_billing_cycles': None,
+        u'paid_through_date': datetime.date(2016, 6, 10),
+        u'payment_method_token': u'token',
+        u'plan_id': u'test0',
+        u'price': u'10.00',
+        u'status': u'Active',
+        u'trial_duration': None,
+        u'trial_duration_unit': None,
+        u'trial_period': False,
+        u'updated_at': datetime.datetime(2016, 5, 11, 0, 0, 35),
+        u'transactions': [],
+    }
+    FAKE_SUBSCRIPTION.update(kwargs)
+
+    return Sub(GWay(), FAKE_SUBSCRIPTION)
+
+
+def get_fake_credit_card(**kwargs):
+    FAKE_CREDIT_CARD = {
+        u'bin': u'411111',
+        u'card_type': u'Visa',
+        u'cardholder_name': None,
+        u'commercial': u'Unknown',
+        u'country_of_issuance': u'Unknown',
+        u'created_at': datetime.datetime(2016, 5, 11, 0, 0, 30),
+        u'customer_id': u'cus_xxxxxxxxxxxxxxx',
+        u'customer_location': u'US',
+        u'debit': u'Unknown',
+        u'default': True,
+        u'durbin_regulated': u'Unknown',
+        u'expiration_month': u'06',
+        u'expiration_year': u'2016',
+        u'expired': False,
+        u'healthcare': u'Unknown',
+        u'image_url': u'https://assets.braintreegateway.com/payment_method_logo/visa.png',
+        u'issuing_bank': u'Unknown',
+        u'last_4': u'1111',
+        u'payroll': u'Unknown',
+        u'prepaid': u'Unknown',
+        u'token': u'token',
+        u'unique_number_identifier': u'abc123',
+        u'updated_at': datetime.datetime(2016, 5, 11, 0, 0, 30),
+    }
+    FAKE_CREDIT_CARD.update(kwargs)
+    return FAKE_CREDIT_CARD
+
+
+def get_fake_customer(**kwargs):
+    FAKE_CUSTOMER = {
+        u'id': u'cus_xxxxxxxxxxxxxxx',
+        u'company': None,
+        u'created_at': datetime.datetime(2016, 5, 11, 0, 0, 30),
+        u'email': u'patrick@gmail.com',
+        u'fax': None,
+        u'first_name': None,
+        u'last_name': None,
+        u'phone': None,
+        u'updated_at': datetime.datetime(2016, 5, 11, 0, 0, 30),
+        u'website': None,
+        u'credit_cards': [get_fake_credit_card()],
+    }
+    FAKE_CUSTOMER.update(kwargs)
+
+    return Cus(GWay(), FAKE_CUSTOMER)
@@ -380,3 +380,190 @@
 #         #     self.assertLessEqual(call_kwargs["trial_end"],
 #         #                          timezone.now() + datetime.timedelta(
 #         #                              days=trial_days))
+
+
+import decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from braintree import ErrorResult
+from mock import patch, MagicMock
+
+from djbraintree.charges import ChargeTemplate
+from djbraintree.models import ChargeAttempt, Customer
+from tests import get_fake_success_transaction
+
+
+class TestIdempotentCharge(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username="patrick", email="patrick@gmail.com")
+        self.customer = Customer.objects.create(
+            entity=self.user, braintree_id="cus_xxxxxxxxxxxxxxx")
+
+    def charge(self):
+        return self.customer.charge(decimal.Decimal("10.00"),
+                                    payment_method_token="token",
+                                    idempotency_key="order-1")
+
+    @patch("braintree.Transaction.sale")
+    def test_key_is_sent_as_order_id(self, transaction_sale_mock):
+        transaction_sale_mock.return_value = get_fake_success_transaction()
+        self.charge()
+        self.assertEqual("order-1",
+                         transaction_sale_mock.call_args[0][0]["order_id"])
+        attempt = ChargeAttempt.objects.get(idempotency_key="order-1")
+        self.assertEqual(ChargeAttempt.STATUS_SUCCEEDED, attempt.status)
+        self.assertEqual("d5y99n", attempt.braintree_transaction_id)
+
+    @patch("braintree.Transaction.find")
+    @patch("braintree.Transaction.sale")
+    def test_retry_after_success_does_not_charge(self, transaction_sale_mock,
+                                                 transaction_find_mock):
+        transaction_sale_mock.return_value = get_fake_success_transaction()
+        transaction_find_mock.return_value = \
+            get_fake_success_transaction().transaction
+        self.charge()
+        result = self.charge()
+        self.assertTrue(result.is_success)
+        self.assertEqual("d5y99n", result.transaction.id)
+        self.assertEqual(1, transaction_sale_mock.call_count)
+
+    @patch("braintree.Transaction.search")
+    @patch("braintree.Transaction.sale")
+    def test_retry_after_timeout_finds_prior_sale(self, transaction_sale_mock,
+                                                  transaction_search_mock):
+        transaction_sale_mock.side_effect = Exception("timeout")
+        with self.assertRaises(Exception):
+            self.charge()
+        self.assertEqual(ChargeAttempt.STATUS_PENDING, ChargeAttempt.objects.get(
+            idempotency_key="order-1").status)
+
+        transaction_search_mock.return_value = MagicMock(
+            items=iter([get_fake_success_transaction().transaction]))
+        result = self.charge()
+        self.assertEqual("d5y99n", result.transaction.id)
+        self.assertEqual(1, transaction_sale_mock.call_count)
+        self.assertEqual(1, transaction_search_mock.call_count)
+
+    @patch("braintree.Transaction.search")
+    @patch("braintree.Transaction.sale")
+    def test_retry_after_timeout_charges_if_nothing_found(
+            self, transaction_sale_mock, transaction_search_mock):
+        transaction_sale_mock.side_effect = [
+            Exception("timeout"), get_fake_success_transaction()]
+        with self.assertRaises(Exception):
+            self.charge()
+        transaction_search_mock.return_value = MagicMock(items=iter([]))
+        self.assertTrue(self.charge().is_success)
+        self.assertEqual(2, transaction_sale_mock.call_count)
+
+    @patch("braintree.Transaction.search")
+    @patch("braintree.Transaction.sale")
+    def test_retry_after_timeout_ignores_declined_sale(
+            self, transaction_sale_mock, transaction_search_mock):
+        transaction_sale_mock.side_effect = [
+            Exception("timeout"), get_fake_success_transaction(id="retried")]
+        with self.assertRaises(Exception):
+            self.charge()
+        transaction_search_mock.return_value = MagicMock(items=iter([
+            get_fake_success_transaction(
+                status="processor_declined").transaction]))
+
+        result = self.charge()
+        self.assertEqual("retried", result.transaction.id)
+        self.assertEqual(2, transaction_sale_mock.call_count)
+        self.assertEqual("retried", ChargeAttempt.objects.get(
+            idempotency_key="order-1").braintree_transaction_id)
+
+    @patch("braintree.Transaction.find")
+    @patch("braintree.Transaction.sale")
+    def test_creator_returns_outcome_recorded_by_concurrent_retry(
+            self, transaction_sale_mock, transaction_find_mock):
+        # A concurrent retry took the row lock first, charged and recorded
+        # its result before the creating call got the lock.
+        attempt = ChargeAttempt.objects.create(
+            idempotency_key="order-1", customer=self.customer,
+            order_id="order-1", amount=decimal.Decimal("10.00"),
+            status=ChargeAttempt.STATUS_SUCCEEDED,
+            braintree_transaction_id="d5y99n")
+        transaction_find_mock.return_value = \
+            get_fake_success_transaction().transaction
+        with patch.object(ChargeAttempt.objects, "get_or_create",
+                          return_value=(attempt, True)):
+            result = self.charge()
+        self.assertEqual("d5y99n", result.transaction.id)
+        self.assertFalse(transaction_sale_mock.called)
+
+    @patch("braintree.Transaction.sale")
+    def test_key_reused_for_another_charge(self, transaction_sale_mock):
+        transaction_sale_mock.return_value = get_fake_success_transaction()
+        self.charge()
+        with self.assertRaises(ValueError):
+            self.customer.charge(decimal.Decimal("20.00"),
+                                 payment_method_token="token",
+                                 idempotency_key="order-1")
+        self.assertEqual(1, transaction_sale_mock.call_count)
+
+    def test_key_too_long(self):
+        with self.assertRaises(ValueError):
+            self.customer.charge(decimal.Decimal("10.00"),
+                                 payment_method_token="token",
+                                 idempotency_key="k" * 201)
+        self.assertFalse(ChargeAttempt.objects.exists())
+
+    @patch("braintree.Transaction.sale")
+    def test_retry_after_decline_charges_again(self, transaction_sale_mock):
+        transaction_sale_mock.side_effect = [
+            MagicMock(spec=ErrorResult, is_success=False),
+            get_fake_success_transaction()]
+        self.assertFalse(self.charge().is_success)
+        self.assertTrue(self.charge().is_success)
+        self.assertEqual(2, transaction_sale_mock.call_count)
+
+
+class TestChargeTemplate(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username="patrick", email="patrick@gmail.com")
+        self.customer = Customer.objects.create(
+            entity=self.user, braintree_id="cus_xxxxxxxxxxxxxxx")
+        self.options = {"submit_for_settlement": True}
+        self.template = ChargeTemplate(
+            merchant_account_id="acme_usd",
+            options=self.options,
+            descriptor={"name": "ACME*MONTHLY"},
+        )
+
+    def test_invalid_templates(self):
+        with self.assertRaises(ValueError):
+            ChargeTemplate(options="submit")
+        with self.assertRaises(ValueError):
+            ChargeTemplate(not_a_sale_field=True)
+        with self.assertRaises(ValueError):
+            ChargeTemplate(amount=decimal.Decimal("10.00"))
+
+    def test_template_is_frozen(self):
+        self.options["submit_for_settlement"] = False
+        self.assertTrue(self.template.options["submit_for_settlement"])
+        with self.assertRaises(AttributeError):
+            self.template.merchant_account_id = "other"
+
+    @patch("braintree.Transaction.sale")
+    def test_charge_with(self, transaction_sale_mock):
+        transaction_sale_mock.return_value = get_fake_success_transaction()
+        self.customer.charge_with(self.template, decimal.Decimal("10.00"),
+                                  payment_method_token="token")
+        data = transaction_sale_mock.call_args[0][0]
+        self.assertEqual(decimal.Decimal("10.00"), data["amount"])
+        self.assertEqual("cus_xxxxxxxxxxxxxxx", data["customer_id"])
+        self.assertEqual("token", data["payment_method_token"])
+        self.assertEqual("acme_usd", data["merchant_account_id"])
+        self.assertEqual({"submit_for_settlement": True}, data["options"])
+
+    def test_charge_with_requires_payment_method(self):
+        with self.assertRaises(ValueError):
+            self.customer.charge_with(self.template, decimal.Decimal("10.00"))
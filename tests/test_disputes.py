@@ -0,0 +1,120 @@
+"""
+.. module:: dj-braintree.tests.test_disputes
+   :synopsis: dj-braintree Dispute model tests.
+"""
+
+from __future__ import unicode_literals
+import datetime
+from decimal import Decimal
+
+from braintree.dispute import Dispute as BraintreeDisputeResource
+from django.test import TestCase
+
+from mock import Mock, patch
+
+from djbraintree.models import Dispute, Transaction
+from djbraintree.webhook_queue import sync_dispute
+
+
+def get_fake_dispute(**kwargs):
+    attributes = {
+        "id": "dispute_id",
+        "amount": "250.00",
+        "currency_iso_code": "USD",
+        "received_date": datetime.date(2014, 3, 1),
+        "reply_by_date": datetime.date(2014, 3, 21),
+        "date_opened": datetime.date(2014, 3, 1),
+        "kind": "chargeback",
+        "status": "open",
+        "reason": "fraud",
+        "transaction": {"id": "tx_id", "amount": "250.00"},
+    }
+    attributes.update(kwargs)
+    return BraintreeDisputeResource(attributes)
+
+
+class DisputeTestCase(TestCase):
+
+    def setUp(self):
+        self.transaction = Transaction.objects.create(braintree_id="tx_id")
+
+
+class TestDisputeSync(DisputeTestCase):
+
+    def test_sync_from_braintree_objects(self):
+        self.assertEqual(1, Dispute.sync_from_braintree_objects(
+            [get_fake_dispute()]))
+        dispute = Dispute.objects.get()
+        self.assertEqual("dispute_id", dispute.braintree_id)
+        self.assertEqual(self.transaction, dispute.transaction)
+        self.assertEqual("tx_id", dispute.transaction_braintree_id)
+        self.assertEqual(Decimal("250.00"), dispute.amount)
+        self.assertEqual(datetime.date(2014, 3, 21), dispute.reply_by_date)
+        self.assertEqual("chargeback", dispute.kind)
+
+    def test_resync_updates(self):
+        Dispute.sync_from_braintree_objects([get_fake_dispute()])
+        Dispute.sync_from_braintree_objects([get_fake_dispute(status="won")])
+        self.assertEqual("won", Dispute.objects.get().status)
+
+    def test_unknown_transactions_are_kept_unlinked(self):
+        Dispute.sync_from_braintree_objects([
+            (get_fake_dispute(transaction={"id": "tx_unknown",
+                                            "amount": "250.00"}), None)])
+        dispute = Dispute.objects.get()
+        self.assertIsNone(dispute.transaction)
+        self.assertEqual("tx_unknown", dispute.transaction_braintree_id)
+
+    def test_pairs_name_the_transaction(self):
+        braintree_dispute = get_fake_dispute()
+        del braintree_dispute.transaction_details
+        Dispute.sync_from_braintree_objects([(braintree_dispute, "tx_id")])
+        self.assertEqual(self.transaction, Dispute.objects.get().transaction)
+
+    @patch("djbraintree.models.Dispute.api")
+    def test_search_with_dispute_search(self, api_mock):
+        api_mock.return_value.search.return_value = Mock(
+            items=iter([get_fake_dispute()]))
+        self.assertEqual(1, Dispute.sync_all())
+        api_mock.return_value.search.assert_called_once_with([])
+        self.assertEqual(self.transaction, Dispute.objects.get().transaction)
+
+    @patch("braintree.Transaction.search")
+    @patch("djbraintree.models.Dispute.api", return_value=Mock(spec=[]))
+    def test_search_through_transactions(self, api_mock, search_mock):
+        search_mock.return_value = Mock(items=iter([
+            Mock(id="tx_id", disputes=[get_fake_dispute(),
+                                       get_fake_dispute(id="other")]),
+            Mock(id="tx_other", disputes=[]),
+        ]))
+        self.assertEqual(2, Dispute.sync_all(chunk_size=1))
+        self.assertEqual(2, self.transaction.disputes.count())
+
+    def test_webhook(self):
+        sync_dispute("dispute_id", [Mock(dispute=get_fake_dispute()),
+                                    Mock(dispute=get_fake_dispute(status="lost"))])
+        self.assertEqual("lost", Dispute.objects.get().status)
+
+
+class TestDisputeQuerySet(DisputeTestCase):
+
+    def setUp(self):
+        super(TestDisputeQuerySet, self).setUp()
+        Dispute.sync_from_braintree_objects([
+            get_fake_dispute(),
+            get_fake_dispute(id="later", reply_by_date=datetime.date(2014, 5, 1)),
+            get_fake_dispute(id="won", status="won"),
+        ])
+
+    def test_open(self):
+        self.assertEqual(["dispute_id", "later"], list(
+            Dispute.objects.open().values_list("braintree_id", flat=True)))
+
+    def test_reply_due_within(self):
+        due = Dispute.objects.reply_due_within(
+            7, today=datetime.date(2014, 3, 18))
+        self.assertEqual(["dispute_id"],
+                         [dispute.braintree_id for dispute in due])
+
+    def test_open_disputes_of_a_transaction(self):
+        self.assertEqual(2, self.transaction.disputes.open().count())
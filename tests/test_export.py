@@ -0,0 +1,92 @@
+"""
+.. module:: dj-braintree.tests.test_export
+   :synopsis: dj-braintree Transaction Export Tests.
+
+"""
+import csv
+import datetime
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+from unittest import skipIf
+
+from django.db import models
+from django.test.testcases import TestCase
+from django.utils import timezone
+from six import StringIO
+
+from djbraintree.export import _arrow_type, export_transactions, iter_chunks
+from djbraintree.models import Transaction
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+class ExportTransactionsTest(TestCase):
+
+    def setUp(self):
+        self.base = datetime.datetime(2016, 5, 1, tzinfo=timezone.utc)
+        for i in range(5):
+            Transaction.objects.create(
+                braintree_id="tx_{0}".format(i),
+                amount=Decimal("10.00") + i,
+                created_at=self.base + datetime.timedelta(days=i),
+            )
+
+    def test_chunks_are_bounded(self):
+        chunks = list(iter_chunks(Transaction.objects.all(),
+                                  ["braintree_id"], chunk_size=2))
+        self.assertEqual([2, 2, 1], [len(chunk) for chunk in chunks])
+        self.assertEqual(("tx_0",), chunks[0][0])
+
+    def test_csv_export(self):
+        stream = StringIO()
+        count = export_transactions(stream, fields=["braintree_id", "amount"],
+                                    chunk_size=2)
+        self.assertEqual(5, count)
+        rows = list(csv.reader(StringIO(stream.getvalue())))
+        self.assertEqual(["braintree_id", "amount"], rows[0])
+        self.assertEqual(["tx_4", "14.00"], rows[-1])
+
+    def test_time_range(self):
+        stream = StringIO()
+        count = export_transactions(
+            stream, fields=["braintree_id"],
+            start=self.base + datetime.timedelta(days=1),
+            end=self.base + datetime.timedelta(days=3))
+        self.assertEqual(2, count)
+        self.assertIn("tx_1", stream.getvalue())
+        self.assertNotIn("tx_3", stream.getvalue())
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            export_transactions(StringIO(), format="xls")
+
+    @skipIf(pyarrow is None, "Parquet exports require pyarrow")
+    def test_parquet_export(self):
+        import pyarrow.parquet as pq
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, "transactions.parquet")
+        count = export_transactions(
+            path, format="parquet",
+            fields=["braintree_id", "amount", "created_at"], chunk_size=2)
+        self.assertEqual(5, count)
+        table = pq.read_table(path)
+        self.assertEqual(["tx_{0}".format(i) for i in range(5)],
+                         table.column("braintree_id").to_pylist())
+        self.assertEqual(Decimal("14.00"),
+                         table.column("amount").to_pylist()[-1])
+        self.assertEqual(self.base,
+                         table.column("created_at").to_pylist()[0])
+
+    @skipIf(pyarrow is None, "Parquet exports require pyarrow")
+    def test_arrow_types(self):
+        self.assertEqual(pyarrow.date32(),
+                         _arrow_type(pyarrow, models.DateField()))
+        self.assertEqual(pyarrow.timestamp("us", tz="UTC"),
+                         _arrow_type(pyarrow, models.DateTimeField()))
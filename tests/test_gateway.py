@@ -0,0 +1,143 @@
+"""
+.. module:: dj-braintree.tests.test_gateway
+   :synopsis: dj-braintree Lazy Gateway Configuration Tests.
+
+"""
+import os
+import subprocess
+import sys
+
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from mock import patch
+
+from djbraintree import gateway
+from djbraintree.models import Customer, Transaction
+
+MERCHANTS = {
+    "acme": {"merchant_id": "acme_id", "public_key": "acme_public",
+             "private_key": "acme_private"},
+    "globex": {"merchant_id": "globex_id", "public_key": "globex_public",
+               "private_key": "globex_private", "environment": "sandbox"},
+}
+
+IMPORT_SCRIPT = """
+import sys
+import time
+
+import django
+from django.conf import settings
+
+settings.configure(
+    INSTALLED_APPS=["django.contrib.auth", "django.contrib.contenttypes",
+                    "djbraintree"],
+    BRAINTREE_PUBLIC_KEY="", BRAINTREE_PRIVATE_KEY="",
+    BRAINTREE_MERCHANT_ID="",
+)
+
+start = time.time()
+if "--with-sdk" in sys.argv:
+    import braintree
+django.setup()
+
+import djbraintree.models
+import djbraintree.sync
+import djbraintree.utils
+
+sys.stdout.write("{0} {1}".format(int("braintree" in sys.modules),
+                                  time.time() - start))
+"""
+
+
+class LazyConfigurationTest(TestCase):
+
+    def setUp(self):
+        gateway.reset_configuration()
+
+    def tearDown(self):
+        gateway.reset_configuration()
+
+    def run_import_script(self, *script_args):
+        """
+        Set up django and import djbraintree in a fresh interpreter.
+
+        :return: Whether the braintree SDK ended up loaded, and the seconds
+            the imports took
+        :rtype: tuple[bool, float]
+        """
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        process = subprocess.Popen(
+            [sys.executable, "-c", IMPORT_SCRIPT] + list(script_args),
+            cwd=root, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            universal_newlines=True)
+        out, err = process.communicate()
+        self.assertEqual(0, process.returncode, err)
+        sdk_loaded, seconds = out.split()
+        return bool(int(sdk_loaded)), float(seconds)
+
+    def test_import_does_not_load_sdk(self):
+        sdk_loaded, _ = self.run_import_script()
+        self.assertFalse(sdk_loaded)
+
+    def test_import_time(self):
+        """
+        Import-time benchmark: importing djbraintree costs less than doing
+        so with the braintree SDK loaded, which it no longer needs. Best of
+        three runs each, to keep noise out.
+        """
+        lazy = min(self.run_import_script()[1] for _ in range(3))
+        eager = min(self.run_import_script("--with-sdk")[1]
+                    for _ in range(3))
+        self.assertLess(
+            lazy, eager,
+            "djbraintree import: {0:.3f}s, with the SDK: {1:.3f}s".format(
+                lazy, eager))
+
+    @patch("braintree.Configuration.configure")
+    def test_configured_once(self, configure_mock):
+        gateway.braintree_sdk()
+        gateway.braintree_sdk()
+        self.assertEqual(1, configure_mock.call_count)
+
+    @patch("braintree.Configuration.configure")
+    def test_reconfigured_after_settings_change(self, configure_mock):
+        gateway.braintree_sdk()
+        with override_settings(BRAINTREE_MERCHANT_ID="other_merchant"):
+            gateway.braintree_sdk()
+            self.assertEqual("other_merchant",
+                             configure_mock.call_args[1]["merchant_id"])
+        self.assertEqual(2, configure_mock.call_count)
+
+
+@override_settings(DJBRAINTREE_MERCHANTS=MERCHANTS)
+class MerchantGatewayRegistryTest(TestCase):
+
+    def test_one_gateway_per_merchant(self):
+        acme = gateway.get_gateway("acme")
+        self.assertIs(acme, gateway.get_gateway("acme"))
+        self.assertIsNot(acme, gateway.get_gateway("globex"))
+        self.assertEqual("acme_id", acme.config.merchant_id)
+        self.assertEqual("globex_id",
+                         gateway.get_gateway("globex").config.merchant_id)
+
+    def test_each_gateway_has_its_own_http_pool(self):
+        acme_http = gateway.get_gateway("acme").config.http_strategy()
+        globex_http = gateway.get_gateway("globex").config.http_strategy()
+        self.assertIsNot(acme_http.session, globex_http.session)
+
+    def test_unknown_merchant(self):
+        with self.assertRaises(ImproperlyConfigured):
+            gateway.get_gateway("initech")
+
+    def test_api_routes_through_merchant_gateway(self):
+        self.assertIs(gateway.get_gateway("acme").customer,
+                      Customer.api(merchant="acme").target)
+        with gateway.using_merchant("globex") as globex:
+            self.assertIs(globex.transaction, Transaction.api().target)
+        self.assertIsNone(gateway.current_merchant())
+
+    def test_api_defaults_to_global_configuration(self):
+        import braintree
+        self.assertIs(braintree.Transaction, Transaction.api().target)
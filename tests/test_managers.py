@@ -257,3 +257,45 @@
 #         self.assertEqual(decimal.Decimal("30.50"), paid_totals["total_amount"], "Total amount is not correct.")
 #         self.assertEqual(decimal.Decimal("4.90"), paid_totals["total_fee"], "Total fees is not correct.")
 #         self.assertEqual(decimal.Decimal("5.35"), paid_totals["total_refunded"], "Total amount refunded is not correct.")
+
+
+from django.test.testcases import TestCase
+
+from djbraintree.models import MerchantAccount, Transaction
+from tests import get_fake_success_transaction
+
+
+class BulkLookupTest(TestCase):
+
+    def setUp(self):
+        MerchantAccount.clear_cache()
+        for i in range(5):
+            Transaction.objects.create(braintree_id="tx_{0}".format(i))
+
+    def test_get_many_by_resources(self):
+        resources = [get_fake_success_transaction(id="tx_{0}".format(i)).transaction
+                     for i in (0, 3, 9)]
+        with self.assertNumQueries(2):
+            found = Transaction.braintree_objects.get_many_by_resources(
+                resources, chunk_size=2)
+        self.assertEqual({"tx_0", "tx_3"}, set(found))
+        self.assertEqual("tx_3", found["tx_3"].braintree_id)
+
+    def test_existing_ids_accepts_plain_ids(self):
+        with self.assertNumQueries(1):
+            existing = Transaction.braintree_objects.existing_ids(
+                ["tx_1", "tx_2", "tx_2", "missing", None])
+        self.assertEqual({"tx_1", "tx_2"}, existing)
+
+    def test_empty_input_makes_no_queries(self):
+        with self.assertNumQueries(0):
+            self.assertEqual({}, Transaction.braintree_objects.get_many_by_resources([]))
+
+    def test_sync_with_existing_map(self):
+        braintree_object = get_fake_success_transaction(id="tx_1").transaction
+        existing = Transaction.braintree_objects.get_many_by_resources(
+            [braintree_object])
+        transaction = Transaction.sync_from_braintree_object(
+            braintree_object, existing=existing)
+        self.assertEqual(existing["tx_1"].pk, transaction.pk)
+        self.assertEqual(5, Transaction.objects.count())
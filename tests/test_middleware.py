@@ -140,3 +140,54 @@
 #
 #         response = self.middleware.process_request(request)
 #         self.assertEqual(response, None)
+
+
+"""
+.. module:: dj-braintree.tests.test_middleware
+   :synopsis: dj-braintree SubscriptionPaymentMiddleware tests.
+"""
+
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.test import TestCase
+from django.test.client import RequestFactory
+
+from mock import patch
+
+from djbraintree.middleware import SubscriptionPaymentMiddleware
+from djbraintree.models import PayerAccess
+
+
+@patch.object(SubscriptionPaymentMiddleware, "is_matching_rule",
+              return_value=False)
+@patch("djbraintree.middleware.redirect", return_value="redirected")
+class TestSubscriptionPaymentMiddleware(TestCase):
+
+    def setUp(self):
+        PayerAccess.clear_cache()
+        self.user = get_user_model().objects.create_user(
+            username="pydanny", email="pydanny@gmail.com")
+        self.response = HttpResponse()
+        self.middleware = SubscriptionPaymentMiddleware(
+            lambda request: self.response)
+        self.request = RequestFactory().get("/testapp_content/")
+        self.request.user = self.user
+
+    def test_old_style_middleware(self, redirect_mock, rule_mock):
+        self.assertIsNone(SubscriptionPaymentMiddleware().get_response)
+
+    def test_payer_without_access_is_redirected(self, redirect_mock,
+                                                rule_mock):
+        self.assertEqual("redirected", self.middleware(self.request))
+
+    def test_payer_with_access_gets_the_response(self, redirect_mock,
+                                                 rule_mock):
+        PayerAccess.objects.create(entity=self.user,
+                                   active_until=PayerAccess.UNLIMITED)
+        self.assertIs(self.response, self.middleware(self.request))
+        self.assertFalse(redirect_mock.called)
+
+    def test_staff_gets_the_response(self, redirect_mock, rule_mock):
+        self.user.is_staff = True
+        with self.assertNumQueries(0):
+            self.assertIs(self.response, self.middleware(self.request))
@@ -0,0 +1,101 @@
+"""
+.. module:: dj-braintree.tests.test_pagination
+   :synopsis: dj-braintree Keyset Pagination Tests.
+
+"""
+import datetime
+
+from django.contrib.auth import get_user_model
+from django.test.client import RequestFactory
+from django.test.testcases import TestCase
+from django.utils import timezone
+
+from mock import patch
+
+from djbraintree.models import Customer, Transaction
+from djbraintree.pagination import keyset_paginate, decode_cursor
+from djbraintree.views import HistoryView, SyncHistoryView
+
+
+class KeysetPaginationTest(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username="patrick", email="patrick@gmail.com")
+        self.customer = Customer.objects.create(
+            entity=self.user, braintree_id="cus_xxxxxxxxxxxxxxx")
+        base = datetime.datetime(2016, 5, 1, tzinfo=timezone.utc)
+        for i in range(5):
+            Transaction.objects.create(
+                braintree_id="tx_{0}".format(i),
+                customer=self.customer,
+                # tx_2 and tx_3 share a timestamp to exercise the id tiebreak
+                created_at=base + datetime.timedelta(days=min(i, 2)),
+            )
+        Transaction.objects.create(braintree_id="tx_unsynced",
+                                   customer=self.customer)
+
+    def test_pages_cover_every_transaction_once(self):
+        seen = []
+        cursor = None
+        while True:
+            page = keyset_paginate(self.customer.transactions.all(),
+                                   cursor=cursor, page_size=2)
+            seen.extend(tx.braintree_id for tx in page)
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        self.assertEqual(["tx_4", "tx_3", "tx_2", "tx_1", "tx_0"], seen)
+
+    def test_last_page_has_no_cursor(self):
+        page = keyset_paginate(self.customer.transactions.all(), page_size=5)
+        self.assertEqual(5, len(page))
+        self.assertFalse(page.has_next)
+
+    def test_bad_cursor_restarts(self):
+        self.assertIsNone(decode_cursor("not a cursor"))
+        page = keyset_paginate(self.customer.transactions.all(),
+                               cursor="not a cursor", page_size=1)
+        self.assertEqual("tx_4", page.object_list[0].braintree_id)
+
+
+@patch("braintree.Customer.find")
+@patch("braintree.Customer.create")
+class HistoryViewTest(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username="patrick", email="patrick@gmail.com")
+        self.factory = RequestFactory()
+
+    def request(self, method="get"):
+        request = getattr(self.factory, method)("/history/")
+        request.user = self.user
+        return request
+
+    def test_history_without_customer(self, customer_create_mock,
+                                      customer_find_mock):
+        response = HistoryView.as_view()(self.request())
+        self.assertEqual([], list(response.context_data["transactions"]))
+        self.assertIsNone(response.context_data["customer"])
+        self.assertFalse(Customer.objects.exists())
+        self.assertFalse(customer_create_mock.called)
+
+    @patch("djbraintree.views.render")
+    def test_sync_history_is_served_locally(self, render_mock,
+                                            customer_create_mock,
+                                            customer_find_mock):
+        customer = Customer.objects.create(
+            entity=self.user, braintree_id="cus_xxxxxxxxxxxxxxx")
+        Transaction.objects.create(
+            braintree_id="tx_0", customer=customer,
+            created_at=datetime.datetime(2016, 5, 1, tzinfo=timezone.utc))
+
+        SyncHistoryView.as_view()(self.request("post"))
+
+        context = render_mock.call_args[0][2]
+        self.assertEqual(customer, context["customer"])
+        self.assertEqual(["tx_0"], [transaction.braintree_id
+                                    for transaction in context["transactions"]])
+        self.assertFalse(customer_find_mock.called)
+        self.assertFalse(customer_create_mock.called)
@@ -0,0 +1,130 @@
+"""
+.. module:: dj-braintree.tests.test_payment_methods
+   :synopsis: dj-braintree PaymentMethod model tests.
+"""
+
+from __future__ import unicode_literals
+import datetime
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from mock import Mock, patch
+
+from djbraintree.models import Customer, PaymentMethod
+from djbraintree.webhook_queue import sync_payment_method
+from tests import get_fake_credit_card, get_fake_customer
+
+
+class PaymentMethodTestCase(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username="patrick", email="patrick@gmail.com")
+        self.customer = Customer.objects.create(
+            entity=self.user, braintree_id="cus_xxxxxxxxxxxxxxx")
+
+
+class TestPaymentMethod(PaymentMethodTestCase):
+
+    def test_expiry_date(self):
+        self.assertEqual(datetime.date(2016, 2, 29),
+                         PaymentMethod.expiry_date("02", "2016"))
+        self.assertIsNone(PaymentMethod.expiry_date("", ""))
+        self.assertIsNone(PaymentMethod.expiry_date("13", "2016"))
+
+    def test_sync_from_braintree_customers(self):
+        self.assertEqual(1, PaymentMethod.sync_from_braintree_customers(
+            [get_fake_customer()]))
+        payment_method = PaymentMethod.objects.get()
+        self.assertEqual("token", payment_method.braintree_id)
+        self.assertEqual(self.customer, payment_method.customer)
+        self.assertEqual("06/2016", payment_method.expiration_date)
+        self.assertEqual(datetime.date(2016, 6, 30), payment_method.expires_on)
+        self.assertEqual("411111******1111", payment_method.masked_number)
+        self.assertTrue(payment_method.default)
+
+    def test_resync_updates_and_deletes(self):
+        PaymentMethod.sync_from_braintree_customers([get_fake_customer(
+            credit_cards=[get_fake_credit_card(),
+                          get_fake_credit_card(token="other", default=False)])])
+        self.assertEqual(2, PaymentMethod.objects.count())
+
+        PaymentMethod.sync_from_braintree_customers([get_fake_customer(
+            credit_cards=[get_fake_credit_card(expiration_year="2020")])])
+        payment_method = PaymentMethod.objects.get()
+        self.assertEqual("token", payment_method.braintree_id)
+        self.assertEqual(datetime.date(2020, 6, 30), payment_method.expires_on)
+
+    def test_resync_of_unchanged_vault_data_writes_nothing(self):
+        PaymentMethod.sync_from_braintree_customers([get_fake_customer()])
+        with CaptureQueriesContext(connection) as queries:
+            PaymentMethod.sync_from_braintree_customers([get_fake_customer()])
+        self.assertFalse([query for query in queries.captured_queries
+                          if query["sql"].startswith(("UPDATE", "INSERT"))])
+
+    def test_unknown_customers_are_kept_unlinked(self):
+        PaymentMethod.sync_from_braintree_customers([get_fake_customer(
+            id="cus_unknown",
+            credit_cards=[get_fake_credit_card(customer_id="cus_unknown")])])
+        payment_method = PaymentMethod.objects.get()
+        self.assertIsNone(payment_method.customer)
+        self.assertEqual("cus_unknown", payment_method.customer_braintree_id)
+
+    def test_expiring_within(self):
+        PaymentMethod.sync_from_braintree_customers([get_fake_customer(
+            credit_cards=[
+                get_fake_credit_card(),
+                get_fake_credit_card(token="later", expiration_month="08"),
+                get_fake_credit_card(token="expired", expiration_month="05"),
+            ])])
+        expiring = PaymentMethod.objects.expiring_within(
+            30, today=datetime.date(2016, 6, 15))
+        self.assertEqual(["token"],
+                         [payment_method.token for payment_method in expiring])
+
+
+class TestDefaultPaymentMethod(PaymentMethodTestCase):
+
+    def test_customer_sync_stores_the_default_token(self):
+        self.customer.sync(get_fake_customer(credit_cards=[
+            get_fake_credit_card(token="old", default=False),
+            get_fake_credit_card()]))
+        self.assertEqual("token", self.customer.default_payment_method_token)
+        self.assertEqual(2, self.customer.payment_methods.count())
+
+    @patch("braintree.Customer.find")
+    def test_answered_locally(self, customer_find_mock):
+        PaymentMethod.sync_from_braintree_customers([get_fake_customer()])
+        customer = Customer.objects.get(pk=self.customer.pk)
+        with self.assertNumQueries(1):
+            self.assertTrue(customer.has_default_payment_method())
+            self.assertEqual("token", customer.default_payment_method.token)
+            self.assertEqual("token", customer.default_payment_method.token)
+        self.assertFalse(customer_find_mock.called)
+
+    def test_no_default_payment_method(self):
+        PaymentMethod.sync_from_braintree_customers([get_fake_customer(
+            credit_cards=[get_fake_credit_card(default=False)])])
+        customer = Customer.objects.get(pk=self.customer.pk)
+        self.assertFalse(customer.has_default_payment_method())
+        self.assertIsNone(customer.default_payment_method)
+
+    @patch("braintree.Customer.find")
+    def test_revoked_payment_method_webhook(self, customer_find_mock):
+        self.customer.sync(get_fake_customer(credit_cards=[
+            get_fake_credit_card(),
+            get_fake_credit_card(token="other", default=False)]))
+        customer_find_mock.return_value = get_fake_customer(credit_cards=[
+            get_fake_credit_card(token="other")])
+
+        notification = Mock(revoked_payment_method_metadata=Mock(
+            customer_id="cus_xxxxxxxxxxxxxxx", token="token"))
+        sync_payment_method("token", [notification])
+
+        customer = Customer.objects.get(pk=self.customer.pk)
+        self.assertEqual("other", customer.default_payment_method_token)
+        self.assertEqual(["other"], list(customer.payment_methods.values_list(
+            "token", flat=True)))
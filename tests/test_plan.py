@@ -93,3 +93,126 @@
 #     def test_stripe_plan(self, plan_retrieve_mock):
 #         self.assertEqual("soup", self.plan.stripe_plan)
 #         plan_retrieve_mock.assert_called_once_with(self.test_stripe_id)
+
+
+"""
+.. module:: dj-braintree.tests.test_plan
+   :synopsis: dj-braintree Plan model and plan catalog tests.
+"""
+
+from __future__ import unicode_literals
+from decimal import Decimal
+
+from braintree import BraintreeGateway as GWay
+from braintree.plan import Plan as BraintreePlanResource
+from django.core.cache import cache
+from django.test import TestCase
+
+from mock import patch
+
+from djbraintree.catalog import get_catalog, get_plan, invalidate_catalog, plan_choices, plan_list
+from djbraintree.forms import PlanForm
+from djbraintree.models import Plan
+
+
+def get_fake_plan(**kwargs):
+    attributes = {
+        "id": "test_id",
+        "name": "Braintree Plan 1",
+        "description": "Described in Braintree",
+        "price": "30.00",
+        "currency_iso_code": "EUR",
+        "billing_frequency": 1,
+        "billing_day_of_month": None,
+        "number_of_billing_cycles": None,
+        "trial_period": False,
+        "trial_duration": None,
+        "trial_duration_unit": None,
+        "add_ons": [],
+        "discounts": [],
+    }
+    attributes.update(kwargs)
+    return BraintreePlanResource(GWay(None), attributes)
+
+
+class PlanCatalogTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        invalidate_catalog()
+
+
+class TestPlanSync(PlanCatalogTestCase):
+
+    @patch("braintree.Plan.all")
+    def test_sync_all(self, all_mock):
+        Plan.objects.create(braintree_id="test_id_0", name="Stale")
+        Plan.objects.create(braintree_id="test_id", name="Old name")
+        all_mock.return_value = [get_fake_plan(),
+                                 get_fake_plan(id="test_id_2", price="9.99")]
+
+        self.assertEqual(2, Plan.sync_all())
+
+        self.assertEqual({"test_id", "test_id_2"},
+                         set(Plan.objects.values_list("braintree_id", flat=True)))
+        plan = Plan.objects.get(braintree_id="test_id")
+        self.assertEqual("Braintree Plan 1", plan.name)
+        self.assertEqual(Decimal("30.00"), plan.price)
+        self.assertEqual(Decimal("9.99"),
+                         Plan.objects.get(braintree_id="test_id_2").price)
+
+    @patch("braintree.Plan.all")
+    def test_sync_all_invalidates_catalog(self, all_mock):
+        self.assertEqual(2500, get_plan("test")["price"])
+        all_mock.return_value = [get_fake_plan()]
+
+        Plan.sync_all()
+
+        self.assertEqual(3000, get_plan("test")["price"])
+
+
+class TestPlanCatalog(PlanCatalogTestCase):
+
+    def test_configured_plans(self):
+        catalog = get_catalog()
+        self.assertEqual(set(catalog), {"test0", "test", "test2", "test_deletion",
+                                        "test_trial", "unidentified_test_plan"})
+        self.assertEqual("test0", list(catalog)[0])
+        self.assertEqual("test", catalog["test"]["plan"])
+
+    def test_synced_plan_overrides_configuration(self):
+        Plan.objects.create(braintree_id="test_id", name="Braintree Plan 1",
+                            description="", price=Decimal("30.00"),
+                            currency_iso_code="EUR")
+        invalidate_catalog()
+
+        plan = get_plan("test")
+        self.assertEqual("Braintree Plan 1", plan["name"])
+        self.assertEqual("Another test plan", plan["description"])
+        self.assertEqual(3000, plan["price"])
+        self.assertEqual("eur", plan["currency"])
+
+    def test_cached_until_invalidated(self):
+        get_catalog()
+        with self.assertNumQueries(0):
+            get_catalog()
+
+        invalidate_catalog()
+        with self.assertNumQueries(1):
+            get_catalog()
+
+    def test_version_change_from_another_process(self):
+        get_catalog()
+        # Another process invalidating only changes the shared stamp
+        cache.set("djbraintree:plan_catalog_version", "elsewhere", None)
+        with self.assertNumQueries(1):
+            get_catalog()
+
+    def test_plan_list_skips_unidentified_plans(self):
+        self.assertNotIn("unidentified_test_plan",
+                         [plan["plan"] for plan in plan_list()])
+
+    def test_plan_form_choices(self):
+        self.assertEqual(plan_choices(), list(PlanForm().fields["plan"].choices))
+        self.assertFalse(PlanForm({"plan": "nope"}).is_valid())
+        self.assertTrue(PlanForm({"plan": "test"}).is_valid())
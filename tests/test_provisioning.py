@@ -0,0 +1,114 @@
+"""
+.. module:: dj-braintree.tests.test_provisioning
+   :synopsis: dj-braintree Bulk Customer Provisioning Tests.
+
+"""
+import json
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.test.testcases import TestCase
+
+from braintree import BraintreeGateway as GWay
+from braintree import SuccessfulResult
+from braintree.customer import Customer as BraintreeCustomer
+from braintree.exceptions.http.timeout_error import TimeoutError
+from mock import MagicMock, patch
+
+from djbraintree.models import Customer
+from djbraintree.provisioning import provision_customers
+from djbraintree.resilience import reset_breakers
+
+
+def fake_customer_create(params):
+    return SuccessfulResult({"customer": BraintreeCustomer(GWay(), {
+        "id": params["id"],
+        "email": params["email"],
+        "company": None,
+        "created_at": None,
+        "fax": None,
+        "first_name": None,
+        "last_name": None,
+        "phone": None,
+        "updated_at": None,
+        "website": None,
+    })})
+
+
+class ProvisionCustomersTest(TestCase):
+
+    def setUp(self):
+        for i in range(5):
+            get_user_model().objects.create_user(
+                username="payer{0}".format(i),
+                email="payer{0}@example.com".format(i))
+        self.tmpdir = tempfile.mkdtemp()
+        self.checkpoint_path = os.path.join(self.tmpdir, "checkpoint.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+        # Failing creates open the gateway circuit breaker
+        reset_breakers()
+
+    def payers(self):
+        return get_user_model().objects.filter(customer__isnull=True)
+
+    @patch("braintree.Customer.create", side_effect=fake_customer_create)
+    def test_provisions_all_payers_in_chunks(self, customer_create_mock):
+        users = list(get_user_model().objects.order_by("pk"))
+        created, failed = provision_customers(self.payers(), chunk_size=2,
+                                              workers=2)
+        self.assertEqual((5, 0), (created, failed))
+        self.assertEqual(5, Customer.objects.count())
+        self.assertEqual(5, customer_create_mock.call_count)
+        self.assertEqual(
+            "payer3@example.com",
+            Customer.objects.get(braintree_id="payer_{0}".format(
+                users[3].pk)).entity.email)
+
+    @patch("braintree.Customer.create", side_effect=fake_customer_create)
+    def test_resumes_from_checkpoint(self, customer_create_mock):
+        users = list(get_user_model().objects.order_by("pk"))
+        with open(self.checkpoint_path, "w") as checkpoint_file:
+            json.dump({"last_pk": users[1].pk,
+                       "pending": [[users[1].pk, "cus_pending"]]},
+                      checkpoint_file)
+
+        created, failed = provision_customers(
+            self.payers(), checkpoint_path=self.checkpoint_path)
+
+        self.assertEqual(4, created)
+        # payer0 is before the checkpoint, payer1 was pending
+        self.assertEqual(3, customer_create_mock.call_count)
+        self.assertEqual(users[1], Customer.objects.get(
+            braintree_id="cus_pending").entity)
+        self.assertFalse(os.path.exists(self.checkpoint_path))
+
+    @patch("braintree.Customer.find")
+    @patch("braintree.Customer.create")
+    def test_resume_reuses_customers_created_before_a_crash(
+            self, customer_create_mock, customer_find_mock):
+        # The first run died after its creates, before any checkpoint
+        user = get_user_model().objects.order_by("pk").first()
+        customer_id = "payer_{0}".format(user.pk)
+        customer_create_mock.side_effect = lambda params: (
+            MagicMock(is_success=False, errors=MagicMock(
+                deep_errors=[MagicMock(code="91609")]))
+            if params["id"] == customer_id else fake_customer_create(params))
+        customer_find_mock.return_value = fake_customer_create(
+            {"id": customer_id, "email": user.email}).customer
+
+        created, failed = provision_customers(self.payers())
+
+        self.assertEqual((5, 0), (created, failed))
+        customer_find_mock.assert_called_once_with(customer_id)
+        self.assertEqual(user, Customer.objects.get(
+            braintree_id=customer_id).entity)
+
+    @patch("braintree.Customer.create", side_effect=TimeoutError)
+    def test_failures_are_counted(self, customer_create_mock):
+        created, failed = provision_customers(self.payers())
+        self.assertEqual((0, 5), (created, failed))
+        self.assertEqual(0, Customer.objects.count())
@@ -0,0 +1,107 @@
+"""
+.. module:: dj-braintree.tests.test_records
+   :synopsis: dj-braintree Compact Record Tests.
+
+"""
+from decimal import Decimal
+import sys
+
+from django.test.testcases import TestCase
+
+from djbraintree.models import Transaction, Customer
+from djbraintree.records import CompactRecord, MISSING
+from tests import get_fake_success_transaction
+
+
+class CompactRecordTest(TestCase):
+
+    def setUp(self):
+        self.braintree_object = get_fake_success_transaction().transaction
+
+    def test_record_class_is_cached_per_model(self):
+        self.assertIs(Transaction.record_class(), Transaction.record_class())
+        self.assertIsNot(Transaction.record_class(), Customer.record_class())
+
+    def test_record_fields_follow_model_fields(self):
+        fields = Transaction.record_class().fields
+        self.assertEqual("braintree_id", fields[0])
+        self.assertNotIn("id", fields)
+        self.assertNotIn("created", fields)
+        self.assertNotIn("customer_id", fields)
+
+    def test_compact_record_matches_dict_record(self):
+        record = Transaction.braintree_object_to_compact_record(
+            self.braintree_object)
+        self.assertIsInstance(record, CompactRecord)
+        self.assertEqual(
+            Transaction.braintree_object_to_record(self.braintree_object),
+            record.as_dict())
+        self.assertEqual(Decimal("10.00"), record.amount)
+
+    def test_unmapped_fields_are_missing(self):
+        record = Transaction.braintree_object_to_compact_record(
+            self.braintree_object)
+        # PayPal fields are only mapped for PayPal transactions
+        self.assertIs(MISSING, record.payer_email)
+        self.assertNotIn("payer_email", record.as_dict())
+        self.assertIsNone(record.as_tuple()[record.fields.index("payer_email")])
+
+    def test_records_have_no_instance_dict(self):
+        record = Transaction.braintree_object_to_compact_record(
+            self.braintree_object)
+        self.assertFalse(hasattr(record, "__dict__"))
+        with self.assertRaises(AttributeError):
+            record.not_a_field = 1
+
+    def test_create_from_record(self):
+        record = Transaction.braintree_object_to_compact_record(
+            self.braintree_object)
+        transaction = Transaction.create_from_record(record)
+        self.assertEqual("d5y99n", transaction.braintree_id)
+        self.assertEqual(Decimal("10.00"), transaction.amount)
+
+    def test_sync_from_record(self):
+        transaction = Transaction.objects.create(braintree_id="d5y99n")
+        transaction.sync(Transaction.braintree_object_to_compact_record(
+            self.braintree_object))
+        self.assertEqual(
+            Decimal("10.00"),
+            Transaction.objects.get(braintree_id="d5y99n").amount)
+
+    def test_from_dict_rejects_unknown_fields(self):
+        data = Transaction.braintree_object_to_record(self.braintree_object)
+        data["customer_id"] = 1
+        with self.assertRaises(TypeError):
+            Transaction.record_class().from_dict(data)
+
+    def test_records_are_fully_slotted(self):
+        """
+        Every class of a record declares ``__slots__``, so a record is one
+        fixed-size object per mapped payload, with no per-instance dict.
+        """
+        record_class = Transaction.record_class()
+        self.assertEqual(record_class.fields, tuple(record_class.__slots__))
+        for klass in record_class.__mro__[:-1]:
+            self.assertIn("__slots__", vars(klass))
+
+    def test_bytes_per_record(self):
+        """
+        Memory benchmark: container bytes per mapped transaction, as dicts
+        and as compact records. The values are shared between both
+        representations, so only the container overhead differs.
+        """
+        records = [
+            Transaction.braintree_object_to_record(
+                get_fake_success_transaction(
+                    id="tx_{0}".format(i)).transaction)
+            for i in range(100)]
+        compact_records = [Transaction.record_class().from_dict(data)
+                           for data in records]
+
+        dict_bytes = sum(map(sys.getsizeof, records)) // len(records)
+        record_bytes = (sum(map(sys.getsizeof, compact_records)) //
+                        len(compact_records))
+        self.assertLess(
+            record_bytes * 2, dict_bytes,
+            "{0} bytes per dict, {1} per compact record ({2} fields)".format(
+                dict_bytes, record_bytes, len(compact_records[0].fields)))
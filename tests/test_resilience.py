@@ -0,0 +1,130 @@
+"""
+.. module:: dj-braintree.tests.test_resilience
+   :synopsis: dj-braintree Circuit Breaker and Retry Tests.
+
+"""
+from braintree.exceptions import NotFoundError, ServerError, UnexpectedError
+from django.test import TestCase
+from mock import MagicMock, patch
+
+from djbraintree.exceptions import CircuitOpenError
+from djbraintree.models import Transaction
+from djbraintree.resilience import (CircuitBreaker, call_with_retries,
+                                    reset_breakers, CLOSED, OPEN, HALF_OPEN)
+from djbraintree.signals import circuit_breaker_state_changed
+
+
+class FakeClock(object):
+    now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class CircuitBreakerTest(TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker("test", failure_threshold=3,
+                                      reset_timeout=30, clock=self.clock)
+        self.failing = MagicMock(side_effect=ServerError())
+        self.changes = []
+        circuit_breaker_state_changed.connect(self.record_change)
+
+    def tearDown(self):
+        circuit_breaker_state_changed.disconnect(self.record_change)
+
+    def record_change(self, name, old_state, new_state, **kwargs):
+        self.changes.append((old_state, new_state))
+
+    def trip(self):
+        for i in range(3):
+            with self.assertRaises(ServerError):
+                self.breaker.call(self.failing)
+
+    def test_opens_after_consecutive_failures(self):
+        self.trip()
+        self.assertEqual(OPEN, self.breaker.state)
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.call(self.failing)
+        self.assertEqual(3, self.failing.call_count)
+        self.assertEqual([(CLOSED, OPEN)], self.changes)
+
+    def test_non_transient_errors_reset_the_count(self):
+        for i in range(2):
+            with self.assertRaises(ServerError):
+                self.breaker.call(self.failing)
+        with self.assertRaises(NotFoundError):
+            self.breaker.call(MagicMock(side_effect=NotFoundError()))
+        with self.assertRaises(ServerError):
+            self.breaker.call(self.failing)
+        self.assertEqual(CLOSED, self.breaker.state)
+
+    def test_half_open_probe_closes_on_success(self):
+        self.trip()
+        self.clock.now += 31
+        self.assertEqual("ok", self.breaker.call(lambda: "ok"))
+        self.assertEqual(CLOSED, self.breaker.state)
+        self.assertEqual([(CLOSED, OPEN), (OPEN, HALF_OPEN),
+                          (HALF_OPEN, CLOSED)], self.changes)
+
+    def test_half_open_probe_reopens_on_failure(self):
+        self.trip()
+        self.clock.now += 31
+        with self.assertRaises(ServerError):
+            self.breaker.call(self.failing)
+        self.assertEqual(OPEN, self.breaker.state)
+
+    def test_bad_gateway_counts_as_a_failure(self):
+        bad_gateway = MagicMock(
+            side_effect=UnexpectedError("Unexpected HTTP_RESPONSE 502"))
+        for i in range(3):
+            with self.assertRaises(UnexpectedError):
+                self.breaker.call(bad_gateway)
+        self.assertEqual(OPEN, self.breaker.state)
+
+    def test_interrupted_probe_is_released(self):
+        self.trip()
+        self.clock.now += 31
+        with self.assertRaises(KeyboardInterrupt):
+            self.breaker.call(MagicMock(side_effect=KeyboardInterrupt))
+        self.assertEqual(HALF_OPEN, self.breaker.state)
+        self.assertEqual("ok", self.breaker.call(lambda: "ok"))
+        self.assertEqual(CLOSED, self.breaker.state)
+
+    def test_retries_until_success(self):
+        func = MagicMock(side_effect=[ServerError(), ServerError(), "ok"])
+        sleep = MagicMock()
+        self.assertEqual("ok", call_with_retries(self.breaker, func,
+                                                 retries=3, sleep=sleep))
+        self.assertEqual(2, sleep.call_count)
+
+    def test_retries_stop_when_circuit_opens(self):
+        sleep = MagicMock()
+        with self.assertRaises(CircuitOpenError):
+            call_with_retries(self.breaker, self.failing, retries=10,
+                              sleep=sleep)
+        self.assertEqual(3, self.failing.call_count)
+
+
+class ResilientApiTest(TestCase):
+
+    def setUp(self):
+        reset_breakers()
+
+    def tearDown(self):
+        reset_breakers()
+
+    @patch("djbraintree.resilience.time.sleep")
+    @patch("braintree.Transaction.find")
+    def test_find_is_retried(self, transaction_find_mock, sleep_mock):
+        transaction_find_mock.side_effect = [ServerError(), "tx"]
+        self.assertEqual("tx", Transaction.api().find("tx_XXXXXX"))
+        self.assertEqual(2, transaction_find_mock.call_count)
+
+    @patch("braintree.Transaction.sale")
+    def test_sale_is_not_retried(self, transaction_sale_mock):
+        transaction_sale_mock.side_effect = ServerError()
+        with self.assertRaises(ServerError):
+            Transaction.api().sale({})
+        self.assertEqual(1, transaction_sale_mock.call_count)
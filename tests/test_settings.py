@@ -3,7 +3,7 @@ from django.core.exceptions import ImproperlyConfigured
 from django.test import TestCase
 from django.test.utils import override_settings
 
-from djbraintree.settings import get_payer_model, plan_from_braintree_id
+from djbraintree.settings import get_payer_model, plan_from_braintree_id, plan_level
 
 
 class TestSubscriberModelRetrievalMethod(TestCase):
@@ -53,3 +53,17 @@ class TestSettings(TestCase):
     def test_empty_plans(self):
         plan = plan_from_braintree_id("test_id")
         self.assertEqual(None, plan)
+
+    @override_settings(DJBRAINTREE_PLANS={"other": {"braintree_plan_id": "test_id"}})
+    def test_plans_rebuilt_on_settings_change(self):
+        plan = plan_from_braintree_id("test_id")
+        self.assertEqual("other", plan)
+
+    def test_plan_level(self):
+        self.assertEqual(2, plan_level("test_deletion"))
+        self.assertEqual(-1, plan_level("test999"))
+
+    @override_settings(DJBRAINTREE_PLAN_HIERARCHY={"bronze": {"level": 5, "plans": ["test_deletion"]}})
+    def test_plan_level_rebuilt_on_settings_change(self):
+        self.assertEqual(5, plan_level("test_deletion"))
+        self.assertEqual(-1, plan_level("test0"))
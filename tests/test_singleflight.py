@@ -0,0 +1,64 @@
+"""
+.. module:: dj-braintree.tests.test_singleflight
+   :synopsis: dj-braintree Request Coalescing Tests.
+
+"""
+import threading
+
+from django.test import TestCase
+from mock import patch
+
+from djbraintree.models import Transaction
+from djbraintree.singleflight import SingleFlight
+from tests import get_fake_success_transaction
+
+
+class SingleFlightTest(TestCase):
+
+    def test_concurrent_calls_share_one_call(self):
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+        results = []
+
+        def slow_find(braintree_id):
+            calls.append(braintree_id)
+            started.set()
+            release.wait()
+            return braintree_id.upper()
+
+        def worker():
+            results.append(flight.do("key", slow_find, "tx"))
+
+        leader = threading.Thread(target=worker)
+        leader.start()
+        started.wait()
+        followers = [threading.Thread(target=worker) for i in range(4)]
+        for follower in followers:
+            follower.start()
+        release.set()
+        for thread in [leader] + followers:
+            thread.join()
+
+        self.assertEqual(["tx"], calls)
+        self.assertEqual(["TX"] * 5, results)
+        self.assertEqual(0, flight.in_flight())
+
+    def test_errors_are_raised_and_not_cached(self):
+        flight = SingleFlight()
+
+        def fail():
+            raise ValueError("boom")
+
+        with self.assertRaises(ValueError):
+            flight.do("key", fail)
+        self.assertEqual("ok", flight.do("key", lambda: "ok"))
+
+    @patch("braintree.Transaction.find")
+    def test_api_find_uses_single_flight(self, transaction_find_mock):
+        transaction_find_mock.return_value = \
+            get_fake_success_transaction().transaction
+        transaction = Transaction(braintree_id="d5y99n")
+        self.assertEqual("d5y99n", transaction.api_find().id)
+        transaction_find_mock.assert_called_once_with("d5y99n")
@@ -0,0 +1,87 @@
+"""
+.. module:: dj-braintree.tests.test_streaming
+   :synopsis: dj-braintree Incremental webhook body reader tests.
+"""
+
+from __future__ import unicode_literals
+import base64
+import datetime
+import io
+
+from django.test import TestCase
+from django.utils.http import urlencode
+
+from braintree.util.xml_util import XmlUtil
+
+from djbraintree.streaming import Base64Reader, iter_form_fields, parse_xml
+
+DISBURSEMENT_XML = b"""<?xml version="1.0" encoding="UTF-8"?>
+<notification>
+  <timestamp type="datetime">2016-01-01T00:00:00Z</timestamp>
+  <kind>disbursement</kind>
+  <subject>
+    <disbursement>
+      <id>abc</id>
+      <transaction-ids type="array">
+""" + b"".join(b"<item>tx" + str(i).encode("ascii") + b"</item>\n" for i in range(100)) + b"""
+      </transaction-ids>
+      <amount>100.00</amount>
+      <success type="boolean">true</success>
+      <exception-message nil="true"/>
+      <disbursement-date type="date">2014-02-10</disbursement-date>
+      <merchant-account><id>m</id><status>active</status></merchant-account>
+      <merchant-account><id>n</id></merchant-account>
+      <follow-up-action></follow-up-action>
+    </disbursement>
+  </subject>
+</notification>"""
+
+
+class TestStreaming(TestCase):
+
+    def read_fields(self, body, chunk_size):
+        fields = {}
+        for name, piece, _ in iter_form_fields(io.BytesIO(body), len(body),
+                                               chunk_size=chunk_size):
+            fields[name] = fields.get(name, b"") + piece
+        return fields
+
+    def test_iter_form_fields(self):
+        payload = base64.encodestring(DISBURSEMENT_XML)
+        body = urlencode({"bt_signature": "public|" + "a" * 40,
+                          "bt_payload": payload.decode("ascii")}).encode("ascii")
+        body += b"&flag&empty="
+        for chunk_size in (1, 2, 3, 7, 1024, len(body)):
+            fields = self.read_fields(body, chunk_size)
+            self.assertEqual(payload, fields[b"bt_payload"])
+            self.assertEqual(b"public|" + b"a" * 40, fields[b"bt_signature"])
+            self.assertEqual(b"", fields[b"empty"])
+            self.assertNotIn(b"flag", fields)
+
+    def test_reads_no_more_than_content_length(self):
+        body = b"bt_signature=abc&trailing=garbage"
+        self.assertEqual({b"bt_signature": b"abc"},
+                         self.read_fields(body[:16], 4))
+
+    def test_base64_reader(self):
+        payload = base64.encodestring(DISBURSEMENT_XML)
+        reader = Base64Reader(io.BytesIO(payload), chunk_size=5)
+        self.assertEqual(DISBURSEMENT_XML[:10], reader.read(10))
+        self.assertEqual(DISBURSEMENT_XML[10:], reader.read())
+
+    def test_base64_reader_invalid_data(self):
+        with self.assertRaises(ValueError):
+            Base64Reader(io.BytesIO(b"abcde")).read()
+
+    def test_parse_xml_matches_sdk_parser(self):
+        parsed = parse_xml(io.BytesIO(DISBURSEMENT_XML))
+        self.assertEqual(XmlUtil.dict_from_xml(DISBURSEMENT_XML), parsed)
+        disbursement = parsed["notification"]["subject"]["disbursement"]
+        self.assertEqual(100, len(disbursement["transaction_ids"]))
+        self.assertEqual(2, len(disbursement["merchant_account"]))
+        self.assertEqual(datetime.date(2014, 2, 10),
+                         disbursement["disbursement_date"])
+
+    def test_parse_xml_malformed(self):
+        with self.assertRaises(ValueError):
+            parse_xml(io.BytesIO(b"<notification><kind>"))
@@ -304,3 +304,166 @@
 #
 #     def test_is_status_temporarily_current_false(self):
 #         self.assertFalse(self.current_subscription.is_status_temporarily_current())
+
+
+"""
+.. module:: dj-braintree.tests.test_subscriptions
+   :synopsis: dj-braintree Subscription model tests.
+"""
+
+import datetime
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from mock import patch
+
+from djbraintree.lru import LRUCache
+from djbraintree.models import Customer, PayerAccess, Subscription
+from djbraintree.utils import entity_has_active_subscription
+from tests import get_fake_subscription
+
+
+class SubscriptionTestCase(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username="patrick", email="patrick@gmail.com")
+        self.customer = Customer.objects.create(
+            entity=self.user, braintree_id="cus_xxxxxxxxxxxxxxx")
+        PayerAccess.clear_cache()
+
+    def subscription(self, **kwargs):
+        # No transactions and no token: the customer is set below
+        kwargs.setdefault("payment_method_token", None)
+        subscription = Subscription.sync_from_braintree_object(
+            get_fake_subscription(**kwargs))
+        subscription.customer = self.customer
+        subscription.save()
+        return subscription
+
+
+class TestSubscription(SubscriptionTestCase):
+
+    def test_sync_resolves_customer_from_transactions(self):
+        subscription = Subscription.sync_from_braintree_object(
+            get_fake_subscription(transactions=[{
+                "id": "tx", "amount": "10.00", "tax_amount": None,
+                "customer": {"id": "cus_xxxxxxxxxxxxxxx"}}]))
+        self.assertEqual(self.customer, subscription.customer)
+        self.assertEqual("Active", subscription.status)
+        self.assertEqual(datetime.date(2016, 6, 10),
+                         subscription.paid_through_date)
+
+    def test_active_for(self):
+        other = get_user_model().objects.create_user(
+            username="other", email="other@gmail.com")
+        self.subscription()
+        self.assertEqual({self.user.pk},
+                         Subscription.objects.active_entity_ids(
+                             [self.user.pk, other.pk]))
+        self.assertTrue(self.customer.has_active_subscription())
+        self.assertTrue(entity_has_active_subscription(self.user))
+        self.assertFalse(entity_has_active_subscription(other))
+
+    @patch("braintree.Customer.create")
+    def test_paywall_check_makes_no_gateway_calls(self, customer_create_mock):
+        other = get_user_model().objects.create_user(
+            username="other", email="other@gmail.com")
+        self.assertFalse(entity_has_active_subscription(other))
+        self.assertFalse(customer_create_mock.called)
+
+    def test_canceled_is_active_until_paid_through_date(self):
+        self.subscription(status="Canceled")
+        self.assertTrue(Subscription.objects.active_for(
+            [self.user.pk], today=datetime.date(2016, 6, 10)).exists())
+        self.assertFalse(Subscription.objects.active_for(
+            [self.user.pk], today=datetime.date(2016, 6, 11)).exists())
+
+    def test_webhook_transitions(self):
+        subscription = self.subscription()
+        self.assertTrue(subscription.apply_webhook(get_fake_subscription(
+            status="Past Due",
+            updated_at=datetime.datetime(2016, 6, 12))))
+        self.assertEqual("Past Due", subscription.status)
+        self.assertTrue(subscription.apply_webhook(get_fake_subscription(
+            status="Canceled",
+            updated_at=datetime.datetime(2016, 6, 13))))
+
+        # Canceled is final
+        self.assertFalse(subscription.apply_webhook(get_fake_subscription(
+            status="Active",
+            updated_at=datetime.datetime(2016, 6, 14))))
+        self.assertEqual("Canceled",
+                         Subscription.objects.get(pk=subscription.pk).status)
+
+    def test_stale_webhooks_are_ignored(self):
+        subscription = self.subscription(
+            updated_at=datetime.datetime(2016, 6, 12))
+        self.assertFalse(subscription.apply_webhook(get_fake_subscription(
+            status="Past Due",
+            updated_at=datetime.datetime(2016, 6, 11))))
+        self.assertEqual("Active", subscription.status)
+
+    def test_webhook_on_a_stored_subscription(self):
+        # Stored timestamps are loaded aware, the SDK's are naive
+        self.subscription()
+        subscription = Subscription.apply_notification(get_fake_subscription(
+            status="Past Due", updated_at=datetime.datetime(2016, 6, 12)))
+        self.assertEqual("Past Due", subscription.status)
+        self.assertEqual("Past Due",
+                         Subscription.objects.get(pk=subscription.pk).status)
+
+        stale = Subscription.apply_notification(get_fake_subscription(
+            status="Active", updated_at=datetime.datetime(2016, 6, 11)))
+        self.assertEqual("Past Due", stale.status)
+
+    def test_due_for_renewal(self):
+        subscription = self.subscription()
+        self.assertEqual([subscription], list(
+            Subscription.objects.due_for_renewal(datetime.date(2016, 6, 11))))
+        self.assertFalse(
+            Subscription.objects.due_for_renewal(datetime.date(2016, 6, 10)))
+
+
+class TestPayerAccess(SubscriptionTestCase):
+
+    def test_refreshed_when_subscriptions_change(self):
+        subscription = self.subscription()
+        self.assertEqual(PayerAccess.UNLIMITED, PayerAccess.objects.get(
+            entity=self.user).active_until)
+
+        subscription.apply_webhook(get_fake_subscription(
+            status="Canceled", updated_at=datetime.datetime(2016, 6, 12)))
+        self.assertEqual(datetime.date(2016, 6, 10), PayerAccess.objects.get(
+            entity=self.user).active_until)
+        self.assertTrue(PayerAccess.has_access(
+            self.user.pk, today=datetime.date(2016, 6, 10)))
+        self.assertFalse(PayerAccess.has_access(
+            self.user.pk, today=datetime.date(2016, 6, 11)))
+
+    def test_best_subscription_wins(self):
+        self.subscription(id="expired", status="Expired")
+        self.subscription(id="active")
+        self.assertEqual(PayerAccess.UNLIMITED,
+                         PayerAccess.active_until_for(self.user.pk))
+
+    def test_paywall_check_is_a_single_cached_lookup(self):
+        self.subscription()
+        PayerAccess.clear_cache()
+        with self.assertNumQueries(1):
+            self.assertTrue(entity_has_active_subscription(self.user))
+            self.assertTrue(entity_has_active_subscription(self.user))
+
+    def test_payer_without_row_has_no_access(self):
+        self.assertIsNone(PayerAccess.active_until_for(self.user.pk))
+        self.assertFalse(entity_has_active_subscription(self.user))
+
+    def test_cache_entries_expire(self):
+        now = [0]
+        cache = LRUCache(10, ttl=30, clock=lambda: now[0])
+        cache.set("payer", datetime.date(2016, 6, 10))
+        now[0] = 29
+        self.assertEqual(datetime.date(2016, 6, 10), cache.get("payer"))
+        now[0] = 30
+        self.assertIsNone(cache.get("payer"))
@@ -10,6 +10,7 @@ from decimal import Decimal
 import decimal
 
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction as db_transaction
 from django.test.testcases import TestCase
 from django.utils import timezone
 
@@ -17,11 +18,12 @@ from tests import get_fake_success_transaction
 
 from mock import patch
 
-from djbraintree.models import Transaction, Customer
+from djbraintree.models import Address, MerchantAccount, Transaction, Customer
 
 
 class TransactionTest(TestCase):
     def setUp(self):
+        MerchantAccount.clear_cache()
         self.user = get_user_model().objects.create_user(
             username="patrick",
             email="patrick@gmail.com")
@@ -230,3 +232,96 @@ class TransactionTest(TestCase):
         )
         transaction.cancel_release()
         self.assertEquals(transaction.escrow_status, "held")
+
+
+class MerchantAccountTest(TestCase):
+    def setUp(self):
+        MerchantAccount.clear_cache()
+
+    def test_sync_links_merchant_account(self):
+        transaction = Transaction.sync_from_braintree_object(
+            get_fake_success_transaction().transaction)
+        self.assertEqual("zacharylayng", transaction.merchant_account.braintree_id)
+        self.assertEqual("zacharylayng", transaction.merchant_account_braintree_id)
+        self.assertEqual(transaction.merchant_account,
+                         Transaction.object_to_merchant_account(
+                             MerchantAccount.braintree_objects,
+                             get_fake_success_transaction().transaction))
+
+    def test_pk_for_is_cached(self):
+        MerchantAccount.objects.create(braintree_id="zacharylayng")
+        pk = MerchantAccount.pk_for("zacharylayng")
+        with self.assertNumQueries(0):
+            self.assertEqual(pk, MerchantAccount.pk_for("zacharylayng"))
+            self.assertIsNone(MerchantAccount.pk_for(""))
+        self.assertEqual(1, MerchantAccount.objects.count())
+
+    def test_pk_for_forgets_rolled_back_rows(self):
+        try:
+            with db_transaction.atomic():
+                MerchantAccount.pk_for("zacharylayng")
+                raise IntegrityError
+        except IntegrityError:
+            pass
+        self.assertTrue(MerchantAccount.objects.filter(
+            pk=MerchantAccount.pk_for("zacharylayng")).exists())
+
+    def test_delete_evicts_cached_pk(self):
+        MerchantAccount.pk_for("zacharylayng")
+        MerchantAccount.objects.get().delete()
+        self.assertTrue(MerchantAccount.objects.filter(
+            pk=MerchantAccount.pk_for("zacharylayng")).exists())
+
+    def test_sync_from_braintree_object(self):
+        from braintree import BraintreeGateway
+        from braintree.merchant_account import MerchantAccount as BtMerchantAccount
+
+        pk = MerchantAccount.pk_for("sub_merchant")
+        merchant_account = MerchantAccount.sync_from_braintree_object(
+            BtMerchantAccount(BraintreeGateway(), {
+                "id": "sub_merchant", "status": "active",
+                "currency_iso_code": "USD", "default": False,
+                "master_merchant_account": {"id": "zacharylayng",
+                                            "status": "active"}}))
+        self.assertEqual(pk, merchant_account.pk)
+        self.assertEqual("active", merchant_account.status)
+        self.assertEqual("zacharylayng",
+                         merchant_account.master_merchant_account_id)
+
+
+class AddressTest(TestCase):
+    def setUp(self):
+        MerchantAccount.clear_cache()
+
+    def test_sync_links_addresses(self):
+        transaction = Transaction.sync_from_braintree_object(
+            get_fake_success_transaction().transaction)
+        self.assertEqual("94107", transaction.billing_address.postal_code)
+        # The fake shipping address is empty
+        self.assertIsNone(transaction.shipping_address)
+
+    def test_addresses_are_shared_by_content(self):
+        first = Transaction.sync_from_braintree_object(
+            get_fake_success_transaction(id="tx_1").transaction)
+        second = Transaction.sync_from_braintree_object(
+            get_fake_success_transaction(id="tx_2").transaction)
+        self.assertEqual(first.billing_address, second.billing_address)
+        self.assertEqual(1, Address.objects.count())
+
+    def test_content_hash_ignores_ids_and_whitespace(self):
+        billing = get_fake_success_transaction().transaction.billing_details
+        other = get_fake_success_transaction(billing={
+            "id": "bc", "postal_code": " 94107 "}).transaction.billing_details
+        self.assertEqual(
+            Address.braintree_object_to_record(billing)["braintree_id"],
+            Address.braintree_object_to_record(other)["braintree_id"])
+
+    def test_get_or_create_many(self):
+        transactions = [get_fake_success_transaction(billing={
+            "postal_code": postal_code}).transaction
+            for postal_code in ("94107", "60606", "94107")]
+        billing = [transaction.billing_details for transaction in transactions]
+        created = Address.get_or_create_many(billing)
+        self.assertEqual(2, len(created))
+        with self.assertNumQueries(1):
+            self.assertEqual(created, Address.get_or_create_many(billing))
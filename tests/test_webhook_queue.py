@@ -0,0 +1,170 @@
+"""
+.. module:: dj-braintree.tests.test_webhook_queue
+   :synopsis: dj-braintree Webhook queue tests.
+"""
+
+from __future__ import unicode_literals
+import base64
+import datetime
+
+from django.test import TestCase
+from django.utils import timezone
+
+from braintree.exceptions import ServerError
+from mock import patch, MagicMock
+
+from djbraintree import webhook_queue
+from djbraintree.models import WebhookEvent
+from djbraintree.notifications import WebhookPayload
+from tests.test_webhooks import NOTIFICATION_XML
+
+
+def create_event(subject_id, **kwargs):
+    return WebhookEvent.objects.create(
+        kind="transaction_disbursed", subject_kind="transaction",
+        subject_id=subject_id,
+        payload=base64.b64encode(NOTIFICATION_XML).decode("ascii"),
+        **kwargs)
+
+
+@patch("djbraintree.settings.WEBHOOK_COALESCE_WINDOW", 0)
+class TestWebhookQueue(TestCase):
+
+    def event(self, subject_id, **kwargs):
+        return create_event(subject_id, **kwargs)
+
+    def test_enqueue(self):
+        notification = MagicMock(kind="subscription_went_active",
+                                 timestamp=datetime.datetime(2016, 1, 1),
+                                 spec=["kind", "timestamp", "subscription"])
+        notification.subscription.id = "sub_1"
+        payload = WebhookPayload.from_bytes(base64.b64encode(NOTIFICATION_XML))
+        event = webhook_queue.enqueue("acme", notification, payload)
+        self.assertEqual("subscription", event.subject_kind)
+        self.assertEqual("sub_1", event.subject_id)
+        self.assertEqual(WebhookEvent.STATUS_PENDING, event.status)
+
+    def test_claim_groups_by_subject(self):
+        first, other, second = self.event("a"), self.event("b"), self.event("a")
+        groups = webhook_queue.claim_batch(10, worker="test")
+        self.assertEqual([("transaction", "a"), ("transaction", "b")],
+                         list(groups))
+        self.assertEqual([first.pk, second.pk], groups[("transaction", "a")])
+        self.assertEqual(3, WebhookEvent.objects.filter(
+            status=WebhookEvent.STATUS_PROCESSING, claimed_by="test").count())
+        self.assertFalse(webhook_queue.claim_batch(10))
+
+    def test_claim_skips_subjects_being_processed(self):
+        self.event("a", status=WebhookEvent.STATUS_PROCESSING)
+        self.event("a")
+        other = self.event("b")
+        groups = webhook_queue.claim_batch(10)
+        self.assertEqual({("transaction", "b"): [other.pk]}, dict(groups))
+
+    @patch("djbraintree.webhook_queue.process_run")
+    def test_process_group_in_order(self, process_run_mock):
+        events = [self.event("a"), self.event("a")]
+        groups = webhook_queue.claim_batch(10)
+        self.assertEqual(2, webhook_queue.process_batch(groups))
+        self.assertEqual([event.pk for event in events],
+                         [event.pk for call in process_run_mock.call_args_list
+                          for event in call[0][0]])
+        self.assertEqual(2, WebhookEvent.objects.filter(
+            status=WebhookEvent.STATUS_PROCESSED).count())
+
+    @patch("djbraintree.signals.webhook_processing_error.send")
+    @patch("djbraintree.webhook_queue.process_run", side_effect=ValueError)
+    def test_failure_requeues_rest_of_group(self, process_run_mock, error_mock):
+        created = timezone.now() - datetime.timedelta(minutes=1)
+        failed = self.event("a", created=created)
+        later = self.event("a", created=created + datetime.timedelta(seconds=1))
+        groups = webhook_queue.claim_batch(10)
+        self.assertEqual(0, webhook_queue.process_batch(groups))
+        failed.refresh_from_db()
+        later.refresh_from_db()
+        self.assertEqual(WebhookEvent.STATUS_PENDING, failed.status)
+        self.assertEqual(1, failed.attempts)
+        self.assertIn("ValueError", failed.error)
+        self.assertEqual(WebhookEvent.STATUS_PENDING, later.status)
+        self.assertEqual(0, later.attempts)
+        self.assertTrue(error_mock.called)
+
+        # Retried in order
+        self.assertEqual([failed.pk, later.pk],
+                         webhook_queue.claim_batch(10)[("transaction", "a")])
+
+    @patch("djbraintree.webhook_queue.process_run", side_effect=ValueError)
+    def test_failure_gives_up_after_max_attempts(self, process_run_mock):
+        event = self.event("a", attempts=4)
+        webhook_queue.process_batch(webhook_queue.claim_batch(10))
+        event.refresh_from_db()
+        self.assertEqual(WebhookEvent.STATUS_FAILED, event.status)
+
+    def test_release_stale_claims(self):
+        stale = self.event("a", status=WebhookEvent.STATUS_PROCESSING,
+                           claimed_at=timezone.now() - datetime.timedelta(hours=1))
+        self.event("b", status=WebhookEvent.STATUS_PROCESSING,
+                   claimed_at=timezone.now())
+        self.assertEqual(1, webhook_queue.release_stale_claims(300))
+        stale.refresh_from_db()
+        self.assertEqual(WebhookEvent.STATUS_PENDING, stale.status)
+
+
+class TestWebhookCoalescing(TestCase):
+
+    def event(self, seconds, merchant=""):
+        return WebhookEvent(
+            merchant=merchant, subject_kind="transaction", subject_id="a",
+            created=datetime.datetime(2016, 1, 1, 0, 0, seconds))
+
+    def test_coalesce(self):
+        events = [self.event(0), self.event(3), self.event(5), self.event(6),
+                  self.event(7, merchant="acme")]
+        runs = webhook_queue.coalesce(events, window=5)
+        self.assertEqual([[events[0], events[1], events[2]], [events[3]],
+                          [events[4]]], runs)
+
+    def test_young_events_are_not_claimed(self):
+        create_event("a")
+        self.assertFalse(webhook_queue.claim_batch(10))
+
+    @patch("djbraintree.signals.webhook_received.send")
+    def test_burst_syncs_once(self, webhook_received_mock):
+        created = timezone.now() - datetime.timedelta(minutes=1)
+        for seconds in (0, 1, 2):
+            create_event("a", created=created + datetime.timedelta(seconds=seconds))
+        sync_mock = MagicMock()
+        with patch.dict("djbraintree.webhook_queue._subject_syncs",
+                        {"transaction": sync_mock}):
+            processed = webhook_queue.process_batch(
+                webhook_queue.claim_batch(10))
+        self.assertEqual(3, processed)
+        self.assertEqual(1, sync_mock.call_count)
+        subject_id, notifications = sync_mock.call_args[0]
+        self.assertEqual("a", subject_id)
+        self.assertEqual(3, len(notifications))
+        self.assertEqual(3, webhook_received_mock.call_count)
+
+
+class TestHandleNotification(TestCase):
+
+    @patch("djbraintree.signals.webhook_received.send")
+    def test_gateway_errors_are_logged(self, webhook_received_mock):
+        notification = MagicMock(spec=["kind", "transaction"])
+        notification.transaction.id = "tx_1"
+        sync_mock = MagicMock(side_effect=ServerError)
+        with patch.dict("djbraintree.webhook_queue._subject_syncs",
+                        {"transaction": sync_mock}):
+            with patch("djbraintree.webhook_queue.logger") as logger_mock:
+                webhook_queue.handle_notification(notification)
+        sync_mock.assert_called_once_with("tx_1", [notification])
+        self.assertTrue(logger_mock.exception.called)
+        self.assertTrue(webhook_received_mock.called)
+
+    def test_other_errors_are_raised(self):
+        notification = MagicMock(spec=["kind", "transaction"])
+        notification.transaction.id = "tx_1"
+        with patch.dict("djbraintree.webhook_queue._subject_syncs",
+                        {"transaction": MagicMock(side_effect=ValueError)}):
+            with self.assertRaises(ValueError):
+                webhook_queue.handle_notification(notification)
@@ -255,3 +255,107 @@
 #         paid_event.process()
 #         transfer = Transfer.objects.get(stripe_id="tr_XXXXXXXXXXXX")
 #         self.assertEquals(transfer.status, "paid")
+
+
+"""
+.. module:: dj-braintree.tests.test_webhooks
+   :synopsis: dj-braintree Webhook verification tests.
+"""
+
+from __future__ import unicode_literals
+import base64
+
+from django.test import TestCase
+from django.test.client import RequestFactory
+from django.test.utils import override_settings
+from django.utils.http import urlencode
+
+from mock import patch
+
+from djbraintree import notifications
+from djbraintree.exceptions import InvalidWebhookError
+from djbraintree.views import WebHook
+
+NOTIFICATION_XML = b"""<notification>
+  <timestamp type="datetime">2016-01-01T00:00:00Z</timestamp>
+  <kind>check</kind>
+  <subject><check type="boolean">true</check></subject>
+</notification>"""
+
+
+@override_settings(BRAINTREE_PUBLIC_KEY="public", BRAINTREE_PRIVATE_KEY="private")
+class TestWebhookVerification(TestCase):
+
+    def setUp(self):
+        notifications.clear_verified_cache()
+        self.payload = base64.b64encode(NOTIFICATION_XML)
+        self.signature = "public|" + notifications.payload_signature(
+            "private", self.payload)[0]
+
+    def post(self, signature, payload):
+        request = RequestFactory().post(
+            "/webhook/", {"bt_signature": signature,
+                         "bt_payload": payload.decode("ascii")})
+        return WebHook.as_view()(request)
+
+    def test_valid_signature(self):
+        self.assertIsNone(
+            notifications.verify_signature(self.signature, self.payload))
+
+    def test_forged_signature(self):
+        with self.assertRaises(InvalidWebhookError):
+            notifications.verify_signature("public|" + "0" * 40, self.payload)
+
+    def test_unknown_public_key(self):
+        with self.assertRaises(InvalidWebhookError):
+            notifications.verify_signature(
+                self.signature.replace("public", "other"), self.payload)
+
+    @patch("djbraintree.notifications.payload_signature")
+    def test_malformed_requests_skip_hmac(self, payload_signature_mock):
+        for signature, payload in [
+                (None, self.payload),
+                (self.signature, b""),
+                ("public|not-hex", self.payload),
+                (self.signature, b"<notification/>"),
+                (self.signature, b"A" * (5 * 1024 * 1024 + 1))]:
+            with self.assertRaises(InvalidWebhookError):
+                notifications.verify_signature(signature, payload)
+        self.assertFalse(payload_signature_mock.called)
+
+    def test_retry_skips_hmac(self):
+        notifications.verify_signature(self.signature, self.payload)
+        with patch("djbraintree.notifications.payload_signature") as payload_signature_mock:
+            notifications.verify_signature(self.signature, self.payload)
+        self.assertFalse(payload_signature_mock.called)
+
+    @override_settings(DJBRAINTREE_MERCHANTS={
+        "acme": {"merchant_id": "acme", "public_key": "acme_public",
+                 "private_key": "acme_private"}})
+    def test_merchant_signature(self):
+        signature = "acme_public|" + notifications.payload_signature(
+            "acme_private", self.payload)[0]
+        self.assertEqual(
+            "acme", notifications.verify_signature(signature, self.payload))
+
+    @patch("djbraintree.signals.webhook_received.send")
+    def test_webhook_view(self, webhook_received_mock):
+        response = self.post(self.signature, self.payload)
+        self.assertEqual(200, response.status_code)
+        notification = webhook_received_mock.call_args[1]["notification"]
+        self.assertEqual("check", notification.kind)
+
+    @patch("djbraintree.signals.webhook_received.send")
+    def test_webhook_view_streams_urlencoded_body(self, webhook_received_mock):
+        request = RequestFactory().post(
+            "/webhook/", urlencode({"bt_signature": self.signature,
+                                    "bt_payload": self.payload.decode("ascii")}),
+            content_type="application/x-www-form-urlencoded")
+        response = WebHook.as_view()(request)
+        self.assertEqual(200, response.status_code)
+        notification = webhook_received_mock.call_args[1]["notification"]
+        self.assertEqual("check", notification.kind)
+
+    def test_webhook_view_rejects_forgeries(self):
+        response = self.post("public|" + "0" * 40, self.payload)
+        self.assertEqual(400, response.status_code)